@@ -1,7 +1,24 @@
-from django.contrib import admin
+import datetime
 
+from django.contrib import admin, messages
+
+from . circulation import (RENEWED, CirculationError, checkout, make_available, renew_loans, reserve, return_copy,
+                           send_to_maintenance)
+from . forms import BookInstanceAdminForm
 from . models import Author, Genre, Book, BookInstance, Language
 
+# Changed only through catalog.circulation once a copy exists: saving a form
+# would write back what it held when it was loaded, over a concurrent loan.
+AVAILABILITY_FIELDS = ('status', 'due_back', 'borrower')
+
+
+def save_copy(copy):
+    if copy._state.adding:
+        copy.save()
+    else:
+        copy.save(update_fields=[f.name for f in BookInstance._meta.concrete_fields
+                                 if not f.primary_key and f.name not in AVAILABILITY_FIELDS + ('overdue_since',)])
+
 #admin.site.register(Author)
 class AuthorAdmin(admin.ModelAdmin):
     list_display = ('last_name', 'first_name', 'date_of_birth', 'date_of_death')
@@ -11,25 +28,110 @@ admin.site.register(Author, AuthorAdmin)
 
 class BooksInstanceInline(admin.TabularInline):
     model = BookInstance
+    # New copies start in maintenance, see BookInstanceAdmin for the changes.
+    readonly_fields = AVAILABILITY_FIELDS
 
 @admin.register(Book)       
 class BookAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'display_genre')
+    list_display = ('title', 'author', 'display_genre', 'copies_available', 'copies_on_loan')
+    list_select_related = ('author',)
     inlines = [BooksInstanceInline]
 
+    def get_queryset(self, request):
+        # display_genre reads the prefetched genres instead of querying per row
+        return super(BookAdmin, self).get_queryset(request).prefetch_related('genre')
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not BookInstance:
+            return super(BookAdmin, self).save_formset(request, form, formset, change)
+        for copy in formset.save(commit=False):
+            save_copy(copy)
+        for copy in formset.deleted_objects:
+            copy.delete()
+        formset.save_m2m()
+
 @admin.register(BookInstance)
 class BookInstanceAdmin(admin.ModelAdmin):
     list_display = ('book', 'status', 'borrower', 'due_back', 'id')
     list_filter = ('status', 'due_back')
+    list_select_related = ('book', 'borrower')
+    actions = ['renew_selected_loans', 'return_selected_copies', 'make_selected_copies_available']
+    form = BookInstanceAdminForm
 
     fieldsets = (
 	(None, {
 	     'fields': ('book', 'imprint', 'id')
 	}),
 	('Availability', {
-	     'fields': ('status', 'due_back', 'borrower')
+	     'fields': AVAILABILITY_FIELDS + ('circulation', 'reader')
+	}),
+    )
+    add_fieldsets = (
+	(None, {
+	     'fields': ('book', 'imprint', 'id')
+	}),
+	('Availability', {
+	     'fields': AVAILABILITY_FIELDS
 	}),
     )
 
+    # The changes catalog.circulation makes with a conditional UPDATE, safe
+    # against another librarian changing the copy at the same time.
+    CIRCULATION = {
+        'checkout': lambda copy, reader: checkout(copy.pk, reader),
+        'reserve': lambda copy, reader: reserve(copy.pk, reader),
+        'return': lambda copy, reader: return_copy(copy.pk),
+        'available': lambda copy, reader: make_available(copy.pk),
+        'maintenance': lambda copy, reader: send_to_maintenance(copy.pk),
+    }
+
+    def get_fieldsets(self, request, obj=None):
+        return self.fieldsets if obj is not None else self.add_fieldsets
+
+    def get_readonly_fields(self, request, obj=None):
+        return AVAILABILITY_FIELDS if obj is not None else ()
+
+    def save_model(self, request, obj, form, change):
+        save_copy(obj)
+        change_to = form.cleaned_data.get('circulation')
+        if change_to:
+            try:
+                self.CIRCULATION[change_to](obj, form.cleaned_data.get('reader'))
+            except CirculationError as e:
+                self.message_user(request, 'The availability was not changed: {0}'.format(e), messages.ERROR)
+
+    def renew_selected_loans(self, request, queryset):
+        # One UPDATE per 500 copies instead of a save() per copy, see catalog.circulation.
+        renewal_date = datetime.date.today() + datetime.timedelta(weeks=3)
+        results = renew_loans(queryset.values_list('pk', flat=True), renewal_date)
+        renewed = sum(1 for row in results if row['outcome'] == RENEWED)
+        self.message_user(request, 'Renewed {0} loan(s) until {1}.'.format(renewed, renewal_date))
+        if renewed < len(results):
+            self.message_user(request, '{0} of the selected copies were not on loan and were left as they are.'.format(
+                len(results) - renewed), messages.WARNING)
+    renew_selected_loans.short_description = 'Renew selected loans for three weeks'
+
+    def circulate_selected(self, request, queryset, change, done):
+        # Each copy is changed with a conditional UPDATE, safe against another
+        # librarian changing it at the same time, see catalog.circulation.
+        changed, errors = 0, []
+        for pk in queryset.values_list('pk', flat=True):
+            try:
+                change(pk)
+                changed += 1
+            except CirculationError as e:
+                errors.append('{0}: {1}'.format(pk, e))
+        self.message_user(request, done.format(changed))
+        for error in errors:
+            self.message_user(request, error, messages.WARNING)
+
+    def return_selected_copies(self, request, queryset):
+        self.circulate_selected(request, queryset, return_copy, 'Returned {0} copies.')
+    return_selected_copies.short_description = 'Return selected copies'
+
+    def make_selected_copies_available(self, request, queryset):
+        self.circulate_selected(request, queryset, make_available, 'Made {0} copies available.')
+    make_selected_copies_available.short_description = 'Make selected copies available'
+
 admin.site.register(Genre)
 admin.site.register(Language)
@@ -0,0 +1,292 @@
+"""
+Read-only JSON API over the catalog.
+
+    /catalog/api/<resource>/          list, paged by cursor
+    /catalog/api/<resource>/<pk>/     one object
+
+Resources are authors, books, copies, genres and languages. Every endpoint
+takes:
+
+    fields=a,b      only these fields (sparse fieldsets), default all
+    expand=a,b      embed these related objects instead of their ids
+
+and lists also take limit (up to MAX_LIMIT), cursor (the "next" value of
+the previous response) and the equality filters listed in each resource.
+
+Rows are read with values() rather than as model instances: one query per
+page, joined to the expanded to-one relations, plus one query per to-many
+relation (a book's genres) per 500 rows. Serializing thousands of rows is then mostly
+json.dumps().
+
+Responses carry a strong ETag built from the generations of the tables they
+read, version counters kept in the database (see catalog.cache), so every
+process gives the same ETag until one of the tables changes, and
+If-None-Match is answered with a 304 after one query for them, before
+anything is read or serialized.
+
+Reads go to a replica if there are any, see catalog.routers.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+
+from .bulk import chunked
+from .cache import generations, table_scope
+from .models import Author, Book, BookInstance, Genre, Language
+from .pagination import InvalidCursor, KeysetPaginator, encode_cursor
+from .routers import replica_reads
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 5000
+
+# Ids per query for the to-many relations, under SQLite's limit of bound parameters.
+LOOKUP_CHUNK = 500
+
+# Users with this permission also see the fields a resource marks private.
+LIBRARIAN_PERMISSION = 'catalog.can_mark_returned'
+
+
+class ApiError(Exception):
+    pass
+
+
+class Resource(object):
+    """
+    A model exposed by the API.
+
+    fields maps field names to the values() column they come from. relations
+    maps the to-one fields that can be expanded to a resource name, many maps
+    to-many fields to (through model, own column, other column, resource).
+    """
+
+    def __init__(self, name, model, fields, ordering, relations=None, many=None, filters=(), private=()):
+        self.name = name
+        self.model = model
+        self.fields = OrderedDict(fields)
+        self.ordering = ordering
+        self.relations = relations or {}
+        self.many = many or {}
+        self.filters = filters
+        self.private = private
+
+    def visible_fields(self, librarian):
+        return [name for name in list(self.fields) + list(self.many) if librarian or name not in self.private]
+
+    def embedded_fields(self):
+        # Fields of an object embedded in another: no private fields, no nesting.
+        return [name for name in self.fields if name not in self.private and name not in self.relations]
+
+
+RESOURCES = {resource.name: resource for resource in [
+    Resource('authors', Author, [
+        ('id', 'id'), ('first_name', 'first_name'), ('last_name', 'last_name'),
+        ('date_of_birth', 'date_of_birth'), ('date_of_death', 'date_of_death'),
+    ], ordering=('last_name', 'first_name', 'id')),
+    Resource('books', Book, [
+        ('id', 'id'), ('title', 'title'), ('summary', 'summary'), ('isbn', 'isbn'),
+        ('author', 'author_id'), ('language', 'language_id'),
+        ('copies_available', 'copies_available'), ('copies_on_loan', 'copies_on_loan'),
+        ('copies_maintenance', 'copies_maintenance'), ('copies_reserved', 'copies_reserved'),
+    ], ordering=('title', 'id'), relations={'author': 'authors', 'language': 'languages'},
+        many={'genres': (Book.genre.through, 'book_id', 'genre_id', 'genres')}, filters=('author', 'language')),
+    Resource('copies', BookInstance, [
+        ('id', 'id'), ('book', 'book_id'), ('imprint', 'imprint'), ('status', 'status'),
+        ('due_back', 'due_back'), ('borrower', 'borrower_id'),
+    ], ordering=('id',), relations={'book': 'books'}, filters=('book', 'status'), private=('borrower',)),
+    Resource('genres', Genre, [('id', 'id'), ('name', 'name')], ordering=('name', 'id')),
+    Resource('languages', Language, [('id', 'id'), ('name', 'language_name')], ordering=('language_name', 'id')),
+]}
+
+
+def split_param(request, name):
+    return [value for value in request.GET.get(name, '').split(',') if value]
+
+
+class Query(object):
+    """
+    What one request asks of a resource: fields, expansions and, for lists,
+    filters, limit and cursor. Raises ApiError for anything invalid.
+    """
+
+    def __init__(self, resource, request, many):
+        self.resource = resource
+        self.librarian = request.user.has_perm(LIBRARIAN_PERMISSION)
+        visible = resource.visible_fields(self.librarian)
+        self.fields = split_param(request, 'fields') or visible
+        unknown = [name for name in self.fields if name not in visible]
+        if unknown:
+            raise ApiError('Unknown fields: {0}'.format(', '.join(unknown)))
+        self.expand = split_param(request, 'expand')
+        unknown = [name for name in self.expand if name not in self.fields or
+                   (name not in resource.relations and name not in resource.many)]
+        if unknown:
+            raise ApiError('Cannot expand: {0}'.format(', '.join(unknown)))
+
+        self.filters, self.limit, self.cursor = {}, None, None
+        if many:
+            for name in resource.filters:
+                if name in request.GET:
+                    self.filters[resource.fields[name]] = request.GET[name]
+            try:
+                self.limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+            except ValueError:
+                raise ApiError('limit must be a number')
+            self.cursor = request.GET.get('cursor')
+
+    def tables(self):
+        """
+        The models whose changes change the response.
+        """
+        models = {self.resource.model}
+        for name in self.expand:
+            related = self.resource.relations.get(name) or self.resource.many[name][3]
+            models.add(RESOURCES[related].model)
+        return models
+
+    def related_columns(self, name, column):
+        # author_id -> [('first_name', 'author__first_name'), ...]
+        related = RESOURCES[self.resource.relations.get(name) or self.resource.many[name][3]]
+        prefix = column[:-len('_id')]
+        return [(field, prefix + '__' + related.fields[field]) for field in related.embedded_fields()]
+
+    def queryset(self):
+        """
+        The rows to serialize, as values() dicts holding every column needed.
+        """
+        columns = ['id']
+        for name in self.fields:
+            if name not in self.resource.many:
+                columns.append(self.resource.fields[name])
+                if name in self.expand:
+                    columns.extend(column for field, column in self.related_columns(name, self.resource.fields[name]))
+        columns.extend(self.resource.ordering)
+        columns = list(OrderedDict.fromkeys(columns))
+        return self.resource.model.objects.filter(**self.filters).values(*columns)
+
+    def serialize(self, rows):
+        """
+        Turn values() rows into API objects, fields in the order asked for.
+        """
+        plan = []
+        for name in self.fields:
+            if name in self.resource.many:
+                plan.append((name, None, None))
+            else:
+                column = self.resource.fields[name]
+                plan.append((name, column, self.related_columns(name, column) if name in self.expand else None))
+
+        objects = []
+        for row in rows:
+            obj = OrderedDict()
+            for name, column, related in plan:
+                if column is None:
+                    obj[name] = []
+                elif related is None:
+                    obj[name] = row[column]
+                elif row[column] is None:
+                    obj[name] = None
+                else:
+                    obj[name] = OrderedDict((field, row[related_column]) for field, related_column in related)
+            objects.append(obj)
+
+        for name, column, related in plan:
+            if column is None:
+                self.add_many(name, [row['id'] for row in rows], objects)
+        return objects
+
+    def add_many(self, name, ids, objects):
+        through, own, other, related_name = self.resource.many[name]
+        related = self.related_columns(name, other) if name in self.expand else []
+        names = [field for field, column in related]
+        found = {pk: [] for pk in ids}
+        for chunk in chunked(ids, LOOKUP_CHUNK):
+            links = (through.objects.filter(**{own + '__in': chunk}).order_by(other)
+                     .values_list(own, other, *[column for field, column in related]))
+            for link in links:
+                if related:
+                    found[link[0]].append(OrderedDict(zip(names, link[2:])))
+                else:
+                    found[link[0]].append(link[1])
+        for pk, obj in zip(ids, objects):
+            obj[name] = found[pk]
+
+
+def table_tokens(query):
+    models = sorted(query.tables(), key=lambda model: model._meta.model_name)
+    return generations([table_scope(model) for model in models])
+
+
+def etag_for(request, query, tokens):
+    key = '|'.join([str(token) for token in tokens] + [request.get_full_path(), str(query.librarian)])
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def not_modified(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags
+
+
+def json_response(data, etag=None, status=200):
+    response = HttpResponse(json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')),
+                            content_type='application/json', status=status)
+    if etag:
+        response['ETag'] = quote_etag(etag)
+    # librarians see more fields
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+@replica_reads
+def serve(request, resource_name, pk=None):
+    """
+    Handle one API request, see the module docstring.
+    """
+    resource = RESOURCES.get(resource_name)
+    if resource is None:
+        raise Http404('No such resource')
+    try:
+        query = Query(resource, request, many=pk is None)
+    except ApiError as e:
+        return json_response({'error': str(e)}, status=400)
+
+    tokens = table_tokens(query)
+    etag = etag_for(request, query, tokens)
+    if not_modified(request, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = quote_etag(etag)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+
+    return respond(request, resource, query, pk, etag)
+
+
+def respond(request, resource, query, pk, etag):
+    try:
+        if pk is not None:
+            rows = list(query.queryset().filter(pk=pk)[:1])
+            if not rows:
+                raise Http404('No such object')
+            return json_response(query.serialize(rows)[0], etag)
+        paginator = KeysetPaginator(query.queryset(), query.limit, resource.ordering)
+        rows = list(paginator.seek_queryset(query.cursor)[:query.limit + 1])
+    except (ValueError, ValidationError):
+        return json_response({'error': 'Invalid id or filter value'}, status=400)
+    except InvalidCursor:
+        return json_response({'error': 'Invalid cursor'}, status=400)
+
+    next_url = None
+    if len(rows) > query.limit:
+        rows = rows[:query.limit]
+        params = request.GET.copy()
+        params['cursor'] = encode_cursor(rows[-1][key] for key in resource.ordering)
+        next_url = '{0}?{1}'.format(request.path, params.urlencode())
+    return json_response({'results': query.serialize(rows), 'next': next_url}, etag)
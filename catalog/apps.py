@@ -7,3 +7,5 @@ from django.apps import AppConfig
 class CatalogConfig(AppConfig):
     name = 'catalog'
 
+    def ready(self):
+        from . import signals  # noqa: connects the signal handlers
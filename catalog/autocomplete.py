@@ -0,0 +1,255 @@
+"""
+Typeahead suggestions for book titles and author names.
+
+Suggestions are served from a PrefixIndex held in each worker process:
+sorted lists of normalized keys searched with bisect, so a lookup never
+touches the database. The index is built on first use (or at worker boot,
+see locallibrary/wsgi.py), follows saves and deletes made in this process
+through catalog.signals, and is rebuilt in the background of a lookup once
+it is older than CATALOG_AUTOCOMPLETE_MAX_AGE seconds, to pick up changes
+made by other processes. CATALOG_AUTOCOMPLETE_MAX_ENTRIES bounds its size.
+"""
+import bisect
+import itertools
+import logging
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from .models import Author, Book
+
+logger = logging.getLogger(__name__)
+
+ARTICLES = ('a ', 'an ', 'the ')
+
+
+def normalize(text):
+    """
+    Lower case, strip accents and collapse whitespace, so "Émile  Zola"
+    is found by typing "emile z".
+    """
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.casefold().split())
+
+
+def book_keys(book):
+    key = normalize(book.title)
+    keys = [key]
+    for article in ARTICLES:
+        if key.startswith(article):
+            keys.append(key[len(article):])
+    return keys, ('book', book.pk, book.title)
+
+
+def author_keys(author):
+    first, last = normalize(author.first_name), normalize(author.last_name)
+    keys = ['{0} {1}'.format(first, last).strip(), '{0} {1}'.format(last, first).strip()]
+    return keys, ('author', author.pk, str(author))
+
+
+class PrefixIndex(object):
+    """
+    Sorted (key, entry) pairs supporting prefix lookups.
+
+    The pairs are split into buckets by the first BUCKET_LENGTH characters
+    of their key, each bucket two parallel sorted lists. Readers take a
+    snapshot of the buckets without locking. A writer copies only the buckets
+    it changes and swaps the new set in under a lock, so a lookup never sees
+    a half-applied change and a save costs the size of a bucket rather than
+    of the whole index.
+    """
+    BUCKET_LENGTH = 2
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # ({bucket: (keys, entries)}, sorted bucket names)
+        self._data = ({}, [])
+        self._keys_by_entry = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def replace(self, items):
+        """
+        Replace the whole index with items, an iterable of (keys, entry).
+        Items beyond max_entries keys are left out.
+        """
+        pairs, keys_by_entry = [], {}
+        for keys, entry in items:
+            if self.max_entries is not None and len(pairs) + len(keys) > self.max_entries:
+                break
+            keys_by_entry[entry[:2]] = keys
+            pairs.extend((key, entry) for key in keys)
+        pairs.sort()
+        buckets = {}
+        for key, entry in pairs:
+            bucket = buckets.setdefault(key[:self.BUCKET_LENGTH], ([], []))
+            bucket[0].append(key)
+            bucket[1].append(entry)
+        with self._lock:
+            self._data = (buckets, sorted(buckets))
+            self._keys_by_entry = keys_by_entry
+            self._size = len(pairs)
+
+    def update(self, keys, entry):
+        """
+        Add or replace one entry, identified by its (kind, pk).
+        """
+        with self._lock:
+            buckets, copied = dict(self._data[0]), set()
+            self._remove(entry[:2], buckets, copied)
+            if self.max_entries is None or self._size + len(keys) <= self.max_entries:
+                for key in keys:
+                    keys_list, entries = self._writable(buckets, copied, key[:self.BUCKET_LENGTH])
+                    position = bisect.bisect_right(keys_list, key)
+                    keys_list.insert(position, key)
+                    entries.insert(position, entry)
+                self._keys_by_entry[entry[:2]] = keys
+                self._size += len(keys)
+            self._swap(buckets)
+
+    def remove(self, kind, pk):
+        with self._lock:
+            buckets = dict(self._data[0])
+            self._remove((kind, pk), buckets, set())
+            self._swap(buckets)
+
+    def _remove(self, ident, buckets, copied):
+        # Drop ident's keys from buckets. Caller holds the lock.
+        for key in self._keys_by_entry.pop(ident, []):
+            keys_list, entries = self._writable(buckets, copied, key[:self.BUCKET_LENGTH])
+            position = bisect.bisect_left(keys_list, key)
+            while position < len(keys_list) and keys_list[position] == key:
+                if entries[position][:2] == ident:
+                    del keys_list[position], entries[position]
+                    self._size -= 1
+                    break
+                position += 1
+
+    def _writable(self, buckets, copied, name):
+        # The bucket's lists, copied the first time this write touches them so
+        # the snapshot readers hold is left alone.
+        if name not in copied:
+            keys_list, entries = buckets.get(name, ((), ()))
+            buckets[name] = (list(keys_list), list(entries))
+            copied.add(name)
+        return buckets[name]
+
+    def _swap(self, buckets):
+        for name in [name for name, (keys_list, entries) in buckets.items() if not keys_list]:
+            del buckets[name]
+        names = self._data[1]
+        if set(names) != set(buckets):
+            names = sorted(buckets)
+        self._data = (buckets, names)
+
+    def lookup(self, prefix, limit=10):
+        """
+        Return up to limit distinct entries with a key starting with prefix.
+        """
+        prefix = normalize(prefix)
+        buckets, names = self._data
+        if not prefix:
+            return []
+        if len(prefix) >= self.BUCKET_LENGTH:
+            names = [prefix[:self.BUCKET_LENGTH]]
+        else:
+            # The buckets of every key starting with the shorter prefix, in order.
+            names = itertools.takewhile(lambda name: name.startswith(prefix), names[bisect.bisect_left(names, prefix):])
+        results, seen = [], set()
+        for name in names:
+            if len(results) >= limit:
+                break
+            keys_list, entries = buckets.get(name, ((), ()))
+            position = bisect.bisect_left(keys_list, prefix)
+            while position < len(keys_list) and keys_list[position].startswith(prefix) and len(results) < limit:
+                entry = entries[position]
+                if entry not in seen:
+                    seen.add(entry)
+                    results.append(entry)
+                position += 1
+        return results
+
+
+class AutocompleteIndex(PrefixIndex):
+    """
+    The PrefixIndex of book titles and author names, loaded from the
+    database and kept fresh as described in the module docstring.
+    """
+
+    def __init__(self):
+        super(AutocompleteIndex, self).__init__(getattr(settings, 'CATALOG_AUTOCOMPLETE_MAX_ENTRIES', 500000))
+        self.max_age = getattr(settings, 'CATALOG_AUTOCOMPLETE_MAX_AGE', 300)
+        self.built_at = None
+        self._build_lock = threading.Lock()
+        self._refreshing = False
+
+    def items(self):
+        for author in Author.objects.order_by().only('first_name', 'last_name').iterator():
+            yield author_keys(author)
+        # Most stocked books first, they are kept if the index is full.
+        books = Book.objects.order_by('-copies_available', '-copies_on_loan', 'pk').only('title')
+        for book in books.iterator():
+            yield book_keys(book)
+
+    def build(self, if_missing=False):
+        with self._build_lock:
+            if if_missing and self.built_at is not None:
+                return
+            self.replace(self.items())
+            self.built_at = time.time()
+
+    def is_stale(self):
+        return self.built_at is None or time.time() - self.built_at > self.max_age
+
+    def suggest(self, prefix, limit=10):
+        if self.built_at is None:
+            # Threads asking at once wait for one build rather than each running their own.
+            self.build(if_missing=True)
+        elif self.is_stale():
+            self.start_refresh()
+        return self.lookup(prefix, limit)
+
+    def start_refresh(self):
+        # One thread rebuilds, lookups keep answering from the old data meanwhile.
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.build()
+        except DatabaseError:
+            logger.exception('Could not refresh the autocomplete index.')
+        finally:
+            self._refreshing = False
+            connections.close_all()
+
+    def book_saved(self, book):
+        if self.built_at is not None:
+            self.update(*book_keys(book))
+
+    def author_saved(self, author):
+        if self.built_at is not None:
+            self.update(*author_keys(author))
+
+
+index = AutocompleteIndex()
+
+
+def warm_up():
+    """
+    Build the index ahead of the first request, e.g. at worker boot.
+    """
+    try:
+        index.build()
+    except DatabaseError:
+        logger.exception('Could not build the autocomplete index, it will be built on first use.')
@@ -0,0 +1,268 @@
+"""
+Benchmark harness for the catalog URL space, used by `manage.py benchmark`.
+
+Every route of catalog.urls gets a sample request built from rows of the
+database (see sample_requests()). Each one is sent through the Django test
+client, which also counts the SQL queries per request, and optionally over
+HTTP from concurrent clients to a running server, e.g. a local gunicorn.
+Results are plain dicts of latency percentiles and throughput, which the
+command writes as JSON so runs can be compared between commits.
+"""
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core.urlresolvers import get_resolver, reverse
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from .models import Author, Book, BookInstance
+from .template_bundle import url_patterns
+
+# Who a route is requested as.
+ANONYMOUS = 'anonymous'
+READER = 'reader'
+LIBRARIAN = 'librarian'
+
+BENCHMARK_USERS = {READER: 'benchmark-reader', LIBRARIAN: 'benchmark-librarian'}
+
+
+def percentile(values, fraction):
+    """
+    The nearest-rank percentile of sorted values, e.g. fraction=0.99.
+    """
+    if not values:
+        return None
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def summarize(latencies, elapsed, errors=0, queries=None):
+    """
+    Summarize the latencies (in seconds) of the requests to one route.
+    """
+    ms = sorted(latency * 1000 for latency in latencies)
+    result = {
+        'requests': len(ms),
+        'errors': errors,
+        'mean_ms': round(sum(ms) / len(ms), 3) if ms else None,
+        'p50_ms': round(percentile(ms, 0.5), 3) if ms else None,
+        'p90_ms': round(percentile(ms, 0.9), 3) if ms else None,
+        'p99_ms': round(percentile(ms, 0.99), 3) if ms else None,
+        'max_ms': round(ms[-1], 3) if ms else None,
+        'requests_per_second': round(len(ms) / elapsed, 1) if elapsed else None,
+    }
+    if queries is not None:
+        result['queries'] = max(queries) if queries else None
+    return result
+
+
+def benchmark_user(kind):
+    """
+    The user a route is requested as, created on first use: a plain reader,
+    or a staff member allowed to manage loans.
+    """
+    user, created = User.objects.get_or_create(username=BENCHMARK_USERS[kind])
+    if created and kind == LIBRARIAN:
+        user.is_staff = True
+        user.save()
+        user.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+    return user
+
+
+def sample_requests():
+    """
+    Return {route name: (path, user kind)} for the routes of catalog.urls,
+    using the rows in the middle of each table. Routes needing a row the
+    database does not have are left out.
+    """
+    def middle(queryset):
+        count = queryset.count()
+        return queryset.order_by('pk')[count // 2] if count else None
+
+    book, author = middle(Book.objects.all()), middle(Author.objects.all())
+    on_loan = middle(BookInstance.objects.filter(status__exact='o'))
+    available = middle(BookInstance.objects.filter(status__exact='a'))
+    word = book.title.split()[0] if book else 'the'
+
+    samples = {
+        'index': (reverse('catalog:index'), ANONYMOUS),
+        'search': (reverse('catalog:search') + '?q=' + word, ANONYMOUS),
+        'autocomplete': (reverse('catalog:autocomplete') + '?q=' + word[:3], ANONYMOUS),
+        'api-list': (reverse('catalog:api-list', args=['books']) + '?limit=100&expand=author,genres', ANONYMOUS),
+        'export': (reverse('catalog:export', args=['authors', 'csv']), LIBRARIAN),
+        'profile': (reverse('catalog:profile'), LIBRARIAN),
+        'books': (reverse('catalog:books'), ANONYMOUS),
+        'authors': (reverse('catalog:authors'), ANONYMOUS),
+        'my-borrowed': (reverse('catalog:my-borrowed'), READER),
+        'all-borrowed': (reverse('catalog:all-borrowed'), LIBRARIAN),
+        'renew-books-librarian': (reverse('catalog:renew-books-librarian'), LIBRARIAN),
+        'author_create': (reverse('catalog:author_create'), LIBRARIAN),
+        'book_create': (reverse('catalog:book_create'), LIBRARIAN),
+    }
+    if book is not None:
+        samples.update({
+            'api-detail': (reverse('catalog:api-detail', args=['books', book.pk]), ANONYMOUS),
+            'book-detail': (reverse('catalog:book-detail', args=[book.pk]), ANONYMOUS),
+            'book_update': (reverse('catalog:book_update', args=[book.pk]), LIBRARIAN),
+            'book_delete': (reverse('catalog:book_delete', args=[book.pk]), LIBRARIAN),
+        })
+    if author is not None:
+        samples.update({
+            'author-detail': (reverse('catalog:author-detail', args=[author.pk]), ANONYMOUS),
+            'author_update': (reverse('catalog:author_update', args=[author.pk]), LIBRARIAN),
+            'author_delete': (reverse('catalog:author_delete', args=[author.pk]), LIBRARIAN),
+        })
+    if on_loan is not None:
+        samples.update({
+            'renew-book-librarian': (reverse('catalog:renew-book-librarian', args=[on_loan.pk]), LIBRARIAN),
+            'return-book-librarian': (reverse('catalog:return-book-librarian', args=[on_loan.pk]), LIBRARIAN),
+        })
+    if available is not None:
+        samples.update({
+            'checkout-book-librarian': (reverse('catalog:checkout-book-librarian', args=[available.pk]), LIBRARIAN),
+            'reserve-book': (reverse('catalog:reserve-book', args=[available.pk]), READER),
+        })
+    return samples
+
+
+def catalog_routes():
+    return [pattern.name for pattern in url_patterns(get_resolver('catalog.urls'))]
+
+
+def logged_in_clients():
+    """
+    A test client per user kind, the readers' and librarians' logged in.
+    """
+    clients = {ANONYMOUS: Client()}
+    for kind in (READER, LIBRARIAN):
+        clients[kind] = Client()
+        clients[kind].force_login(benchmark_user(kind))
+    return clients
+
+
+def read(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def run_client(samples, repeat, warmup=2):
+    """
+    Request each sample repeat times in a row through the test client.
+    Returns {route name: summary}, with the queries of the slowest request.
+    """
+    clients = logged_in_clients()
+    results = {}
+    # The test client's host; the requests only GET pages.
+    with override_settings(ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver']):
+        for name, (path, kind) in sorted(samples.items()):
+            client = clients[kind]
+            for run in range(warmup):
+                read(client.get(path))
+            latencies, queries, errors = [], [], 0
+            started = time.perf_counter()
+            for run in range(repeat):
+                with CaptureQueriesContext(connection) as captured:
+                    request_started = time.perf_counter()
+                    response = client.get(path)
+                    read(response)
+                    latencies.append(time.perf_counter() - request_started)
+                queries.append(len(captured))
+                errors += response.status_code >= 400
+            results[name] = summarize(latencies, time.perf_counter() - started, errors, queries)
+    return results
+
+
+def session_cookies(clients):
+    # The test clients' sessions are in the database, a server can use them too.
+    cookie = settings.SESSION_COOKIE_NAME
+    return {kind: ('{0}={1}'.format(cookie, client.cookies[cookie].value) if cookie in client.cookies else None)
+            for kind, client in clients.items()}
+
+
+def run_http(base_url, samples, repeat, concurrency, timeout=30, background=None, background_clients=0):
+    """
+    Request each sample repeat times over HTTP, from concurrency threads at
+    once. Returns {route name: summary}.
+
+    background is an optional (path, user kind) requested in a loop by
+    background_clients more threads for the whole run, e.g. a slow page, to
+    see how much it holds up the others.
+    """
+    cookies = session_cookies(logged_in_clients())
+
+    def fetch_url(url, headers):
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout) as response:
+                response.read()
+            return False
+        except (urllib.error.URLError, OSError):
+            return True
+
+    stop = threading.Event()
+    loaders = []
+    if background is not None:
+        path, kind = background
+        url = base_url.rstrip('/') + path
+        headers = {'Cookie': cookies[kind]} if cookies[kind] else {}
+
+        def load():
+            while not stop.is_set():
+                fetch_url(url, headers)
+        loaders = [threading.Thread(target=load, daemon=True) for number in range(background_clients)]
+        for loader in loaders:
+            loader.start()
+
+    results = {}
+    try:
+        for name, (path, kind) in sorted(samples.items()):
+            url = base_url.rstrip('/') + path
+            headers = {'Cookie': cookies[kind]} if cookies[kind] else {}
+            latencies, errors = [], []
+            lock = threading.Lock()
+
+            def fetch(count):
+                for run in range(count):
+                    request_started = time.perf_counter()
+                    failed = fetch_url(url, headers)
+                    with lock:
+                        latencies.append(time.perf_counter() - request_started)
+                        errors.append(failed)
+
+            fetch(1)
+            del latencies[:], errors[:]
+            threads = [threading.Thread(target=fetch, args=[repeat // concurrency + (number < repeat % concurrency)])
+                       for number in range(concurrency)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            results[name] = summarize(latencies, time.perf_counter() - started, sum(errors))
+    finally:
+        stop.set()
+        for loader in loaders:
+            loader.join()
+    return results
+
+
+def compare(previous, current, threshold=0.2):
+    """
+    Yield (section, route, metric, before, after) for every p50 or p90 that
+    got more than threshold slower, or query count that grew, between two
+    result documents.
+    """
+    for section in ('client', 'http'):
+        for name, after in sorted((current.get(section) or {}).items()):
+            before = (previous.get(section) or {}).get(name)
+            if not before:
+                continue
+            for metric in ('p50_ms', 'p90_ms'):
+                if before.get(metric) and after.get(metric) and after[metric] > before[metric] * (1 + threshold):
+                    yield section, name, metric, before[metric], after[metric]
+            if (before.get('queries') or 0) < (after.get('queries') or 0):
+                yield section, name, 'queries', before['queries'], after['queries']
@@ -0,0 +1,28 @@
+"""
+Helpers for loading many rows at once, shared by the seed and import commands.
+"""
+from django.db import connections, router
+
+
+def bulk_insert(model, objects, batch_size):
+    """
+    bulk_create() objects in INSERTs of at most batch_size rows.
+    """
+    # Django 1.9 lets an explicit batch_size exceed what the database accepts in one INSERT.
+    connection = connections[router.db_for_write(model)]
+    limit = connection.ops.bulk_batch_size(model._meta.concrete_fields, objects)
+    model.objects.bulk_create(objects, batch_size=max(min(batch_size, limit), 1))
+
+
+def chunked(items, size):
+    """
+    Group an iterable into lists of at most size items, reading it lazily.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
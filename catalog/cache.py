@@ -0,0 +1,217 @@
+"""
+Response caching for the public catalog pages.
+
+Rendered pages are stored in the cache named by settings.CATALOG_CACHE
+(the 'catalog' alias of settings.CACHES by default). Each page belongs to one
+or more scopes, e.g. 'book:12' for a book's detail page or 'books' for the
+book list, and every scope has a generation: a version counter in the
+CacheGeneration table. A page's key includes the generations of its scopes,
+so invalidate() drops all the pages of a scope at once, in every process, by
+bumping its version. catalog.signals calls it whenever a row shown on a page
+is saved or deleted, which covers the CRUD views, the admin and anything else
+going through the ORM; QuerySet.update() and bulk_create() bypass the signals
+and need an explicit call.
+
+Only anonymous GET requests are served from the cache, pages for logged in
+users show per-user links and are always rendered.
+
+The generations also make the pages' ETags and Last-Modified dates (when a
+scope last changed) for conditional GET: anonymous requests carrying a
+matching If-None-Match or a recent enough If-Modified-Since get a 304 after
+one query for the generations, before the view looks at anything else. As the
+versions live in the database every process agrees on them, whatever the
+cache backend, and a page built from a replica reads them from that replica.
+"""
+import calendar
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, IntegrityError, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .bulk import chunked
+from .models import Author, Book, BookInstance, CacheGeneration, Genre, Language
+
+logger = logging.getLogger(__name__)
+
+BOOK_LIST = 'books'
+AUTHOR_LIST = 'authors'
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE', 'catalog')]
+
+
+def book_scope(pk):
+    return 'book:{0}'.format(pk)
+
+
+def author_scope(pk):
+    return 'author:{0}'.format(pk)
+
+
+def table_scope(model):
+    # Every row of a table, used by the JSON API's ETags (catalog.api).
+    return 'table:{0}'.format(model._meta.model_name)
+
+
+def catalog_table_scopes():
+    # For bulk loads, which bypass the signals.
+    return [table_scope(model) for model in (Author, Book, BookInstance, Genre, Language)]
+
+
+# The token of a scope that has not changed since the CacheGeneration table
+# was created. It carries no time, so pages including it have no Last-Modified.
+UNCHANGED = 'unchanged'
+
+
+def primary_generations():
+    # Bumped on the primary, also for changes made while reading from a replica.
+    return CacheGeneration.objects.using(router.db_for_write(CacheGeneration))
+
+
+def generation_token(generation):
+    # when the generation started, then its version
+    return '{0}-{1}'.format(calendar.timegm(generation.changed.utctimetuple()), generation.version)
+
+
+def token_time(token):
+    """
+    Return when a generation token was started, as a Unix timestamp, or None
+    for a token that does not say.
+    """
+    try:
+        return int(str(token).split('-', 1)[0])
+    except ValueError:
+        return None
+
+
+def generations(scopes):
+    """
+    Return the current generation token of each scope.
+
+    They are read from the database the rows of the page are read from, a
+    replica included (catalog.routers): it has the versions that go with the
+    rows it has, however far behind the primary it is.
+    """
+    current = CacheGeneration.objects.filter(scope__in=set(scopes))
+    tokens = {generation.scope: generation_token(generation) for generation in current}
+    return [tokens.get(scope, UNCHANGED) for scope in scopes]
+
+
+def page_version(tokens, path):
+    return hashlib.md5(':'.join([str(token) for token in tokens] + [path]).encode('utf-8')).hexdigest()
+
+
+def last_modified(tokens):
+    times = [token_time(token) for token in tokens]
+    if not times or None in times:
+        return None
+    return max(times)
+
+
+def invalidate(scopes):
+    """
+    Drop the cached pages of the given scopes, by starting new generations.
+
+    The versions are bumped once the current transaction commits, each chunk
+    in a statement of its own: bumped inside it, the few generations every
+    change touches ('books', the tables) would stay locked until it ends, and
+    checkouts, returns and admin edits would all queue on them. Until the
+    bump requests may still be served the pages of before the change; it
+    follows the commit right away.
+    """
+    scopes = sorted(set(scopes))
+    transaction.on_commit(lambda: bump_generations(scopes), using=router.db_for_write(CacheGeneration))
+
+
+def bump_generations(scopes):
+    now = timezone.now()
+    try:
+        for chunk in chunked(scopes, 500):
+            bumped = primary_generations().filter(scope__in=chunk).update(version=F('version') + 1, changed=now)
+            if bumped < len(chunk):
+                existing = set(primary_generations().filter(scope__in=chunk).values_list('scope', flat=True))
+                start_generations([scope for scope in chunk if scope not in existing], now)
+    except DatabaseError:
+        # The change itself is committed, don't fail the request over its pages.
+        logger.exception('Could not invalidate the cached pages of %s.', ', '.join(scopes))
+
+
+def start_generations(scopes, now):
+    try:
+        with transaction.atomic(using=router.db_for_write(CacheGeneration)):
+            primary_generations().bulk_create(
+                [CacheGeneration(scope=scope, version=1, changed=now) for scope in scopes])
+    except IntegrityError:
+        # Some were started by a concurrent change in the meantime.
+        for scope in scopes:
+            generation, created = primary_generations().get_or_create(
+                scope=scope, defaults={'version': 1, 'changed': now})
+            if not created:
+                primary_generations().filter(scope=scope).update(version=F('version') + 1, changed=now)
+
+
+class CachedPageMixin(object):
+    """
+    Serve a view's anonymous GET responses from the catalog cache and answer
+    their conditional GETs.
+    Views list the scopes their page depends on in get_cache_scopes().
+    """
+    cache_timeout = None
+
+    def get_cache_scopes(self):
+        raise NotImplementedError
+
+    def get_cache_timeout(self):
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 600)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated():
+            return super(CachedPageMixin, self).dispatch(request, *args, **kwargs)
+
+        tokens = generations(self.get_cache_scopes())
+        version = page_version(tokens, request.get_full_path())
+        modified = last_modified(tokens)
+        # Last-Modified has whole seconds, so leave it out until the second of
+        # the change is over: a later change in it would not move the date.
+        validator = modified if modified is not None and modified < int(time.time()) else None
+        response = get_conditional_response(request, etag=version, last_modified=validator)
+        if response is not None:
+            return response
+
+        response = self.cached_dispatch(version, request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = quote_etag(version)
+            if validator is not None:
+                response['Last-Modified'] = http_date(validator)
+            # browsers revalidate, which is cheap, instead of guessing a lifetime
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    def cached_dispatch(self, version, request, *args, **kwargs):
+        # A timeout of 0 turns page caching off.
+        timeout = self.get_cache_timeout()
+        if not timeout:
+            return super(CachedPageMixin, self).dispatch(request, *args, **kwargs)
+
+        key = 'catalog:page:{0}'.format(version)
+        response = get_cache().get(key)
+        if response is not None:
+            return response
+
+        response = super(CachedPageMixin, self).dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            if hasattr(response, 'render') and callable(response.render):
+                response.add_post_render_callback(lambda rendered: get_cache().set(key, rendered, timeout))
+            else:
+                get_cache().set(key, response, timeout)
+        return response
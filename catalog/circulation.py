@@ -0,0 +1,138 @@
+"""
+Loan operations: checking copies out, returning and reserving them, moving
+them in and out of maintenance, and renewing many loans at once.
+
+Every change is a conditional UPDATE, e.g. "set status to on loan where the
+copy is still available". That is the compare-and-set which makes two
+librarians lending the same copy at once safe: the database lets only one of
+the UPDATEs match, PostgreSQL by locking the row until the first transaction
+ends and re-checking the condition, SQLite by letting one writer at a time in.
+Reading the copy first and saving it afterwards, even with select_for_update(),
+would not be enough on SQLite, which ignores FOR UPDATE.
+
+QuerySet.update() bypasses the signal handlers, so these functions keep the
+counters (see catalog.stats) and the cached pages (see catalog.cache) of the
+copies they change themselves.
+"""
+import datetime
+from collections import OrderedDict
+
+from django.db import transaction
+
+from .bulk import chunked
+from .cache import BOOK_LIST, book_scope, invalidate, table_scope
+from .models import Book, BookInstance
+from .stats import adjust_copy_counter, adjust_counter
+
+RENEWED = 'renewed'
+NOT_ON_LOAN = 'not on loan'
+NOT_FOUND = 'not found'
+
+# Ids per statement, under SQLite's limit of bound parameters.
+LOOKUP_CHUNK = 500
+
+LOAN_PERIOD = datetime.timedelta(weeks=3)
+
+# For error messages, in a sentence.
+STATUS_NAMES = {'m': 'in maintenance', 'o': 'on loan', 'a': 'available', 'r': 'reserved'}
+
+
+class CirculationError(Exception):
+    """
+    The copy does not exist or is not in a state allowing the change.
+    """
+    pass
+
+
+def move_copy(copy_id, sources, status, **changes):
+    """
+    Move a copy to status, setting the other fields in changes, provided it
+    matches one of sources: dicts of lookups such as {'status': 'a'}, each
+    with a 'status', tried in order. Returns the status the copy had.
+    Raises CirculationError when the copy matches none of them.
+    """
+    with transaction.atomic():
+        for source in sources:
+            # The first statement of the transaction, so SQLite waits for any
+            # other writer here instead of failing with "database is locked".
+            if BookInstance.objects.filter(pk=copy_id, **source).update(status=status, **changes):
+                break
+        else:
+            current = BookInstance.objects.filter(pk=copy_id).values_list('status', flat=True).first()
+            if current is None:
+                raise CirculationError('No such copy.')
+            raise CirculationError('The copy is {0}.'.format(STATUS_NAMES.get(current, 'not available')))
+
+        previous = source['status']
+        book_id = BookInstance.objects.filter(pk=copy_id).values_list('book_id', flat=True).get()
+        adjust_counter('num_instances_available', int(status == 'a') - int(previous == 'a'))
+        adjust_copy_counter(book_id, previous, -1)
+        adjust_copy_counter(book_id, status, 1)
+        invalidate([BOOK_LIST, book_scope(book_id), table_scope(BookInstance), table_scope(Book)])
+    return previous
+
+
+def checkout(copy_id, borrower, due_back=None):
+    """
+    Lend a copy that is available, or reserved for the borrower.
+    """
+    return move_copy(copy_id, [{'status': 'r', 'borrower': borrower}, {'status': 'a'}], 'o',
+                     borrower=borrower, due_back=due_back or datetime.date.today() + LOAN_PERIOD,
+                     overdue_since=None)
+
+
+def return_copy(copy_id):
+    """
+    Take back a copy on loan, making it available again.
+    """
+    return move_copy(copy_id, [{'status': 'o'}], 'a', borrower=None, due_back=None, overdue_since=None)
+
+
+def reserve(copy_id, borrower):
+    """
+    Hold an available copy for a borrower, who is then the only one who can
+    check it out.
+    """
+    return move_copy(copy_id, [{'status': 'a'}], 'r', borrower=borrower, due_back=None)
+
+
+def make_available(copy_id):
+    """
+    Put a copy back on the shelf after maintenance, or cancel its reservation.
+    """
+    return move_copy(copy_id, [{'status': 'm'}, {'status': 'r'}], 'a', borrower=None, due_back=None)
+
+
+def send_to_maintenance(copy_id):
+    """
+    Take an available copy off the shelf.
+    """
+    return move_copy(copy_id, [{'status': 'a'}], 'm', borrower=None, due_back=None)
+
+
+def renew_loans(ids, renewal_date):
+    """
+    Move the due date of the copies on loan among ids to renewal_date.
+
+    All the copies are updated in one transaction, with one UPDATE per
+    LOOKUP_CHUNK ids. Returns a dict per id, in the order given, with the
+    id, the outcome (RENEWED, NOT_ON_LOAN or NOT_FOUND) and, for the copies
+    found, their book title, borrower and due date.
+    """
+    rows = OrderedDict((pk, {'id': pk, 'outcome': NOT_FOUND}) for pk in ids)
+    book_ids = set()
+    with transaction.atomic():
+        for chunk in chunked(list(rows), LOOKUP_CHUNK):
+            # Only copies still on loan when the UPDATE runs are renewed, the
+            # rows read back afterwards tell which ones those were.
+            BookInstance.objects.filter(pk__in=chunk, status__exact='o').update(
+                due_back=renewal_date, overdue_since=None)
+            copies = BookInstance.objects.filter(pk__in=chunk).values_list(
+                'id', 'status', 'due_back', 'book_id', 'book__title', 'borrower__username')
+            for pk, status, due_back, book_id, title, borrower in copies:
+                rows[pk].update(outcome=RENEWED if status == 'o' else NOT_ON_LOAN,
+                                title=title, borrower=borrower, due_back=due_back)
+                if status == 'o' and book_id is not None:
+                    book_ids.add(book_id)
+        invalidate([book_scope(pk) for pk in book_ids] + [table_scope(BookInstance)])
+    return list(rows.values())
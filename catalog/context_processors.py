@@ -0,0 +1,42 @@
+"""
+Template context shared by every page extending base_generic.html.
+"""
+from functools import lru_cache
+
+from django.core.urlresolvers import reverse
+
+
+@lru_cache(maxsize=None)
+def sidebar_urls():
+    # The sidebar links never change while the process runs, reverse them once.
+    return {
+        'index': reverse('catalog:index'),
+        'books': reverse('catalog:books'),
+        'authors': reverse('catalog:authors'),
+        'search': reverse('catalog:search'),
+        'my_borrowed': reverse('catalog:my-borrowed'),
+        'all_borrowed': reverse('catalog:all-borrowed'),
+        'login': reverse('login'),
+        'logout': reverse('logout'),
+    }
+
+
+def sidebar_variant(user):
+    """
+    Name the version of the sidebar a user sees, the key of its cached
+    fragment: 'anonymous', 'reader', 'staff' or 'librarian'.
+    """
+    if not user.is_authenticated():
+        return 'anonymous'
+    if not user.is_staff:
+        return 'reader'
+    if user.has_perm('catalog.can_mark_returned'):
+        return 'librarian'
+    return 'staff'
+
+
+def sidebar(request):
+    return {
+        'sidebar_urls': sidebar_urls(),
+        'sidebar_variant': sidebar_variant(request.user),
+    }
@@ -0,0 +1,3 @@
+"""
+Database backends with pooled connections, see catalog.db_pool.pool.
+"""
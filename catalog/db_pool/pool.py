@@ -0,0 +1,277 @@
+"""
+Pooled database connections for gunicorn workers.
+
+Django opens one connection per thread and, with CONN_MAX_AGE, keeps it for
+that thread; nothing caps how many a worker opens, checks them before use or
+opens them before the first request, so a deploy starting every worker at
+once opens every connection at once, on the first requests.
+
+The ENGINEs catalog.db_pool.postgresql and catalog.db_pool.sqlite3 (SQLite,
+for trying the pool out locally) are the stock backends with their
+connections taken from a ConnectionPool per process and database: closing a
+connection, which Django does after each request with CONN_MAX_AGE = 0,
+hands it back to the pool instead. The pool is configured with a 'POOL' dict
+next to the ENGINE in settings.DATABASES:
+
+    MAX_SIZE              connections per process at most (10); more
+                          threads than that wait for one to be handed back
+    MIN_SIZE              connections warm_up() opens (1)
+    TIMEOUT               seconds to wait for a connection (30), then
+                          OperationalError
+    HEALTH_CHECK_INTERVAL a connection idle for longer is tried with a
+                          SELECT 1 before it is handed out (30), 0 checks
+                          every time
+    MAX_LIFETIME          seconds after which a connection is closed rather
+                          than reused (500), None keeps it
+
+warm_up(), called by the gunicorn post_worker_init hook in gunicorn_conf.py,
+opens MIN_SIZE connections of every pooled database before the worker takes
+requests.
+"""
+import os
+import threading
+import time
+
+from django.db import connections
+
+DEFAULTS = {
+    'MAX_SIZE': 10,
+    'MIN_SIZE': 1,
+    'TIMEOUT': 30,
+    'HEALTH_CHECK_INTERVAL': 30,
+    'MAX_LIFETIME': 500,
+}
+
+# The alias Django gives the connections it opens without a database name,
+# e.g. to create the test database; those are not pooled.
+NO_DB_ALIAS = '__no_db__'
+
+
+class PoolExhausted(Exception):
+    """
+    Every connection of the pool stayed in use for the whole timeout.
+    """
+    pass
+
+
+def healthy(connection):
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+    except Exception:
+        # Any driver error: the connection is of no use.
+        return False
+    return True
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool(object):
+    """
+    DB-API connections opened by connect(), at most max_size of them at a
+    time, handed out most recently used first.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=30, health_check_interval=30, max_lifetime=500):
+        self.connect = connect
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_lifetime = max_lifetime
+        self.available = threading.Condition()
+        # (connection, last used) of the connections waiting to be handed out.
+        self.idle = []
+        # When each open connection, idle or not, was opened, by id().
+        self.opened = {}
+        self.closed = False
+
+    @property
+    def size(self):
+        return len(self.opened)
+
+    def expired(self, connection, now):
+        return self.max_lifetime is not None and now - self.opened[id(connection)] >= self.max_lifetime
+
+    def acquire(self):
+        deadline = time.time() + self.timeout
+        while True:
+            connection = None
+            with self.available:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise PoolExhausted('All {0} database connections stayed in use for {1} seconds.'.format(
+                            self.max_size, self.timeout))
+                    self.available.wait(remaining)
+                if self.idle:
+                    connection, last_used = self.idle.pop()
+                else:
+                    # Hold the place while connecting, outside the lock.
+                    placeholder = object()
+                    self.opened[id(placeholder)] = time.time()
+
+            if connection is None:
+                try:
+                    connection = self.connect()
+                finally:
+                    with self.available:
+                        del self.opened[id(placeholder)]
+                        if connection is not None:
+                            self.opened[id(connection)] = time.time()
+                        self.available.notify()
+                return connection
+
+            now = time.time()
+            if self.expired(connection, now) or (now - last_used >= self.health_check_interval
+                                                  and not healthy(connection)):
+                self.discard(connection)
+                continue
+            return connection
+
+    def release(self, connection, reusable=True):
+        """
+        Hand a connection back, or close it if it is broken or too old.
+        """
+        with self.available:
+            if id(connection) not in self.opened:
+                # Opened by another pool, e.g. before a fork.
+                close_quietly(connection)
+                return
+            if reusable and not self.closed and not self.expired(connection, time.time()):
+                self.idle.append((connection, time.time()))
+                self.available.notify()
+                return
+        self.discard(connection)
+
+    def discard(self, connection):
+        close_quietly(connection)
+        with self.available:
+            self.opened.pop(id(connection), None)
+            self.available.notify()
+
+    def fill(self, count):
+        """
+        Open connections until the pool has count of them, or max_size.
+        """
+        opened = []
+        try:
+            while self.size < min(count, self.max_size):
+                opened.append(self.acquire())
+        finally:
+            for connection in opened:
+                self.release(connection)
+
+    def close(self):
+        """
+        Close the idle connections, and the others when they are handed back.
+        """
+        with self.available:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for connection, last_used in idle:
+            self.discard(connection)
+
+    def stats(self):
+        with self.available:
+            return {'open': self.size, 'idle': len(self.idle), 'max_size': self.max_size}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, conn_params, connect, options):
+    """
+    The pool of this process for a database, created on first use. Pools
+    are per process: a worker forked from a master that already connected
+    starts with none.
+    """
+    key = (os.getpid(), alias, repr(sorted(conn_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            options = dict(DEFAULTS, **options)
+            pool = _pools[key] = ConnectionPool(
+                connect, max_size=options['MAX_SIZE'], timeout=options['TIMEOUT'],
+                health_check_interval=options['HEALTH_CHECK_INTERVAL'], max_lifetime=options['MAX_LIFETIME'])
+        return pool
+
+
+def close_pools(alias=None):
+    """
+    Close the pools of this process, of one database alias or all of them.
+    """
+    with _pools_lock:
+        keys = [key for key in _pools if alias is None or key[1] == alias]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        pool.close()
+
+
+class PooledDatabaseWrapperMixin(object):
+    """
+    Take the connections of a DatabaseWrapper from a pool and hand them back
+    on close().
+    """
+
+    @property
+    def pool_options(self):
+        return self.settings_dict.get('POOL') or {}
+
+    def get_pool(self, conn_params):
+        base = super(PooledDatabaseWrapperMixin, self)
+        return get_pool(self.alias, conn_params, lambda: base.get_new_connection(conn_params), self.pool_options)
+
+    def get_new_connection(self, conn_params):
+        if self.alias == NO_DB_ALIAS:
+            self.pool = None
+            return super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params)
+        self.pool = self.get_pool(conn_params)
+        try:
+            return self.pool.acquire()
+        except PoolExhausted as e:
+            # Raised inside connect(), which turns it into django.db.OperationalError.
+            raise self.Database.OperationalError(str(e))
+
+    def _close(self):
+        pool = getattr(self, 'pool', None)
+        if self.connection is None or pool is None:
+            return super(PooledDatabaseWrapperMixin, self)._close()
+        reusable = not self.errors_occurred or self.is_usable()
+        if reusable:
+            # Closed in the middle of a transaction, e.g. by an error.
+            try:
+                self.connection.rollback()
+            except self.Database.Error:
+                reusable = False
+        pool.release(self.connection, reusable)
+
+    def warm_up(self):
+        self.get_pool(self.get_connection_params()).fill(self.pool_options.get('MIN_SIZE', DEFAULTS['MIN_SIZE']))
+
+
+class PooledCreationMixin(object):
+    """
+    Close the pooled connections to the test database before dropping it.
+    """
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(self.connection.alias)
+        return super(PooledCreationMixin, self)._destroy_test_db(test_database_name, verbosity)
+
+
+def warm_up():
+    """
+    Open the first connections of every pooled database of this process.
+    """
+    for connection in connections.all():
+        if isinstance(connection, PooledDatabaseWrapperMixin):
+            connection.warm_up()
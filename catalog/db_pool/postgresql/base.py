@@ -0,0 +1,23 @@
+"""
+PostgreSQL with pooled connections, see catalog.db_pool.pool.
+"""
+from django.db.backends.postgresql import base, creation
+
+from ..pool import PooledCreationMixin, PooledDatabaseWrapperMixin
+
+
+class DatabaseCreation(PooledCreationMixin, creation.DatabaseCreation):
+    pass
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super(DatabaseWrapper, self).__init__(*args, **kwargs)
+        self.creation = DatabaseCreation(self)
+
+    def get_new_connection(self, conn_params):
+        connection = super(DatabaseWrapper, self).get_new_connection(conn_params)
+        # Set by the stock backend on new connections only.
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
@@ -0,0 +1,18 @@
+"""
+SQLite with pooled connections, see catalog.db_pool.pool. A stand-in for
+trying the pool without a PostgreSQL server.
+"""
+from django.db.backends.sqlite3 import base, creation
+
+from ..pool import PooledCreationMixin, PooledDatabaseWrapperMixin
+
+
+class DatabaseCreation(PooledCreationMixin, creation.DatabaseCreation):
+    pass
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super(DatabaseWrapper, self).__init__(*args, **kwargs)
+        self.creation = DatabaseCreation(self)
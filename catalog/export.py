@@ -0,0 +1,66 @@
+"""
+Catalog exports as CSV or JSON lines, in constant memory.
+
+Rows are read in primary key order, chunk_size at a time, each chunk starting
+after the last key of the previous one. Django 1.9's QuerySet.iterator() would
+still make psycopg2 fetch a whole table into memory, keyset chunks keep both
+the database and this process working on one chunk at a time. The rows are
+not a snapshot: changes made during a long export may or may not be in it.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Author, Book, BookInstance
+
+# dataset: (queryset, columns), columns may follow relations
+DATASETS = {
+    'authors': (Author.objects.all(), ('id', 'first_name', 'last_name', 'date_of_birth', 'date_of_death')),
+    'books': (Book.objects.all(), ('id', 'title', 'author_id', 'summary', 'isbn', 'language__language_name',
+                                   'copies_available', 'copies_on_loan', 'copies_maintenance', 'copies_reserved')),
+    'copies': (BookInstance.objects.all(), ('id', 'book_id', 'imprint', 'status', 'due_back',
+                                            'borrower_id', 'borrower__username')),
+    'genre-links': (Book.genre.through.objects.all(), ('id', 'book_id', 'genre_id', 'genre__name')),
+}
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def export_rows(dataset, chunk_size=2000):
+    """
+    Yield the rows of a dataset as tuples of DATASETS[dataset] columns.
+    """
+    queryset, columns = DATASETS[dataset]
+    last_pk = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list(*columns)[:chunk_size])
+        for row in rows:
+            yield row
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+class Echo(object):
+    # csv.writer writes to this and gets the line back instead of buffering it
+    def write(self, value):
+        return value
+
+
+def export_lines(dataset, format, chunk_size=2000):
+    """
+    Yield a dataset as lines of CSV (with a header) or JSON objects.
+    """
+    columns = DATASETS[dataset][1]
+    if format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        for row in export_rows(dataset, chunk_size):
+            yield writer.writerow(row)
+    else:
+        for row in export_rows(dataset, chunk_size):
+            yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
@@ -1,8 +1,13 @@
 from django import forms
+from django.contrib.auth.models import User
 
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 import datetime                                    # for checking the renewal date range.
+import uuid
+from collections import OrderedDict
+
+from .models import BookInstance
 
 
 class RenewBookForm(forms.Form):
@@ -21,3 +26,78 @@ class RenewBookForm(forms.Form):
 
 	#Remember to always return the cleaned data
         return data
+
+
+class CopiesField(forms.Field):
+    """
+    The ids of the copies ticked in a list, as UUIDs in the order given.
+    """
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            return list(OrderedDict.fromkeys(uuid.UUID(str(pk)) for pk in value))
+        except ValueError:
+            raise ValidationError(_('Invalid copy id'), code='invalid')
+
+
+class RenewBooksForm(RenewBookForm):
+    copies = CopiesField(error_messages={'required': _('Select the copies to renew')})
+
+
+class CheckoutForm(forms.Form):
+    borrower = forms.CharField(max_length=150, help_text="Username of the reader borrowing the copy.")
+    due_back = forms.DateField(help_text="Enter a date between now and 4 weeks (default 3).")
+
+    def clean_borrower(self):
+        try:
+            return User.objects.get(username=self.cleaned_data['borrower'])
+        except User.DoesNotExist:
+            raise ValidationError(_('No reader with this username'))
+
+    def clean_due_back(self):
+        data = self.cleaned_data['due_back']
+        if data < datetime.date.today():
+            raise ValidationError(_('Invalid date - due date in past'))
+        if data > datetime.date.today() + datetime.timedelta(weeks=4):
+            raise ValidationError(_('Invalid date - due date more than 4 weeks ahead'))
+        return data
+
+
+class BookInstanceAdminForm(forms.ModelForm):
+    """
+    The admin's form for an existing copy. Its status, due date and borrower
+    are read only there, and change through catalog.circulation instead.
+    """
+    CHANGES = (
+        ('', 'Leave as it is'),
+        ('checkout', 'Check out to the reader below'),
+        ('reserve', 'Reserve for the reader below'),
+        ('return', 'Return'),
+        ('available', 'Make available'),
+        ('maintenance', 'Send to maintenance'),
+    )
+    circulation = forms.ChoiceField(choices=CHANGES, required=False, label='Change availability')
+    reader = forms.CharField(max_length=150, required=False,
+                             help_text="Username of the reader, to check out or reserve the copy.")
+
+    class Meta:
+        model = BookInstance
+        fields = '__all__'
+
+    def clean_reader(self):
+        if not self.cleaned_data['reader']:
+            return None
+        try:
+            return User.objects.get(username=self.cleaned_data['reader'])
+        except User.DoesNotExist:
+            raise ValidationError(_('No reader with this username'))
+
+    def clean(self):
+        cleaned_data = super(BookInstanceAdminForm, self).clean()
+        if cleaned_data.get('circulation') in ('checkout', 'reserve') and not cleaned_data.get('reader') \
+                and 'reader' not in self.errors:
+            self.add_error('reader', _('Enter the reader to check out or reserve the copy for'))
+        return cleaned_data
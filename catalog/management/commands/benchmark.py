@@ -0,0 +1,174 @@
+import contextlib
+import datetime
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from catalog.benchmark import catalog_routes, compare, run_client, run_http, sample_requests
+from catalog.models import Author, Book, BookInstance
+
+
+def free_port():
+    with contextlib.closing(socket.socket()) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def gunicorn(workers, worker_class, threads):
+    """
+    Run the site under a local gunicorn for the duration of the block and
+    yield its base URL.
+    """
+    port = free_port()
+    env = dict(os.environ, DJANGO_ALLOWED_HOSTS='127.0.0.1')
+    if threads > 1:
+        # gunicorn_conf.py refuses threads with unpooled connections.
+        env.setdefault('DATABASE_POOL_MAX_SIZE', str(threads))
+    process = subprocess.Popen([
+        # gunicorn 19 has no __main__ module
+        sys.executable, '-c', 'from gunicorn.app.wsgiapp import run; run()', 'locallibrary.wsgi', '--config', 'gunicorn_conf.py',
+        '--bind', '127.0.0.1:{0}'.format(port),
+        '--workers', str(workers), '--worker-class', worker_class, '--threads', str(threads),
+        '--log-level', 'warning',
+    ], cwd=settings.BASE_DIR, env=env)
+    try:
+        deadline = time.time() + 60
+        while True:
+            if process.poll() is not None:
+                raise CommandError('gunicorn exited with status {0}.'.format(process.returncode))
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise CommandError('gunicorn did not start listening within a minute.')
+                time.sleep(0.2)
+        yield 'http://127.0.0.1:{0}'.format(port)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                                       stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Benchmark every catalog route through the test client and, optionally, over HTTP '
+            'against a local gunicorn, and write latency percentiles, throughput and queries per '
+            'request as JSON. Run it with DJANGO_DEBUG="" on a database seeded for the purpose.')
+
+    def add_arguments(self, parser):
+        seed = parser.add_argument_group('seeding, with seed_library, before the run')
+        for name in ('authors', 'books', 'copies', 'users'):
+            seed.add_argument('--' + name, type=int)
+        seed.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic library.')
+
+        parser.add_argument('--repeat', type=int, default=50, help='Requests per route.')
+        parser.add_argument('--routes', help='Comma-separated route names, all by default.')
+        parser.add_argument('--http', action='store_true', default=False,
+                            help='Also run over HTTP against a gunicorn started for the run.')
+        parser.add_argument('--server', help='Run over HTTP against this running server instead, e.g. http://127.0.0.1:8000.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent HTTP clients.')
+        parser.add_argument('--workers', type=int, default=2, help='gunicorn workers.')
+        parser.add_argument('--worker-class', default='sync', dest='worker_class', help='gunicorn worker class.')
+        parser.add_argument('--threads', type=int, default=1, help='Threads per gunicorn worker.')
+        parser.add_argument('--background', help='Route requested in a loop during the HTTP run, e.g. search.')
+        parser.add_argument('--background-clients', type=int, default=2, dest='background_clients',
+                            help='Clients requesting the background route.')
+        parser.add_argument('--output', '-o', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', help='A previous results file: report the routes that got slower.')
+
+    def handle(self, *args, **options):
+        if settings.DEBUG:
+            self.stderr.write('DEBUG is on: templates are not cached and every query is logged, '
+                              'set DJANGO_DEBUG="" for representative numbers.')
+        sizes = {name: options[name] for name in ('authors', 'books', 'copies', 'users') if options[name] is not None}
+        if sizes:
+            call_command('seed_library', seed=options['seed'], stdout=self.stdout, **sizes)
+
+        samples = sample_requests()
+        background = None
+        if options['background']:
+            if options['background'] not in samples:
+                raise CommandError('No sample request for: {0}'.format(options['background']))
+            background = samples[options['background']]
+        if options['routes']:
+            wanted = options['routes'].split(',')
+            unknown = [name for name in wanted if name not in samples]
+            if unknown:
+                raise CommandError('No sample request for: {0}'.format(', '.join(unknown)))
+            samples = {name: samples[name] for name in wanted}
+        skipped = sorted(set(catalog_routes()) - set(samples)) if not options['routes'] else []
+        for name in skipped:
+            self.stderr.write('Skipping {0}: the database has no row to request it with.'.format(name))
+
+        repeat, concurrency = max(options['repeat'], 1), max(options['concurrency'], 1)
+        results = {
+            'commit': current_commit(),
+            'created': datetime.datetime.utcnow().isoformat() + 'Z',
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+            'dataset': {
+                'authors': Author.objects.count(), 'books': Book.objects.count(),
+                'copies': BookInstance.objects.count(), 'users': User.objects.count(),
+            },
+            'options': {
+                'repeat': repeat, 'concurrency': concurrency, 'workers': options['workers'],
+                'worker_class': options['worker_class'], 'threads': options['threads'],
+                'background': options['background'],
+                'background_clients': options['background_clients'] if background else 0,
+            },
+            'skipped': skipped,
+            'client': run_client(samples, repeat),
+            'http': None,
+        }
+        self.report('Test client', results['client'])
+
+        if options['server']:
+            results['http'] = run_http(options['server'], samples, repeat, concurrency,
+                                       background=background, background_clients=options['background_clients'])
+        elif options['http']:
+            with gunicorn(options['workers'], options['worker_class'], options['threads']) as url:
+                results['http'] = run_http(url, samples, repeat, concurrency,
+                                           background=background, background_clients=options['background_clients'])
+        if results['http'] is not None:
+            title = 'HTTP, {0} concurrent clients'.format(concurrency)
+            if background:
+                title += ', {0} more requesting {1}'.format(options['background_clients'], options['background'])
+            self.report(title, results['http'])
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS('Wrote {0}.'.format(options['output'])))
+        if options['compare']:
+            with open(options['compare']) as previous:
+                regressions = list(compare(json.load(previous), results))
+            for section, name, metric, before, after in regressions:
+                self.stdout.write(self.style.WARNING('{0} {1} {2}: {3} -> {4}'.format(section, name, metric, before, after)))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS('No regressions against {0}.'.format(options['compare'])))
+
+    def report(self, title, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        self.stdout.write('{0:<26} {1:>9} {2:>9} {3:>9} {4:>9} {5:>7} {6:>7}'.format(
+            'route', 'p50 ms', 'p90 ms', 'p99 ms', 'req/s', 'errors', 'queries'))
+        for name, result in sorted(results.items()):
+            self.stdout.write('{0:<26} {1:>9} {2:>9} {3:>9} {4:>9} {5:>7} {6:>7}'.format(
+                name, result['p50_ms'], result['p90_ms'], result['p99_ms'], result['requests_per_second'],
+                result['errors'], result.get('queries', '')))
@@ -0,0 +1,59 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from catalog import views
+from catalog.models import BookInstance
+from catalog.pagination import KeysetPaginator, encode_cursor, keyset_order
+from catalog.queryplans import explain_queryset
+
+
+class Command(BaseCommand):
+    help = ('Print the query plan and median run time of the queries behind the busiest '
+            'catalog pages. Run it before and after an index change on a seeded database '
+            '(see seed_library) to compare.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query for the timing.')
+
+    def handle(self, *args, **options):
+        for name, queryset in self.hot_paths():
+            timings = []
+            for run in range(max(options['repeat'], 1)):
+                started = time.time()
+                list(queryset.all())
+                timings.append((time.time() - started) * 1000)
+            timings.sort()
+            self.stdout.write(self.style.MIGRATE_HEADING('{0}: {1:.2f} ms median'.format(name, timings[len(timings) // 2])))
+            for line in explain_queryset(queryset) or ['(no EXPLAIN support on this database)']:
+                self.stdout.write('  ' + line)
+
+    def paginator(self, view_class, user=None):
+        # Build the list query exactly the way the view does.
+        view = view_class()
+        view.request = RequestFactory().get('/')
+        view.request.user = user or AnonymousUser()
+        view.kwargs = {}
+        return KeysetPaginator(view.get_queryset(), view.paginate_by, view.keyset_ordering)
+
+    def first_page(self, view_class, user=None):
+        paginator = self.paginator(view_class, user)
+        return paginator.seek_queryset()[:paginator.per_page]
+
+    def hot_paths(self):
+        yield 'Book list, first page', self.first_page(views.BookListView)
+        yield 'Author list, first page', self.first_page(views.AuthorListView)
+
+        on_loan = BookInstance.objects.filter(status='o')
+        borrower = User.objects.filter(pk__in=on_loan.values('borrower')).first()
+        if borrower is not None:
+            yield 'Loans of one borrower, first page', self.first_page(views.LoanedBooksByUserListView, borrower)
+        yield 'All loans, first page', self.first_page(views.LoanedBooksAllListView)
+
+        paginator = self.paginator(views.LoanedBooksAllListView)
+        middle = keyset_order(on_loan, paginator.keys)[on_loan.count() // 2:].first()
+        if middle is not None:
+            cursor = encode_cursor(getattr(middle, key) for key in paginator.keys)
+            yield 'All loans, keyset page halfway through', paginator.seek_queryset(cursor)[:paginator.per_page + 1]
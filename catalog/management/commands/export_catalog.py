@@ -0,0 +1,34 @@
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.export import DATASETS, FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    help = ('Write a catalog table as CSV or JSON lines, reading it a chunk at a time '
+            'so memory use does not grow with the table.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', '-o', help='File to write, gzipped if it ends in .gz. Defaults to standard output.')
+        parser.add_argument('--chunk-size', type=int, default=2000, dest='chunk_size', help='Rows read per query.')
+
+    def handle(self, *args, **options):
+        lines = export_lines(options['dataset'], options['format'], max(options['chunk_size'], 1))
+        output = options['output']
+        if not output:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        opener = gzip.open if output.endswith('.gz') else open
+        try:
+            with opener(output, 'wt', encoding='utf-8', newline='') as f:
+                count = -1 if options['format'] == 'csv' else 0
+                for line in lines:
+                    f.write(line)
+                    count += 1
+        except IOError as e:
+            raise CommandError('Cannot write {0}: {1}'.format(output, e))
+        self.stderr.write('Exported {0} {1} to {2}.'.format(count, options['dataset'], output))
@@ -0,0 +1,292 @@
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+import uuid
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from catalog.bulk import bulk_insert, chunked
+from catalog.cache import AUTHOR_LIST, BOOK_LIST, book_scope, catalog_table_scopes, invalidate
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.search import get_search_backend
+from catalog.stats import rebuild_catalog_counters, rebuild_copy_counters
+
+# Each record (a CSV row or a JSON object on its own line) is one copy of a
+# book. Books are matched on ISBN, authors on first and last name, genres and
+# languages on name, borrowers on username; the ones not in the database yet
+# are created, existing ones are reused as they are. A record without any copy
+# field only adds the book. genres is a list in JSON, "|"-separated in CSV.
+FIELDS = (
+    'isbn', 'title', 'summary',
+    'author_first_name', 'author_last_name', 'author_date_of_birth', 'author_date_of_death',
+    'language', 'genres',
+    'copy_id', 'imprint', 'status', 'due_back', 'borrower',
+)
+COPY_FIELDS = ('copy_id', 'imprint', 'status', 'due_back', 'borrower')
+STATUSES = [code for code, label in BookInstance.LOAN_STATUS]
+
+# Lookups by value stay under SQLite's limit of bound parameters.
+LOOKUP_CHUNK = 500
+
+
+def text(record, name, model=None, field=None):
+    value = record.get(name)
+    value = '' if value is None else str(value).strip()
+    if model is not None:
+        max_length = model._meta.get_field(field).max_length
+        if len(value) > max_length:
+            raise ValueError('{0} is longer than {1} characters'.format(name, max_length))
+    return value
+
+
+def date(record, name):
+    value = text(record, name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError('{0} is not a valid YYYY-MM-DD date: {1}'.format(name, value))
+    return parsed
+
+
+def clean(record):
+    """
+    Check a record and return it as {'book': {...}, 'copy': {...} or None}.
+    Raises ValueError when it cannot be imported.
+    """
+    isbn = text(record, 'isbn', Book, 'isbn')
+    title = text(record, 'title', Book, 'title')
+    if not isbn or not title:
+        raise ValueError('isbn and title are required')
+    genres = record.get('genres') or []
+    if not isinstance(genres, list):
+        genres = str(genres).split('|')
+    book = {
+        'isbn': isbn,
+        'title': title,
+        'summary': text(record, 'summary'),
+        'author': (text(record, 'author_first_name', Author, 'first_name'),
+                   text(record, 'author_last_name', Author, 'last_name')),
+        'author_dates': (date(record, 'author_date_of_birth'), date(record, 'author_date_of_death')),
+        'language': text(record, 'language', Language, 'language_name'),
+        'genres': [name for name in (str(genre).strip() for genre in genres) if name],
+    }
+    for name in book['genres']:
+        if len(name) > Genre._meta.get_field('name').max_length:
+            raise ValueError('genre {0!r} is too long'.format(name))
+
+    if not any(text(record, name) for name in COPY_FIELDS):
+        return {'book': book, 'copy': None}
+    status = text(record, 'status') or BookInstance._meta.get_field('status').default
+    if status not in STATUSES:
+        raise ValueError('status must be one of {0}'.format(', '.join(STATUSES)))
+    copy_id = text(record, 'copy_id')
+    copy = {
+        'id': uuid.UUID(copy_id) if copy_id else uuid.uuid4(),
+        'imprint': text(record, 'imprint', BookInstance, 'imprint'),
+        'status': status,
+        'due_back': date(record, 'due_back'),
+        'borrower': text(record, 'borrower'),
+    }
+    return {'book': book, 'copy': copy}
+
+
+class Command(BaseCommand):
+    help = ('Import books, authors, genres, languages and copies from CSV or JSON lines files, '
+            'one copy per record. Columns: ' + ', '.join(FIELDS) + '.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', metavar='path',
+                            help='.csv or .jsonl file, optionally gzipped (.csv.gz). "-" reads standard input.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format, by default from the file name.')
+        parser.add_argument('--batch-size', type=int, default=1000, dest='batch_size',
+                            help='Records written per transaction.')
+        parser.add_argument('--progress-every', type=int, default=100000, dest='progress_every',
+                            help='Report throughput every this many records.')
+
+    def handle(self, *args, **options):
+        self.batch_size = max(options['batch_size'], 1)
+        # value -> primary key of the rows seen so far, so each is looked up once
+        self.maps = {'authors': {}, 'genres': {}, 'languages': {}, 'books': {}, 'borrowers': {}}
+        self.created = Counter()
+        self.new_book_ids, self.touched_book_ids = [], set()
+        self.records = self.skipped = 0
+        self.started = time.time()
+
+        next_report = options['progress_every']
+        try:
+            for path in options['paths']:
+                for batch in chunked(self.read(path, options['format']), self.batch_size):
+                    self.batch_new_book_ids, self.batch_touched_book_ids = [], set()
+                    with transaction.atomic():
+                        self.import_batch(batch)
+                    self.new_book_ids.extend(self.batch_new_book_ids)
+                    self.touched_book_ids.update(self.batch_touched_book_ids)
+                    self.records += len(batch)
+                    if options['progress_every'] and self.records >= next_report:
+                        self.stdout.write(self.throughput())
+                        next_report += options['progress_every']
+        finally:
+            # Also when a later batch fails: the ones before it are committed.
+            if self.records:
+                self.update_derived_data()
+
+        self.stdout.write(self.style.SUCCESS('Imported {0}. {1}'.format(
+            ', '.join('{0} {1}'.format(self.created[name], name)
+                      for name in ('authors', 'genres', 'languages', 'books', 'copies')),
+            self.throughput())))
+        if self.skipped:
+            self.stdout.write(self.style.WARNING('Skipped {0} records, see the errors above.'.format(self.skipped)))
+
+    def update_derived_data(self):
+        # bulk_create() bypasses the signal handlers
+        rebuild_catalog_counters()
+        rebuild_copy_counters()
+        get_search_backend().index_books(self.new_book_ids)
+        invalidate([BOOK_LIST, AUTHOR_LIST] + catalog_table_scopes() + [book_scope(pk) for pk in self.touched_book_ids])
+
+    def throughput(self):
+        elapsed = max(time.time() - self.started, 0.001)
+        return '{0} records in {1:.1f}s ({2:.0f} records/s).'.format(self.records, elapsed, self.records / elapsed)
+
+    def read(self, path, format=None):
+        """
+        Yield the cleaned records of a file, reporting and skipping bad ones.
+        """
+        name = path[:-3] if path.endswith('.gz') else path
+        format = format or {'.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl'}.get(name[name.rfind('.'):])
+        if format is None:
+            raise CommandError('Cannot tell the format of {0}, use --format.'.format(path))
+        try:
+            if path == '-':
+                stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+            elif path.endswith('.gz'):
+                stream = gzip.open(path, 'rt', encoding='utf-8', newline='')
+            else:
+                stream = open(path, encoding='utf-8', newline='')
+        except IOError as e:
+            raise CommandError('Cannot read {0}: {1}'.format(path, e))
+
+        with stream:
+            if format == 'csv':
+                records = enumerate(csv.DictReader(stream), 2)
+            else:
+                records = ((number, line) for number, line in enumerate(stream, 1) if line.strip())
+            for number, record in records:
+                try:
+                    if format == 'jsonl':
+                        record = json.loads(record)
+                        if not isinstance(record, dict):
+                            raise ValueError('not a JSON object')
+                    yield clean(record)
+                except ValueError as e:
+                    self.skipped += 1
+                    self.stderr.write('{0}:{1}: skipped, {2}'.format(path, number, e))
+
+    def import_batch(self, rows):
+        books = [row['book'] for row in rows]
+        self.resolve_authors(books)
+        self.resolve('genres', Genre, 'name', {name for book in books for name in book['genres']},
+                      lambda name: Genre(name=name))
+        self.resolve('languages', Language, 'language_name', {book['language'] for book in books if book['language']},
+                     lambda name: Language(language_name=name))
+        self.resolve_books(books)
+
+        copies = [row['copy'] for row in rows if row['copy'] is not None]
+        self.resolve('borrowers', User, 'username', {copy['borrower'] for copy in copies if copy['borrower']})
+        existing = set()
+        for ids in chunked([copy['id'] for copy in copies], LOOKUP_CHUNK):
+            existing.update(BookInstance.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+        objects, seen = [], set()
+        for row in rows:
+            copy = row['copy']
+            if copy is None or copy['id'] in existing or copy['id'] in seen:
+                continue
+            seen.add(copy['id'])
+            if copy['borrower'] and copy['borrower'] not in self.maps['borrowers']:
+                self.stderr.write('Unknown borrower {0}, copy {1} imported without one.'.format(copy['borrower'], copy['id']))
+            book_id = self.maps['books'][row['book']['isbn']]
+            self.batch_touched_book_ids.add(book_id)
+            objects.append(BookInstance(
+                id=copy['id'], book_id=book_id, imprint=copy['imprint'], status=copy['status'],
+                due_back=copy['due_back'], borrower_id=self.maps['borrowers'].get(copy['borrower'])))
+        bulk_insert(BookInstance, objects, self.batch_size)
+        self.created['copies'] += len(objects)
+
+    def resolve(self, name, model, field, values, make=None):
+        """
+        Add the primary keys of the rows whose field has one of values to
+        self.maps[name], creating the missing rows with make(value) if given.
+        Returns the values of the rows created.
+        """
+        known = self.maps[name]
+        values = sorted(value for value in values if value not in known)
+        for chunk in chunked(values, LOOKUP_CHUNK):
+            for value, pk in model.objects.filter(**{field + '__in': chunk}).values_list(field, 'pk'):
+                known.setdefault(value, pk)
+        missing = [value for value in values if value not in known]
+        if not missing or make is None:
+            return []
+        bulk_insert(model, [make(value) for value in missing], self.batch_size)
+        self.created[name] += len(missing)
+        # bulk_create() does not set primary keys on every database, read them back
+        for chunk in chunked(missing, LOOKUP_CHUNK):
+            for value, pk in model.objects.filter(**{field + '__in': chunk}).values_list(field, 'pk'):
+                known.setdefault(value, pk)
+        return missing
+
+    def resolve_authors(self, books):
+        # Authors are keyed on two columns, look them up by last name and match in Python.
+        known = self.maps['authors']
+        wanted = {}
+        for book in books:
+            if any(book['author']) and book['author'] not in known:
+                wanted.setdefault(book['author'], book['author_dates'])
+        if not wanted:
+            return
+
+        def load(keys):
+            for chunk in chunked(sorted({last for first, last in keys}), LOOKUP_CHUNK):
+                for first, last, pk in Author.objects.filter(last_name__in=chunk).values_list('first_name', 'last_name', 'pk'):
+                    known.setdefault((first, last), pk)
+
+        load(wanted)
+        missing = sorted(key for key in wanted if key not in known)
+        if missing:
+            bulk_insert(Author, [
+                Author(first_name=first, last_name=last, date_of_birth=wanted[first, last][0],
+                       date_of_death=wanted[first, last][1])
+                for first, last in missing], self.batch_size)
+            self.created['authors'] += len(missing)
+            load(missing)
+
+    def resolve_books(self, books):
+        by_isbn = {}
+        for book in books:
+            by_isbn.setdefault(book['isbn'], book)
+
+        def make(isbn):
+            book = by_isbn[isbn]
+            return Book(isbn=isbn, title=book['title'], summary=book['summary'],
+                        author_id=self.maps['authors'].get(book['author']),
+                        language_id=self.maps['languages'].get(book['language']))
+
+        created = self.resolve('books', Book, 'isbn', by_isbn, make)
+        Through = Book.genre.through
+        bulk_insert(Through, [
+            Through(book_id=self.maps['books'][isbn], genre_id=self.maps['genres'][name])
+            for isbn in created for name in set(by_isbn[isbn]['genres'])
+        ], self.batch_size)
+        self.batch_new_book_ids.extend(self.maps['books'][isbn] for isbn in created)
+
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from catalog.models import QueryStat
+from catalog.querystats import full_scan, percentile
+
+ORDERS = {
+    'total': lambda stat: stat.total_ms,
+    'mean': lambda stat: stat.total_ms / stat.calls if stat.calls else 0,
+    'p99': lambda stat: percentile(stat, 0.99) or 0,
+    'calls': lambda stat: stat.calls,
+    'slow': lambda stat: stat.slow_calls,
+}
+
+
+class Command(BaseCommand):
+    help = ('List the query fingerprints of the catalog and admin views that cost the most, '
+            'recorded with CATALOG_QUERYSTATS on, with the plans of their slow calls. '
+            'A * marks a plan scanning a whole table, usually a missing index.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--order', choices=sorted(ORDERS), default='total',
+                            help='Rank by total time (default), mean time, p99, calls or slow calls.')
+        parser.add_argument('--limit', type=int, default=20, help='How many fingerprints to list.')
+        parser.add_argument('--plans', action='store_true', default=False, help='Print the query plans.')
+        parser.add_argument('--full-scans', action='store_true', default=False, dest='full_scans',
+                            help='Only list the fingerprints whose plan scans a whole table.')
+        parser.add_argument('--reset', action='store_true', default=False, help='Delete the stats and exit.')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = QueryStat.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS('Deleted the stats of {0} fingerprints.'.format(deleted)))
+            return
+
+        stats = list(QueryStat.objects.all())
+        if options['full_scans']:
+            stats = [stat for stat in stats if full_scan(stat.plan)]
+        if not stats:
+            self.stdout.write(self.style.WARNING('No query stats: set CATALOG_QUERYSTATS and serve some requests.'))
+            return
+        stats.sort(key=ORDERS[options['order']], reverse=True)
+
+        self.stdout.write('{0:>8} {1:>10} {2:>8} {3:>8} {4:>8} {5:>8} {6:>6}  {7}'.format(
+            'calls', 'total ms', 'mean ms', 'p50 ms', 'p99 ms', 'max ms', 'slow', 'view / query'))
+        for stat in stats[:max(options['limit'], 1)]:
+            self.stdout.write('{0:>8} {1:>10.1f} {2:>8.2f} {3:>8.2f} {4:>8.2f} {5:>8.1f} {6:>6}{7} {8}'.format(
+                stat.calls, stat.total_ms, stat.total_ms / stat.calls if stat.calls else 0,
+                percentile(stat, 0.5), percentile(stat, 0.99), stat.max_ms, stat.slow_calls,
+                '*' if full_scan(stat.plan) else ' ', stat.view))
+            self.stdout.write('    ' + stat.sql)
+            if options['plans'] and stat.plan:
+                self.stdout.write(self.style.MIGRATE_HEADING('    plan of a {0:.1f} ms call:'.format(stat.plan_ms)))
+                for line in stat.plan.splitlines():
+                    self.stdout.write('      ' + line)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.stats import (
+    compute_catalog_counts, find_copy_counter_drift, get_catalog_counts,
+    rebuild_catalog_counters, rebuild_copy_counters,
+)
+
+
+class Command(BaseCommand):
+    help = 'Recount the index page counters and the per-book copy counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true', dest='verify', default=False,
+            help='Only report counters that have drifted, without fixing them. '
+                 'Exits with an error when any are found.',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            self.verify()
+            return
+
+        counts = rebuild_catalog_counters()
+        for name in sorted(counts):
+            self.stdout.write('{0}: {1}'.format(name, counts[name]))
+        drift = rebuild_copy_counters()
+        self.stdout.write(self.style.SUCCESS('Fixed copy counters on {0} book(s).'.format(len(drift))))
+
+    def verify(self):
+        problems = 0
+        stored, actual = get_catalog_counts(), compute_catalog_counts()
+        for name in sorted(actual):
+            if stored.get(name) != actual[name]:
+                problems += 1
+                self.stdout.write('{0}: stored {1}, actual {2}'.format(name, stored.get(name), actual[name]))
+        for book_id, expected in sorted(find_copy_counter_drift().items()):
+            problems += 1
+            self.stdout.write('Book {0}: expected {1}'.format(
+                book_id, ', '.join('{0}={1}'.format(k, v) for k, v in sorted(expected.items()))))
+        if problems:
+            raise CommandError('{0} counter(s) out of date, run rebuild_counters to fix them.'.format(problems))
+        self.stdout.write(self.style.SUCCESS('All counters are correct.'))
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of the catalog from scratch.'
+
+    def handle(self, *args, **options):
+        started = time.time()
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt the {0} in {1:.1f}s.'.format(
+            backend.__class__.__name__, time.time() - started)))
@@ -0,0 +1,98 @@
+import smtplib
+from collections import OrderedDict
+from datetime import date
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.models import BookInstance, ScanCheckpoint
+from catalog.pagination import KeysetPaginator, encode_cursor
+
+CHECKPOINT = 'scan_overdue'
+
+
+def reminder(borrower, copies):
+    lines = ['Dear {0},'.format(borrower.get_full_name() or borrower.username), '',
+             'The following books are overdue, please return or renew them:', '']
+    lines.extend('  {0} (due {1})'.format(copy.book.title if copy.book else copy.imprint, copy.due_back)
+                 for copy in copies)
+    return EmailMessage('Overdue library books', '\n'.join(lines), settings.DEFAULT_FROM_EMAIL, [borrower.email])
+
+
+class Command(BaseCommand):
+    help = ('Flag the loans that have become overdue since the last run and email their borrowers. '
+            'Meant to run daily, e.g. from cron. Reminders that cannot be sent are reported, not retried.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, dest='batch_size',
+                            help='Loans flagged per transaction, their reminders share one mail connection.')
+        parser.add_argument('--full', action='store_true', dest='full', default=False,
+                            help='Scan every overdue loan not flagged yet, not only those due after the '
+                                 'checkpoint, e.g. after due dates were moved back by hand. '
+                                 'Leaves the checkpoint where it is.')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        today = date.today()
+        checkpoint, _ = ScanCheckpoint.objects.get_or_create(name=CHECKPOINT)
+        cursor = None if options['full'] else checkpoint.position or None
+
+        # Loans are scanned in (due_back, id) order, the index the loan lists
+        # use, from where the previous run stopped. Loans renewed after being
+        # flagged are due again after the checkpoint and get picked up then.
+        overdue = BookInstance.objects.filter(status__exact='o', due_back__lt=today, overdue_since__isnull=True)
+        paginator = KeysetPaginator(overdue, batch_size, ('due_back', 'id'))
+        flagged = sent = failed = 0
+        while True:
+            copies = list(paginator.seek_queryset(cursor).select_related('book', 'borrower')[:batch_size])
+            if not copies:
+                break
+            cursor = encode_cursor([copies[-1].due_back, copies[-1].id])
+            with transaction.atomic():
+                BookInstance.objects.filter(pk__in=[copy.pk for copy in copies]).update(overdue_since=today)
+                if not options['full']:
+                    checkpoint.position = cursor
+                    checkpoint.save()
+            flagged += len(copies)
+            # Only once the flags are committed, so a failure to send or to
+            # flag never gets the same borrowers emailed twice, and without
+            # holding the transaction open over the SMTP round trips.
+            batch_sent, batch_failed = self.notify(copies)
+            sent += batch_sent
+            failed += batch_failed
+
+        self.stdout.write(self.style.SUCCESS('Flagged {0} overdue loan(s), sent {1} reminder(s).'.format(flagged, sent)))
+        if failed:
+            self.stdout.write(self.style.WARNING('{0} reminder(s) could not be sent, see the errors above.'.format(failed)))
+
+    def notify(self, copies):
+        """
+        Email each borrower of the copies one reminder, through a single
+        connection of the configured EMAIL_BACKEND. Returns the number sent
+        and the number that failed.
+        """
+        by_borrower = OrderedDict()
+        for copy in copies:
+            if copy.borrower is not None and copy.borrower.email:
+                by_borrower.setdefault(copy.borrower, []).append(copy)
+        if not by_borrower:
+            return 0, 0
+        sent = failed = 0
+        connection = get_connection()
+        try:
+            connection.open()
+            for borrower, loans in by_borrower.items():
+                try:
+                    sent += connection.send_messages([reminder(borrower, loans)]) or 0
+                except (smtplib.SMTPException, OSError) as e:
+                    failed += 1
+                    self.stderr.write('Could not email {0}: {1}'.format(borrower.email, e))
+        except (smtplib.SMTPException, OSError) as e:
+            # Could not connect at all.
+            failed = len(by_borrower) - sent
+            self.stderr.write('Could not send reminders: {0}'.format(e))
+        finally:
+            connection.close()
+        return sent, failed
@@ -0,0 +1,114 @@
+import datetime
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.bulk import bulk_insert
+from catalog.cache import AUTHOR_LIST, BOOK_LIST, catalog_table_scopes, invalidate
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.search import get_search_backend
+from catalog.stats import rebuild_catalog_counters, rebuild_copy_counters
+
+GENRES = ['Fantasy', 'Science Fiction', 'Poetry', 'History', 'Biography', 'Crime', 'Romance', 'Travel']
+LANGUAGES = ['English', 'French', 'Arabic', 'Farsi', 'Swahili']
+WORDS = ('river night stone garden letter winter empire silent house shadow city glass '
+         'journey king song fire island memory storm daughter war light road').split()
+FIRST_NAMES = 'Amina John Sara Omar Grace Ali Fatima David Mary Yusuf Leila Peter'.split()
+LAST_NAMES = 'Smith Seif Deng Garang Achol Brown Hassan Kuol Malik Wani Lado Taban'.split()
+
+# Share of copies in each status
+STATUS_WEIGHTS = [('a', 40), ('o', 40), ('m', 10), ('r', 10)]
+
+
+class Command(BaseCommand):
+    help = ('Fill the database with a synthetic library, for benchmarks and query plans. '
+            'Adds to whatever is already there.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--books', type=int, default=2000)
+        parser.add_argument('--copies', type=int, default=10000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--batch-size', type=int, default=1000, dest='batch_size')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible datasets.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.time()
+
+        with transaction.atomic():
+            genres = [Genre.objects.get_or_create(name=name)[0] for name in GENRES]
+            languages = [Language.objects.get_or_create(language_name=name)[0] for name in LANGUAGES]
+            user_ids = self.create_users(options['users'])
+            author_ids = self.create_authors(options['authors'])
+            book_ids = self.create_books(options['books'], author_ids, genres, languages)
+            self.create_copies(options['copies'], book_ids, user_ids)
+
+        # bulk_create() bypasses the signal handlers
+        rebuild_catalog_counters()
+        rebuild_copy_counters()
+        get_search_backend().index_books(book_ids)
+        invalidate([BOOK_LIST, AUTHOR_LIST] + catalog_table_scopes())
+        self.stdout.write(self.style.SUCCESS('Seeded {0} authors, {1} books, {2} copies and {3} users in {4:.1f}s.'.format(
+            options['authors'], options['books'], options['copies'], options['users'], time.time() - started)))
+
+    def insert(self, model, objects):
+        bulk_insert(model, objects, self.batch_size)
+
+    def bulk_create(self, model, objects):
+        # Returns the new primary keys, which bulk_create() does not set on every database.
+        last_id = model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        self.insert(model, objects)
+        return list(model.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True))
+
+    def create_users(self, count):
+        password = make_password(None)
+        offset = User.objects.count()
+        return self.bulk_create(User, [
+            User(username='reader{0}'.format(offset + num), password=password) for num in range(count)])
+
+    def create_authors(self, count):
+        today = datetime.date.today()
+        return self.bulk_create(Author, [
+            Author(first_name=self.rng.choice(FIRST_NAMES), last_name=self.rng.choice(LAST_NAMES),
+                   date_of_birth=today - datetime.timedelta(days=self.rng.randint(20 * 365, 90 * 365)))
+            for num in range(count)])
+
+    def create_books(self, count, author_ids, genres, languages):
+        book_ids = self.bulk_create(Book, [
+            Book(title=' '.join(self.rng.sample(WORDS, self.rng.randint(1, 4))).capitalize(),
+                 summary=' '.join(self.rng.choice(WORDS) for word in range(30)),
+                 isbn=str(self.rng.randint(10 ** 12, 10 ** 13 - 1)),
+                 author_id=self.rng.choice(author_ids) if author_ids else None,
+                 language=self.rng.choice(languages))
+            for num in range(count)])
+        Through = Book.genre.through
+        self.insert(Through, [
+            Through(book_id=book_id, genre_id=genre.pk)
+            for book_id in book_ids for genre in self.rng.sample(genres, self.rng.randint(1, 2))
+        ])
+        return book_ids
+
+    def create_copies(self, count, book_ids, user_ids):
+        statuses = [status for status, weight in STATUS_WEIGHTS for num in range(weight)]
+        today = datetime.date.today()
+        copies = []
+        for num in range(count):
+            status = self.rng.choice(statuses)
+            on_loan = status == 'o'
+            copies.append(BookInstance(
+                book_id=self.rng.choice(book_ids) if book_ids else None,
+                imprint='Seeded imprint, {0}'.format(self.rng.randint(1950, 2018)),
+                status=status,
+                due_back=today + datetime.timedelta(days=self.rng.randint(-30, 28)) if on_loan else None,
+                borrower_id=self.rng.choice(user_ids) if on_loan and user_ids else None,
+            ))
+            if len(copies) == self.batch_size:
+                self.insert(BookInstance, copies)
+                copies = []
+        self.insert(BookInstance, copies)
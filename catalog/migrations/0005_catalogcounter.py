@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 04:36
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    Author = apps.get_model('catalog', 'Author')
+    Book = apps.get_model('catalog', 'Book')
+    BookInstance = apps.get_model('catalog', 'BookInstance')
+    CatalogCounter = apps.get_model('catalog', 'CatalogCounter')
+    counts = {
+        'num_books': Book.objects.count(),
+        'num_instances': BookInstance.objects.count(),
+        'num_instances_available': BookInstance.objects.filter(status='a').count(),
+        'num_authors': Author.objects.count(),
+    }
+    CatalogCounter.objects.bulk_create([CatalogCounter(name=name, value=value) for name, value in counts.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_auto_20180709_2134'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
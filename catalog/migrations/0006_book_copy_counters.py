@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 04:37
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+
+COPY_COUNTER_FIELDS = {
+    'a': 'copies_available',
+    'o': 'copies_on_loan',
+    'm': 'copies_maintenance',
+    'r': 'copies_reserved',
+}
+
+
+def populate_copy_counters(apps, schema_editor):
+    Book = apps.get_model('catalog', 'Book')
+    BookInstance = apps.get_model('catalog', 'BookInstance')
+    rows = (BookInstance.objects.filter(book__isnull=False, status__in=COPY_COUNTER_FIELDS)
+            .values_list('book_id', 'status').annotate(n=Count('id')).order_by())
+    for book_id, status, n in rows:
+        Book.objects.filter(pk=book_id).update(**{COPY_COUNTER_FIELDS[status]: n})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_catalogcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='copies_available',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_maintenance',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_on_loan',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_reserved',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_copy_counters, migrations.RunPython.noop),
+    ]
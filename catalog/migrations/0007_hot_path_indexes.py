@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 04:46
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# Partial indexes covering only copies on loan, which is all the loan lists
+# ever read. Only PostgreSQL gets them: SQLite cannot use a partial index when
+# the status is a bound parameter, and MySQL has none.
+PARTIAL_INDEXES = [
+    ('catalog_bookinstance_on_loan_due_back', ['due_back', 'id']),
+    ('catalog_bookinstance_on_loan_borrower_due_back', ['borrower_id', 'due_back', 'id']),
+]
+
+
+def create_partial_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    qn = schema_editor.quote_name
+    for name, columns in PARTIAL_INDEXES:
+        schema_editor.execute("CREATE INDEX {0} ON {1} ({2}) WHERE {3} = 'o'".format(
+            qn(name), qn('catalog_bookinstance'), ', '.join(qn(column) for column in columns), qn('status')))
+
+
+def drop_partial_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, columns in PARTIAL_INDEXES:
+        schema_editor.execute('DROP INDEX {0}'.format(schema_editor.quote_name(name)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_book_copy_counters'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='author',
+            index_together=set([('last_name', 'first_name', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='book',
+            index_together=set([('title', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='bookinstance',
+            index_together=set([('borrower', 'status', 'due_back', 'id'), ('status', 'due_back', 'id')]),
+        ),
+        migrations.RunPython(create_partial_indexes, drop_partial_indexes),
+    ]
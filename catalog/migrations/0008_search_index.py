@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# The full-text index tables of catalog.search, filled from the existing catalog.
+
+SQLITE_CREATE = [
+    'CREATE VIRTUAL TABLE catalog_book_fts USING fts5(title, summary, isbn, author, genres)',
+    """INSERT INTO catalog_book_fts (rowid, title, summary, isbn, author, genres)
+       SELECT b.id, b.title, b.summary, b.isbn,
+              COALESCE(a.first_name || ' ' || a.last_name, ''),
+              COALESCE((SELECT group_concat(g.name, ' ') FROM catalog_book_genre bg
+                        JOIN catalog_genre g ON g.id = bg.genre_id WHERE bg.book_id = b.id), '')
+       FROM catalog_book b LEFT JOIN catalog_author a ON a.id = b.author_id""",
+]
+
+POSTGRES_CREATE = [
+    """CREATE TABLE catalog_book_search (
+           book_id integer PRIMARY KEY REFERENCES catalog_book (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+           document tsvector NOT NULL)""",
+    'CREATE INDEX catalog_book_search_document ON catalog_book_search USING GIN (document)',
+    """INSERT INTO catalog_book_search (book_id, document)
+       SELECT b.id,
+              setweight(to_tsvector('simple', b.title), 'A') ||
+              setweight(to_tsvector('simple', COALESCE(a.first_name || ' ' || a.last_name, '')), 'B') ||
+              setweight(to_tsvector('simple', b.isbn), 'B') ||
+              setweight(to_tsvector('simple', COALESCE((SELECT string_agg(g.name, ' ') FROM catalog_book_genre bg
+                        JOIN catalog_genre g ON g.id = bg.genre_id WHERE bg.book_id = b.id), '')), 'C') ||
+              setweight(to_tsvector('simple', b.summary), 'D')
+       FROM catalog_book b LEFT JOIN catalog_author a ON a.id = b.author_id""",
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    table = {'sqlite': 'catalog_book_fts', 'postgresql': 'catalog_book_search'}.get(schema_editor.connection.vendor)
+    if table:
+        schema_editor.execute('DROP TABLE {0}'.format(table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
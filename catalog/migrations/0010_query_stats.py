@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 05:31
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_overdue_scan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryStat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=32, unique=True)),
+                ('sql', models.TextField()),
+                ('view', models.CharField(blank=True, help_text='The last view seen running it.', max_length=200)),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('buckets', models.TextField(blank=True)),
+                ('slow_calls', models.PositiveIntegerField(default=0)),
+                ('plan', models.TextField(blank=True)),
+                ('plan_ms', models.FloatField(blank=True, null=True)),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+                ('last_seen', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 06:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_query_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=100, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+                ('changed', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 06:19
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_cache_generations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='copies_available',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='copies_maintenance',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='copies_on_loan',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='copies_reserved',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router
 from django.core.urlresolvers import reverse
 import uuid
 from django.contrib.auth.models import User
@@ -18,8 +18,44 @@ class Book(models.Model):
      genre = models.ManyToManyField(Genre, help_text='select a genre for this book')
      language = models.ForeignKey('Language', on_delete=models.SET_NULL, null=True)
 
+     # Number of copies in each BookInstance status, maintained by catalog.signals
+     # so availability can be shown without scanning catalog_bookinstance.
+     # Not PositiveIntegerField: a counter that has drifted (see rebuild_counters)
+     # would make the next F() decrement fail its CHECK constraint.
+     copies_available = models.IntegerField(default=0, editable=False)
+     copies_on_loan = models.IntegerField(default=0, editable=False)
+     copies_maintenance = models.IntegerField(default=0, editable=False)
+     copies_reserved = models.IntegerField(default=0, editable=False)
+
+     COPY_COUNTER_FIELDS = {
+        'a': 'copies_available',
+        'o': 'copies_on_loan',
+        'm': 'copies_maintenance',
+        'r': 'copies_reserved',
+     }
+
+     class Meta:
+         # BookListView pages by (title, id)
+         index_together = [('title', 'id')]
+
      def __str__(self):
          return self.title
+
+     def save(self, *args, **kwargs):
+         # The copy counters only ever change through F() updates, so never write
+         # back the possibly stale values held by an instance loaded earlier.
+         counters = self.COPY_COUNTER_FIELDS.values()
+         if not (self._state.adding or args or kwargs.get('update_fields') or kwargs.get('force_insert')):
+             using = kwargs.get('using') or router.db_for_write(Book, instance=self)
+             if self.pk is not None and Book._base_manager.using(using).filter(pk=self.pk).exists():
+                 kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                            if not f.primary_key and f.name not in counters]
+             else:
+                 # A copy made by setting pk to None, or a book deleted since it
+                 # was loaded: no copies are linked to the row about to be inserted.
+                 for field in counters:
+                     setattr(self, field, 0)
+         super(Book, self).save(*args, **kwargs)
   
      def get_absolute_url(self):
          return reverse('catalog:book-detail', args=[str(self.id)])
@@ -45,13 +81,33 @@ class BookInstance(models.Model):
 
      status = models.CharField(max_length=1, choices=LOAN_STATUS, blank=True, default='m', help_text='Book Availability')
 
+     # Set by the scan_overdue command when it finds the loan overdue and sends
+     # the reminder, cleared by save() once the copy is returned or renewed,
+     # and otherwise never written by save().
+     overdue_since = models.DateField(null=True, blank=True, editable=False)
+
      class Meta:	  
          ordering = ['due_back']
          permissions = (("can_mark_returned", "Set book as returned"),)
+         # The loan lists filter on status (and borrower) and page by (due_back, id).
+         # On PostgreSQL migration 0007 adds smaller partial indexes as well.
+         index_together = [('status', 'due_back', 'id'), ('borrower', 'status', 'due_back', 'id')]
 
      def __str__(self):
          return '{0}, {1}'.format(self.id,self.book.title)
 
+     def save(self, *args, **kwargs):
+         if not (self.status == 'o' and self.is_overdue):
+             self.overdue_since = None
+         elif not (self._state.adding or args or kwargs.get('update_fields') or kwargs.get('force_insert')):
+             # Still overdue: scan_overdue may have flagged the loan since this
+             # instance was loaded, so don't write back the flag it holds.
+             using = kwargs.get('using') or router.db_for_write(BookInstance, instance=self)
+             if self.pk is not None and BookInstance._base_manager.using(using).filter(pk=self.pk).exists():
+                 kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                            if not f.primary_key and f.name != 'overdue_since']
+         super(BookInstance, self).save(*args, **kwargs)
+
      @property
      def is_overdue(self):
          if self.due_back and date.today() > self.due_back:
@@ -67,6 +123,7 @@ class Author(models.Model):
 
      class Meta:
          ordering = ['last_name','first_name']
+         index_together = [('last_name', 'first_name', 'id')]
 
      def get_absolute_url(self):
          return reverse('catalog:author-detail', args=[str(self.id)])
@@ -80,3 +137,64 @@ class Language(models.Model):
      def __str__(self):
          return self.language_name
 
+
+class CatalogCounter(models.Model):
+     """
+     Materialized record counts for the index page, kept current by the
+     signal handlers in catalog.signals (see catalog.stats).
+     """
+     name = models.CharField(max_length=50, unique=True)
+     value = models.BigIntegerField(default=0)
+
+     def __str__(self):
+         return '{0}: {1}'.format(self.name, self.value)
+
+
+class CacheGeneration(models.Model):
+     """
+     The version of a group of cached pages and ETags (a scope, see
+     catalog.cache), bumped in the transaction that changes their rows.
+     """
+     scope = models.CharField(max_length=100, unique=True)
+     version = models.BigIntegerField(default=0)
+     changed = models.DateTimeField()
+
+     def __str__(self):
+         return '{0}: {1}'.format(self.scope, self.version)
+
+
+class ScanCheckpoint(models.Model):
+     """
+     How far an incremental job has got, e.g. the cursor of the last loan
+     scan_overdue looked at.
+     """
+     name = models.CharField(max_length=50, unique=True)
+     position = models.CharField(max_length=200, blank=True)
+     updated = models.DateTimeField(auto_now=True)
+
+     def __str__(self):
+         return '{0}: {1}'.format(self.name, self.position)
+
+
+class QueryStat(models.Model):
+     """
+     What the queries with one fingerprint (see catalog.querystats) have cost
+     since the stats were last reset: call count, time, and the query plan of
+     the slowest call over the slow-query threshold.
+     """
+     digest = models.CharField(max_length=32, unique=True)
+     sql = models.TextField()
+     view = models.CharField(max_length=200, blank=True, help_text='The last view seen running it.')
+     calls = models.PositiveIntegerField(default=0)
+     total_ms = models.FloatField(default=0)
+     max_ms = models.FloatField(default=0)
+     # Comma-separated call counts per latency bucket, see catalog.querystats.BUCKETS.
+     buckets = models.TextField(blank=True)
+     slow_calls = models.PositiveIntegerField(default=0)
+     plan = models.TextField(blank=True)
+     plan_ms = models.FloatField(null=True, blank=True)
+     first_seen = models.DateTimeField(auto_now_add=True)
+     last_seen = models.DateTimeField(auto_now=True)
+
+     def __str__(self):
+         return self.sql
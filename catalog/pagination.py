@@ -0,0 +1,216 @@
+"""
+Keyset (seek) pagination for list views.
+
+OFFSET pagination makes the database walk past every skipped row, and needs
+a COUNT(*) for "page N of M", so deep pages get slower the further in they
+are. Keyset pagination instead remembers the ordering values of the last row
+shown and asks for the rows after it, which an index on the ordering columns
+answers directly. It cannot tell how many pages there are, only whether there
+is a next or previous one.
+
+Rows are ordered by the plain key columns ascending, so an index on them can
+serve the ORDER BY. NULLs therefore sort the way the database puts them:
+last on PostgreSQL, first on SQLite and MySQL, and the seek conditions
+follow suit.
+"""
+import base64
+import binascii
+import json
+import operator
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(values):
+    data = json.dumps(list(values), cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, fields):
+    """
+    Turn a cursor back into field values, validated by the model fields.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor.encode('ascii') + b'=' * (-len(cursor) % 4))
+        values = json.loads(data.decode('utf-8'))
+    except (ValueError, UnicodeError, binascii.Error):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor(cursor)
+    try:
+        return [None if value is None else field.to_python(value) for field, value in zip(fields, values)]
+    except ValidationError:
+        raise InvalidCursor(cursor)
+
+
+def keyset_order(queryset, keys, reverse=False):
+    """
+    Order a queryset by the key fields, ascending unless reversed.
+    """
+    return queryset.order_by(*[('-' + name if reverse else name) for name in keys])
+
+
+def nulls_last(queryset):
+    """
+    Whether the database sorts NULLs after every other value when ascending.
+    """
+    return connections[queryset.db].features.nulls_order_largest
+
+
+class KeysetPage(object):
+    """
+    One page of a KeysetPaginator, quacking enough like a Django Page for
+    templates that only ask for the previous and next pages.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, has_previous, has_next, keys):
+        self.object_list = object_list
+        self._has_previous = has_previous
+        self._has_next = has_next
+        self.keys = keys
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    def cursor_for(self, obj):
+        return encode_cursor(getattr(obj, name) for name in self.keys)
+
+    @property
+    def previous_cursor(self):
+        return self.cursor_for(self.object_list[0]) if self._has_previous else None
+
+    @property
+    def next_cursor(self):
+        return self.cursor_for(self.object_list[-1]) if self._has_next else None
+
+
+class KeysetPaginator(object):
+    """
+    Paginate a queryset by the values of `keys`, the last of which must be
+    unique (normally the primary key) so every row has a distinct position.
+    """
+
+    def __init__(self, queryset, per_page, keys):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.keys = tuple(keys)
+        self.fields = [queryset.model._meta.get_field(name) for name in self.keys]
+
+    def _beyond(self, field, value, forward):
+        # Rows strictly after (or before) value in one column, with NULLs
+        # sorting where the database puts them.
+        towards_nulls = forward == nulls_last(self.queryset)
+        if value is None:
+            return None if towards_nulls else Q(**{field.name + '__isnull': False})
+        condition = Q(**{field.name + ('__gt' if forward else '__lt'): value})
+        if field.null and towards_nulls:
+            condition |= Q(**{field.name + '__isnull': True})
+        return condition
+
+    def _seek(self, values, forward):
+        # (a, b, c) > (x, y, z) is a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        alternatives, equal = [], []
+        for field, value in zip(self.fields, values):
+            beyond = self._beyond(field, value, forward)
+            if beyond is not None:
+                alternatives.append(reduce(operator.and_, equal + [beyond]))
+            if value is None:
+                equal.append(Q(**{field.name + '__isnull': True}))
+            else:
+                equal.append(Q(**{field.name: value}))
+        if not alternatives:
+            return None
+        condition = reduce(operator.or_, alternatives)
+        # Repeat the bound on the leading column on its own, which the query
+        # planner can turn into an index range scan.
+        field, value = self.fields[0], values[0]
+        if value is not None and len(alternatives) > 1:
+            bound = Q(**{field.name + ('__gte' if forward else '__lte'): value})
+            if field.null and forward == nulls_last(self.queryset):
+                bound |= Q(**{field.name + '__isnull': True})
+            condition = bound & condition
+        return condition
+
+    def seek_queryset(self, cursor=None, forward=True):
+        """
+        The ordered, unsliced queryset of rows after (or before) a cursor.
+        """
+        queryset = keyset_order(self.queryset, self.keys, reverse=not forward)
+        if not cursor:
+            return queryset
+        condition = self._seek(decode_cursor(cursor, self.fields), forward)
+        if condition is None:
+            return queryset.none()
+        return queryset.filter(condition)
+
+    def page(self, after=None, before=None):
+        """
+        Return the page after the `after` cursor, or before the `before`
+        cursor. With neither (or an empty `after`) return the first page.
+        """
+        forward = not before
+        cursor = after if forward else before
+        rows = list(self.seek_queryset(cursor, forward)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            return KeysetPage(rows, bool(cursor), has_more, self.keys)
+        rows.reverse()
+        return KeysetPage(rows, has_more, True, self.keys)
+
+
+class KeysetPaginationMixin(object):
+    """
+    ListView mixin adding a keyset pagination mode over `keyset_ordering`.
+
+    Requests with an `after` or `before` parameter are paginated by keyset
+    and skip the COUNT(*). Plain requests and ?page=N keep Django's OFFSET
+    pagination, but their "next" link already switches to a keyset cursor.
+    """
+    keyset_ordering = ('id',)
+
+    def is_keyset_request(self):
+        return 'after' in self.request.GET or 'before' in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.is_keyset_request():
+            # Same order in both modes, so a cursor taken from an OFFSET page continues it.
+            queryset = keyset_order(queryset, self.keyset_ordering)
+            return super(KeysetPaginationMixin, self).paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+        try:
+            page = paginator.page(after=self.request.GET.get('after'), before=self.request.GET.get('before'))
+        except InvalidCursor:
+            raise Http404('Invalid page cursor.')
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super(KeysetPaginationMixin, self).get_context_data(**kwargs)
+        page = context.get('page_obj')
+        if page is not None and not self.is_keyset_request() and page.has_next():
+            # Evaluating object_list fills its result cache, so the template reuses these rows.
+            last = list(context['object_list'])[-1]
+            context['next_cursor'] = encode_cursor(getattr(last, name) for name in self.keyset_ordering)
+        return context
@@ -0,0 +1,236 @@
+"""
+Opt-in per-request profiling.
+
+ProfilingMiddleware samples settings.CATALOG_PROFILING_SAMPLE_RATE of the
+requests (0, the default, removes it from the stack altogether; 1 profiles
+every request). For each sampled request it records the view name, the wall
+time, the time spent rendering templates, the number and total time of the
+SQL queries, and the queries run more than once with only their literals
+changing, which is the signature of an N+1 loop. Each sample is logged as one
+JSON line on the 'catalog.profiling' logger and added to per-view histograms,
+served as JSON to staff at /catalog/profile/.
+
+The histograms are kept in the memory of each process, so with several
+workers each one reports its own share of the traffic.
+
+Queries are counted the way Django's own test tools do, by turning on the
+debug cursor for the sampled request only; queries run while a streaming
+response is being sent are not counted, nor those beyond the 9000 the
+debug log of a connection holds.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in milliseconds, of the histogram buckets; slower requests
+# land in a last, open bucket.
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# How many of the most repeated queries a view's report lists.
+TOP_DUPLICATES = 10
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|%s|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r'\bIN \((?:\?, )*\?\)')
+SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    Normalize a query by replacing its literals and %s placeholders with ?,
+    so the same query run with different values has the same fingerprint.
+    """
+    sql = LITERALS.sub('?', sql)
+    sql = IN_LISTS.sub('IN (...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+class Histogram(object):
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        for index, bound in enumerate(BUCKETS):
+            if ms <= bound:
+                break
+        else:
+            index = len(BUCKETS)
+        self.counts[index] += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def as_dict(self):
+        labels = ['<={0}'.format(bound) for bound in BUCKETS] + ['>{0}'.format(BUCKETS[-1])]
+        return {'buckets': dict(zip(labels, self.counts)), 'total_ms': round(self.total, 3),
+                'max_ms': round(self.max, 3)}
+
+
+class ViewProfile(object):
+    """
+    What the samples of one view add up to.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.wall = Histogram()
+        self.render = Histogram()
+        self.query_time = Histogram()
+        self.queries = 0
+        self.requests_with_duplicates = 0
+        self.duplicates = Counter()
+
+    def add(self, sample):
+        self.requests += 1
+        self.wall.add(sample['wall_ms'])
+        self.render.add(sample['render_ms'])
+        self.query_time.add(sample['query_ms'])
+        self.queries += sample['queries']
+        if sample['duplicates']:
+            self.requests_with_duplicates += 1
+            self.duplicates.update(sample['duplicates'])
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'wall': self.wall.as_dict(),
+            'render': self.render.as_dict(),
+            'query_time': self.query_time.as_dict(),
+            'queries_per_request': round(self.queries / self.requests, 2) if self.requests else 0,
+            'requests_with_duplicates': self.requests_with_duplicates,
+            'top_duplicates': [{'sql': sql, 'count': count} for sql, count in self.duplicates.most_common(TOP_DUPLICATES)],
+        }
+
+
+class ProfileStore(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def add(self, sample):
+        with self.lock:
+            self.views.setdefault(sample['view'], ViewProfile()).add(sample)
+
+    def snapshot(self):
+        with self.lock:
+            return {name: profile.as_dict() for name, profile in sorted(self.views.items())}
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+
+profiles = ProfileStore()
+
+# The request being profiled on this thread, if any.
+_active = threading.local()
+
+
+def instrument_templates():
+    """
+    Time Template.render(), counting only the outermost template of a
+    request: {% extends %} and {% include %} render inside it.
+    """
+    if getattr(Template.render, 'profiled', False):
+        return
+    render = Template.render
+
+    def profiled_render(self, context):
+        sample = getattr(_active, 'sample', None)
+        if sample is None or sample['rendering']:
+            return render(self, context)
+        sample['rendering'] = True
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            sample['render_ms'] += (time.perf_counter() - started) * 1000
+            sample['rendering'] = False
+    profiled_render.profiled = True
+    Template.render = profiled_render
+
+
+def queries_since(log, last):
+    """
+    The queries of a connection's queries_log logged after last, its newest
+    entry when the request started (None if it was empty).
+
+    The log keeps only the latest queries_log.maxlen entries, so positions
+    noted earlier move once it is full; the new entries are found by walking
+    back to last instead. Should last have been dropped as well, the request
+    ran more queries than the log holds and all of them are counted.
+    """
+    queries = []
+    for query in reversed(log):
+        if query is last:
+            break
+        queries.append(query)
+    queries.reverse()
+    return queries
+
+
+class ProfilingMiddleware(object):
+    """
+    Profile a sample of the requests, see the module docstring. Put it first
+    in MIDDLEWARE_CLASSES so the wall time covers the other middleware.
+    """
+
+    def __init__(self):
+        self.sample_rate = getattr(settings, 'CATALOG_PROFILING_SAMPLE_RATE', 0)
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        instrument_templates()
+
+    def process_request(self, request):
+        if random.random() >= self.sample_rate:
+            return
+        databases = {}
+        for connection in connections.all():
+            log = connection.queries_log
+            databases[connection.alias] = (connection.force_debug_cursor, log[-1] if log else None)
+            connection.force_debug_cursor = True
+        request._profile = {'started': time.perf_counter(), 'databases': databases}
+        _active.sample = {'render_ms': 0.0, 'rendering': False}
+
+    def process_response(self, request, response):
+        profile = getattr(request, '_profile', None)
+        if profile is None:
+            return response
+        wall_ms = (time.perf_counter() - profile['started']) * 1000
+        render = getattr(_active, 'sample', None) or {'render_ms': 0.0}
+        _active.sample = None
+
+        queries = []
+        for alias, (force_debug_cursor, last) in profile['databases'].items():
+            connection = connections[alias]
+            queries.extend(queries_since(connection.queries_log, last))
+            connection.force_debug_cursor = force_debug_cursor
+        fingerprints = Counter(fingerprint(query['sql']) for query in queries)
+
+        match = getattr(request, 'resolver_match', None)
+        sample = {
+            'view': match.view_name if match else '(unresolved)',
+            'method': request.method,
+            'status': response.status_code,
+            'wall_ms': round(wall_ms, 3),
+            'render_ms': round(render['render_ms'], 3),
+            'queries': len(queries),
+            'query_ms': round(sum(float(query['time']) for query in queries) * 1000, 3),
+            'duplicates': {sql: count for sql, count in fingerprints.items() if count > 1},
+        }
+        profiles.add(sample)
+        logger.info(json.dumps(sample, sort_keys=True))
+        return response
@@ -0,0 +1,45 @@
+"""
+EXPLAIN output for querysets and raw SQL on the databases the catalog runs on.
+"""
+from django.db import connections
+
+
+def explain_prefix(connection):
+    """
+    The statement prefix asking this database for a query plan, or None.
+    """
+    if connection.vendor == 'sqlite':
+        return 'EXPLAIN QUERY PLAN '
+    if connection.vendor in ('postgresql', 'mysql'):
+        return 'EXPLAIN '
+    return None
+
+
+def explain_sql(connection, sql, params=()):
+    """
+    Return the plan of a SELECT as a list of lines, or None when the
+    database has no EXPLAIN we know how to read.
+    """
+    prefix = explain_prefix(connection)
+    if prefix is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+
+    if connection.vendor != 'sqlite':
+        return [' '.join(str(column) for column in row) for row in rows]
+    # SQLite rows are (id, parent, notused, detail), indent each step under its parent.
+    depth, lines = {}, []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return lines
+
+
+def explain_queryset(queryset):
+    """
+    Return the plan the database would use for a queryset.
+    """
+    sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    return explain_sql(connections[queryset.db], sql, params)
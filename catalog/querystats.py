@@ -0,0 +1,312 @@
+"""
+Slow-query log: per-fingerprint query statistics for the catalog and admin
+views, reported by `manage.py querystats`.
+
+With settings.CATALOG_QUERYSTATS on, QueryStatsMiddleware times every query
+the views of the NAMESPACES run, from process_view() until the response,
+rendering included. Queries are grouped by fingerprint (the SQL with its
+literals and placeholders replaced, see catalog.profiling.fingerprint) and
+counted into latency buckets, from which the report reads percentiles.
+
+A SELECT slower than settings.CATALOG_SLOW_QUERY_MS is logged on the
+'catalog.querystats' logger and, the first time per fingerprint in each
+process, run again under EXPLAIN (EXPLAIN QUERY PLAN on SQLite) after the
+response is ready, so the plan shows up in the report next to the query.
+
+Each process adds up its counts in memory and writes them to the QueryStat
+table at most every CATALOG_QUERYSTATS_FLUSH_SECONDS, once a response has
+been sent (on request_finished, so the client does not wait for it), and
+when it exits. Counts that cannot be written are kept for the next flush.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_finished
+from django.db import DatabaseError, connections, router, transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.utils import CursorWrapper
+
+from .bulk import chunked
+from .models import QueryStat
+from .profiling import fingerprint
+from .queryplans import explain_sql
+
+logger = logging.getLogger(__name__)
+
+# The URL namespaces whose views are recorded.
+NAMESPACES = frozenset(['catalog', 'admin'])
+
+# Upper bounds, in milliseconds, of the latency buckets; slower calls land in
+# a last, open bucket.
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# The queries of the request being recorded on this thread, as
+# (alias, sql, params, ms) tuples, or None.
+_active = threading.local()
+
+
+def digest(sql_fingerprint):
+    return hashlib.md5(sql_fingerprint.encode('utf-8')).hexdigest()
+
+
+def bucket_index(ms):
+    for index, bound in enumerate(BUCKETS):
+        if ms <= bound:
+            return index
+    return len(BUCKETS)
+
+
+def bucket_counts(text):
+    """
+    Parse QueryStat.buckets.
+    """
+    counts = [int(count) for count in text.split(',')] if text else []
+    return counts + [0] * (len(BUCKETS) + 1 - len(counts))
+
+
+def percentile(stat, fraction):
+    """
+    The upper bound of the bucket holding the fraction-th call of a
+    QueryStat, e.g. fraction=0.99, capped by the slowest call seen.
+    """
+    if not stat.calls:
+        return None
+    rank, seen = fraction * stat.calls, 0
+    for index, count in enumerate(bucket_counts(stat.buckets)):
+        seen += count
+        if seen >= rank and count:
+            return min(BUCKETS[index], stat.max_ms) if index < len(BUCKETS) else stat.max_ms
+    return stat.max_ms
+
+
+def full_scan(plan):
+    """
+    Whether a plan reads a whole table: the sign of a missing index.
+    """
+    for line in plan.splitlines():
+        line = line.strip()
+        # SQLite's full-text search tables show up as SCAN ... VIRTUAL TABLE.
+        if (line.startswith('SCAN') and 'USING' not in line and 'VIRTUAL TABLE' not in line) or 'Seq Scan' in line:
+            return True
+    return False
+
+
+class QueryTimer(CursorWrapper):
+    """
+    Time the queries run through a cursor and note them for the request
+    being recorded.
+    """
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            return super(QueryTimer, self).execute(sql, params)
+        finally:
+            record(self.db, sql, params, time.perf_counter() - started)
+
+    def executemany(self, sql, param_list):
+        started = time.perf_counter()
+        try:
+            return super(QueryTimer, self).executemany(sql, param_list)
+        finally:
+            # Not a SELECT, never explained.
+            record(self.db, sql, None, time.perf_counter() - started)
+
+
+def record(connection, sql, params, seconds):
+    calls = getattr(_active, 'calls', None)
+    if calls is not None:
+        calls.append((connection.alias, sql, params, seconds * 1000))
+
+
+def instrument_cursors():
+    """
+    Wrap the cursors opened while a request is being recorded in a
+    QueryTimer; the others are left as they are. Also flush the counts
+    when the process exits.
+    """
+    if getattr(BaseDatabaseWrapper.cursor, 'recorded', False):
+        return
+    cursor = BaseDatabaseWrapper.cursor
+
+    def recorded_cursor(self):
+        wrapper = cursor(self)
+        if getattr(_active, 'calls', None) is None:
+            return wrapper
+        return QueryTimer(wrapper, self)
+    recorded_cursor.recorded = True
+    BaseDatabaseWrapper.cursor = recorded_cursor
+    request_finished.connect(flush_after_request)
+    atexit.register(query_log.flush)
+
+
+def flush_after_request(**kwargs):
+    # Django closed the connections of the request before this runs (unless
+    # they are persistent). Close one the flush opened again rather than
+    # leave it idle, holding a pooled connection, until the next request.
+    connection = connections[router.db_for_write(QueryStat)]
+    was_open = connection.connection is not None
+    query_log.flush(settings.CATALOG_QUERYSTATS_FLUSH_SECONDS)
+    if not was_open and not connection.in_atomic_block:
+        connection.close()
+
+
+class Aggregate(object):
+    """
+    The calls of one fingerprint a process has not written out yet.
+    """
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.view = ''
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.slow_calls = 0
+        self.plan = None
+        self.plan_ms = None
+
+    def merge_into(self, stat):
+        stat.view = self.view or stat.view
+        stat.calls += self.calls
+        stat.total_ms += self.total_ms
+        stat.max_ms = max(stat.max_ms, self.max_ms)
+        stat.buckets = ','.join(str(stored + new) for stored, new in zip(bucket_counts(stat.buckets), self.counts))
+        stat.slow_calls += self.slow_calls
+        if self.plan is not None and (stat.plan_ms is None or self.plan_ms >= stat.plan_ms):
+            stat.plan, stat.plan_ms = self.plan, self.plan_ms
+
+    def merge(self, other):
+        """
+        Add the calls of a later Aggregate of the same fingerprint.
+        """
+        self.view = other.view or self.view
+        self.calls += other.calls
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.slow_calls += other.slow_calls
+        if other.plan is not None and (self.plan_ms is None or other.plan_ms >= self.plan_ms):
+            self.plan, self.plan_ms = other.plan, other.plan_ms
+
+
+class QueryLog(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.explained = set()
+        self.last_flush = time.time()
+
+    def add(self, view, calls, threshold_ms):
+        """
+        Count the calls of one request, explaining its slow SELECTs.
+        """
+        samples, slowest = [], {}
+        for alias, sql, params, ms in calls:
+            sql_fingerprint = fingerprint(sql)
+            key = digest(sql_fingerprint)
+            samples.append((key, sql_fingerprint, ms))
+            if ms < threshold_ms:
+                continue
+            logger.warning(json.dumps({'view': view, 'ms': round(ms, 3), 'sql': sql_fingerprint}, sort_keys=True))
+            if (params is not None and sql.lstrip()[:6].upper() == 'SELECT' and key not in self.explained
+                    and (key not in slowest or ms > slowest[key][3])):
+                slowest[key] = (alias, sql, params, ms)
+
+        plans = {}
+        for key, (alias, sql, params, ms) in slowest.items():
+            try:
+                plan = explain_sql(connections[alias], sql, params)
+            except DatabaseError:
+                logger.exception('Could not explain %s', sql)
+                continue
+            if plan is not None:
+                plans[key] = ('\n'.join(plan), ms)
+
+        with self.lock:
+            self.explained.update(plans)
+            for key, sql_fingerprint, ms in samples:
+                aggregate = self.pending.get(key)
+                if aggregate is None:
+                    aggregate = self.pending[key] = Aggregate(sql_fingerprint)
+                aggregate.view = view
+                aggregate.calls += 1
+                aggregate.total_ms += ms
+                aggregate.max_ms = max(aggregate.max_ms, ms)
+                aggregate.counts[bucket_index(ms)] += 1
+                aggregate.slow_calls += ms >= threshold_ms
+            for key, (plan, ms) in plans.items():
+                self.pending[key].plan, self.pending[key].plan_ms = plan, ms
+
+    def flush(self, interval=0):
+        """
+        Write the pending counts to the QueryStat table, if the last flush
+        is more than interval seconds old.
+        """
+        with self.lock:
+            if time.time() - self.last_flush < interval:
+                return
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.time()
+        if not pending:
+            return
+        try:
+            with transaction.atomic():
+                for chunk in chunked(sorted(pending), 500):
+                    known = set(QueryStat.objects.filter(digest__in=chunk).values_list('digest', flat=True))
+                    for key in set(chunk) - known:
+                        QueryStat.objects.get_or_create(digest=key, defaults={'sql': pending[key].sql})
+                    for stat in QueryStat.objects.select_for_update().filter(digest__in=chunk):
+                        pending[stat.digest].merge_into(stat)
+                        stat.save()
+        except DatabaseError:
+            logger.exception('Could not save the query stats of %d fingerprints, keeping them for the next flush',
+                             len(pending))
+            self.restore(pending)
+
+    def restore(self, pending):
+        # Put back counts that were not written, ahead of those added since.
+        with self.lock:
+            for key, aggregate in pending.items():
+                if key in self.pending:
+                    aggregate.merge(self.pending[key])
+                self.pending[key] = aggregate
+
+
+query_log = QueryLog()
+
+
+class QueryStatsMiddleware(object):
+    """
+    Record the queries of the catalog and admin views, see the module
+    docstring.
+    """
+
+    def __init__(self):
+        if not getattr(settings, 'CATALOG_QUERYSTATS', False):
+            raise MiddlewareNotUsed
+        instrument_cursors()
+
+    def process_request(self, request):
+        # In case an earlier request on this thread never got a response.
+        _active.calls = None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        if match is not None and NAMESPACES.intersection(match.namespaces):
+            _active.calls = []
+
+    def process_response(self, request, response):
+        calls = getattr(_active, 'calls', None)
+        _active.calls = None
+        if calls:
+            query_log.add(request.resolver_match.view_name, calls, settings.CATALOG_SLOW_QUERY_MS)
+        return response
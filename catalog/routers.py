@@ -0,0 +1,133 @@
+"""
+Read-replica routing for the catalog's read-only views.
+
+The views decorated with replica_reads (the index, the book and author lists
+and detail pages, search, autocomplete and the API) read the catalog's tables
+from one of the settings.CATALOG_REPLICAS, picked at random per request.
+Everything else, every write, the admin and sessions and users included,
+uses the primary, 'default'.
+
+Replicas lag behind the primary. A user who has just written is sent to the
+primary for CATALOG_PRIMARY_STICKY_SECONDS, so they see their change:
+PrimaryAfterWriteMiddleware sets a cookie on the response to every POST (or
+other unsafe method) saying until when. Everyone else may see the data of a
+little while ago. The generations of catalog.cache, which key the cached
+pages and make the ETags, are read from the replica with the rows, so a
+lagging replica's pages are cached under the versions it has and are
+replaced once it catches up.
+
+With no replicas configured the router sends everything to 'default' and the
+middleware drops out.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY_COOKIE = 'catalog_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The database the request being handled on this thread reads from, if not
+# the primary.
+_state = threading.local()
+
+
+def replicas():
+    return getattr(settings, 'CATALOG_REPLICAS', [])
+
+
+def sticky_seconds():
+    return getattr(settings, 'CATALOG_PRIMARY_STICKY_SECONDS', 10)
+
+
+@contextmanager
+def use_database(alias):
+    """
+    Send the reads of the block to the alias (None for the primary).
+    """
+    previous = getattr(_state, 'alias', None)
+    _state.alias = alias
+    try:
+        yield
+    finally:
+        _state.alias = previous
+
+
+def rendered(response):
+    """
+    Render a TemplateResponse now, while the block choosing the database
+    for its queries is still active.
+    """
+    if hasattr(response, 'render') and callable(response.render) and not response.is_rendered:
+        response.render()
+    return response
+
+
+def wrote_recently(request):
+    try:
+        return float(request.COOKIES.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def replica_reads(view):
+    """
+    Serve the GET and HEAD requests of a view from a replica, unless the
+    user wrote recently.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not replicas() or request.method not in SAFE_METHODS or wrote_recently(request):
+            return view(request, *args, **kwargs)
+        with use_database(random.choice(replicas())):
+            return rendered(view(request, *args, **kwargs))
+    return wrapped
+
+
+class ReplicaRouter(object):
+    """
+    Reads go where replica_reads() said, writes and migrations to the
+    primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        # Sessions and users come from the primary: a replica may not have
+        # the session of a user who has just logged in.
+        if model._meta.app_label != 'catalog':
+            return DEFAULT_DB_ALIAS
+        return getattr(_state, 'alias', None) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Also for objects read from a replica.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+class PrimaryAfterWriteMiddleware(object):
+    """
+    Keep a user who has just written on the primary, see the module
+    docstring.
+    """
+
+    def __init__(self):
+        if not replicas():
+            raise MiddlewareNotUsed
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(PRIMARY_COOKIE, str(int(time.time() + sticky_seconds())),
+                                max_age=sticky_seconds(), httponly=True)
+        return response
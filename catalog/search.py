@@ -0,0 +1,226 @@
+"""
+Full-text search over the catalog.
+
+Every book is indexed as one document made of its title, summary, ISBN,
+author name and genre names. The index lives in the database next to the
+catalog tables: an FTS5 virtual table on SQLite, a tsvector column with a GIN
+index on PostgreSQL (both created by migration 0008). It is updated
+incrementally by the handlers in catalog.signals, and `manage.py
+rebuild_search_index` rebuilds it from scratch.
+
+The backend comes from settings.CATALOG_SEARCH_BACKEND (a dotted path to a
+SearchBackend subclass) or, by default, from the database vendor. Other
+databases fall back to unindexed LIKE matching.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Book
+
+FTS_TABLE = 'catalog_book_fts'
+TSVECTOR_TABLE = 'catalog_book_search'
+
+# Plain words only, the query syntax of the index is never exposed to users.
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    return TERM_RE.findall(query.lower())[:20]
+
+
+class SearchBackend(object):
+    """
+    Base class for search backends. Subclasses store documents with
+    store_documents() and look them up with search().
+    """
+    chunk_size = 500
+
+    def read_db(self):
+        return router.db_for_read(Book)
+
+    def write_db(self):
+        return router.db_for_write(Book)
+
+    def documents(self, book_ids):
+        """
+        Yield (book id, {column: text}) for the given books.
+        """
+        db = self.write_db()
+        # Genre names in one query, prefetch_related() builds a queryset per book.
+        genres = {}
+        links = Book.genre.through.objects.using(db).filter(book_id__in=book_ids).values_list('book_id', 'genre__name')
+        for book_id, name in links:
+            genres.setdefault(book_id, []).append(name)
+        for book in Book.objects.using(db).filter(pk__in=book_ids).select_related('author'):
+            author = book.author
+            yield book.pk, {
+                'title': book.title,
+                'summary': book.summary,
+                'isbn': book.isbn,
+                'author': '{0} {1}'.format(author.first_name, author.last_name) if author else '',
+                'genres': ' '.join(sorted(genres.get(book.pk, []))),
+            }
+
+    def index_books(self, book_ids):
+        """
+        (Re)index the given books, dropping any that no longer exist.
+        """
+        book_ids = list(book_ids)
+        for start in range(0, len(book_ids), self.chunk_size):
+            chunk = book_ids[start:start + self.chunk_size]
+            # one transaction per chunk, in autocommit every row would commit on its own
+            with transaction.atomic(using=self.write_db()):
+                self.remove_books(chunk)
+                self.store_documents(list(self.documents(chunk)))
+
+    def rebuild(self):
+        self.clear()
+        ids = Book.objects.using(self.write_db()).order_by('pk').values_list('pk', flat=True)
+        self.index_books(ids.iterator())
+
+    def store_documents(self, documents):
+        raise NotImplementedError
+
+    def remove_books(self, book_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query, limit, offset=0):
+        """
+        Return the ids of the books matching query, best match first.
+        """
+        raise NotImplementedError
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    SQLite FTS5 index ranked by bm25, weighting title and author matches
+    above the summary.
+    """
+    columns = ('title', 'summary', 'isbn', 'author', 'genres')
+    weights = (10.0, 1.0, 5.0, 5.0, 2.0)
+
+    def store_documents(self, documents):
+        if not documents:
+            return
+        sql = 'INSERT INTO {0} (rowid, {1}) VALUES (%s, {2})'.format(
+            FTS_TABLE, ', '.join(self.columns), ', '.join(['%s'] * len(self.columns)))
+        with connections[self.write_db()].cursor() as cursor:
+            cursor.executemany(sql, [[pk] + [doc[column] for column in self.columns] for pk, doc in documents])
+
+    def remove_books(self, book_ids):
+        book_ids = list(book_ids)
+        if book_ids:
+            with connections[self.write_db()].cursor() as cursor:
+                cursor.execute('DELETE FROM {0} WHERE rowid IN ({1})'.format(
+                    FTS_TABLE, ', '.join(['%s'] * len(book_ids))), book_ids)
+
+    def clear(self):
+        with connections[self.write_db()].cursor() as cursor:
+            cursor.execute('DELETE FROM {0}'.format(FTS_TABLE))
+
+    def search(self, query, limit, offset=0):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        # every term must match, as a prefix so partial words find something
+        match = ' '.join('"{0}"*'.format(term) for term in terms)
+        sql = 'SELECT rowid FROM {0} WHERE {0} MATCH %s ORDER BY bm25({0}, {1}) LIMIT %s OFFSET %s'.format(
+            FTS_TABLE, ', '.join(str(weight) for weight in self.weights))
+        with connections[self.read_db()].cursor() as cursor:
+            cursor.execute(sql, [match, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    PostgreSQL tsvector index ranked by ts_rank, with title (A), author and
+    ISBN (B), genres (C) and summary (D) weighted in that order.
+    """
+    config = 'simple'
+    weights = (('title', 'A'), ('author', 'B'), ('isbn', 'B'), ('genres', 'C'), ('summary', 'D'))
+
+    def store_documents(self, documents):
+        if not documents:
+            return
+        vector = ' || '.join("setweight(to_tsvector('{0}', %s), '{1}')".format(self.config, weight)
+                             for column, weight in self.weights)
+        sql = 'INSERT INTO {0} (book_id, document) VALUES (%s, {1})'.format(TSVECTOR_TABLE, vector)
+        with connections[self.write_db()].cursor() as cursor:
+            cursor.executemany(sql, [[pk] + [doc[column] for column, weight in self.weights] for pk, doc in documents])
+
+    def remove_books(self, book_ids):
+        book_ids = list(book_ids)
+        if book_ids:
+            with connections[self.write_db()].cursor() as cursor:
+                cursor.execute('DELETE FROM {0} WHERE book_id = ANY(%s)'.format(TSVECTOR_TABLE), [book_ids])
+
+    def clear(self):
+        with connections[self.write_db()].cursor() as cursor:
+            cursor.execute('TRUNCATE {0}'.format(TSVECTOR_TABLE))
+
+    def search(self, query, limit, offset=0):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        tsquery = ' & '.join('{0}:*'.format(term) for term in terms)
+        sql = ("SELECT book_id FROM {0}, to_tsquery('{1}', %s) query WHERE document @@ query "
+               'ORDER BY ts_rank(document, query) DESC, book_id LIMIT %s OFFSET %s').format(TSVECTOR_TABLE, self.config)
+        with connections[self.read_db()].cursor() as cursor:
+            cursor.execute(sql, [tsquery, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class LikeSearchBackend(SearchBackend):
+    """
+    Unindexed fallback for databases without a full-text backend. Scans the
+    catalog on every search, ranks nothing and orders by title.
+    """
+
+    def store_documents(self, documents):
+        pass
+
+    def remove_books(self, book_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query, limit, offset=0):
+        books = Book.objects.using(self.read_db())
+        for term in search_terms(query):
+            books = books.filter(
+                Q(title__icontains=term) | Q(summary__icontains=term) | Q(isbn__icontains=term) |
+                Q(author__first_name__icontains=term) | Q(author__last_name__icontains=term) |
+                Q(genre__name__icontains=term))
+        ids = books.order_by('title', 'pk').values_list('pk', flat=True).distinct()
+        return list(ids[offset:offset + limit])
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    path = getattr(settings, 'CATALOG_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    vendor = connections[router.db_for_write(Book)].vendor
+    return VENDOR_BACKENDS.get(vendor, LikeSearchBackend)()
+
+
+def search_books(query, limit, offset=0):
+    """
+    Return the books matching query, best match first, with their authors.
+    """
+    ids = get_search_backend().search(query, limit, offset)
+    books = Book.objects.select_related('author').in_bulk(ids)
+    return [books[pk] for pk in ids if pk in books]
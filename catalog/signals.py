@@ -0,0 +1,247 @@
+"""
+Signal handlers keeping denormalized catalog data in step with the models.
+Connected from CatalogConfig.ready().
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import autocomplete
+from .cache import AUTHOR_LIST, BOOK_LIST, author_scope, book_scope, invalidate, table_scope
+from .models import Author, Book, BookInstance, Genre, Language
+from .search import get_search_backend
+from .stats import adjust_copy_counter, adjust_counter
+
+# Marker for a BookInstance field that was deferred when it was loaded.
+UNKNOWN = object()
+
+
+@receiver(post_init, sender=BookInstance)
+def remember_loaded_state(sender, instance, **kwargs):
+    # Keep the book and status as they were loaded so post_save can tell what changed.
+    instance._loaded_book_id = instance.__dict__.get('book_id', UNKNOWN)
+    instance._loaded_status = instance.__dict__.get('status', UNKNOWN)
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter('num_books', 1)
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    adjust_counter('num_books', -1)
+
+
+@receiver(post_save, sender=Author)
+def author_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter('num_authors', 1)
+
+
+@receiver(post_delete, sender=Author)
+def author_deleted(sender, instance, **kwargs):
+    adjust_counter('num_authors', -1)
+
+
+@receiver(post_save, sender=BookInstance)
+def bookinstance_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter('num_instances', 1)
+        adjust_counter('num_instances_available', int(instance.status == 'a'))
+        adjust_copy_counter(instance.book_id, instance.status, 1)
+    elif UNKNOWN not in (instance._loaded_book_id, instance._loaded_status):
+        was_available = instance._loaded_status == 'a'
+        adjust_counter('num_instances_available', int(instance.status == 'a') - int(was_available))
+        if (instance._loaded_book_id, instance._loaded_status) != (instance.book_id, instance.status):
+            adjust_copy_counter(instance._loaded_book_id, instance._loaded_status, -1)
+            adjust_copy_counter(instance.book_id, instance.status, 1)
+    instance._loaded_book_id = instance.book_id
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=BookInstance)
+def bookinstance_deleted(sender, instance, **kwargs):
+    book_id, status = instance._loaded_book_id, instance._loaded_status
+    if book_id is UNKNOWN:
+        book_id = instance.book_id
+    if status is UNKNOWN:
+        status = instance.status
+    adjust_counter('num_instances', -1)
+    adjust_counter('num_instances_available', -int(status == 'a'))
+    adjust_copy_counter(book_id, status, -1)
+
+
+# Search index and cached pages: a book's document and detail page include its
+# author's name and its genres, so changes to those reach every book they
+# appear in.
+
+def reindex_books(book_ids):
+    book_ids = list(book_ids)
+    if book_ids:
+        get_search_backend().index_books(book_ids)
+
+
+def linked_books_changed(book_ids):
+    book_ids = list(book_ids)
+    reindex_books(book_ids)
+    invalidate([book_scope(pk) for pk in book_ids])
+
+
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, raw, **kwargs):
+    if not raw:
+        reindex_books([instance.pk])
+
+
+@receiver(post_delete, sender=Book)
+def unindex_deleted_book(sender, instance, **kwargs):
+    get_search_backend().remove_books([instance.pk])
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def book_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # genre.book_set.clear(), remember the books before the links go
+        instance._linked_book_ids = list(instance.book_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            linked_books_changed([instance.pk])
+        elif action == 'post_clear':
+            linked_books_changed(getattr(instance, '_linked_book_ids', []))
+        else:
+            linked_books_changed(pk_set)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+def linked_row_saved(sender, instance, created, raw, **kwargs):
+    if not created and not raw:
+        linked_books_changed(instance.book_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Language)
+def remember_linked_books(sender, instance, **kwargs):
+    # Deleting unlinks the books without saving them, so note which they are.
+    instance._linked_book_ids = list(instance.book_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def linked_row_deleted(sender, instance, **kwargs):
+    linked_books_changed(getattr(instance, '_linked_book_ids', []))
+
+
+# Cached pages of the rows themselves, see catalog.cache. The language is only
+# shown on book pages, it is not part of the search document.
+
+@receiver(pre_save, sender=Book)
+def remember_book_author(sender, instance, **kwargs):
+    # The old author's page lists the book too when it changes author.
+    instance._author_ids = {instance.author_id}
+    if instance.pk is not None:
+        instance._author_ids.update(Book.objects.filter(pk=instance.pk).values_list('author_id', flat=True))
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def drop_book_pages(sender, instance, **kwargs):
+    author_ids = getattr(instance, '_author_ids', {instance.author_id})
+    invalidate([BOOK_LIST, book_scope(instance.pk)] + [author_scope(pk) for pk in author_ids if pk is not None])
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def drop_author_pages(sender, instance, created=False, **kwargs):
+    scopes = [AUTHOR_LIST, author_scope(instance.pk)]
+    if not created:
+        # the book list shows author names
+        scopes.append(BOOK_LIST)
+    invalidate(scopes)
+
+
+@receiver(post_save, sender=Language)
+def drop_language_pages(sender, instance, created, **kwargs):
+    if not created:
+        invalidate([book_scope(pk) for pk in instance.book_set.values_list('pk', flat=True)])
+
+
+@receiver(post_delete, sender=Language)
+def drop_unlinked_language_pages(sender, instance, **kwargs):
+    invalidate([book_scope(pk) for pk in getattr(instance, '_linked_book_ids', [])])
+
+
+@receiver(pre_save, sender=BookInstance)
+@receiver(pre_delete, sender=BookInstance)
+def remember_copy_book(sender, instance, **kwargs):
+    # A copy moved to another book leaves the old book's page too.
+    book_id = getattr(instance, '_loaded_book_id', UNKNOWN)
+    if book_id is UNKNOWN and instance.pk is not None:
+        book_id = BookInstance.objects.filter(pk=instance.pk).values_list('book_id', flat=True).first()
+    instance._previous_book_id = None if book_id is UNKNOWN else book_id
+
+
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+def drop_copy_pages(sender, instance, **kwargs):
+    # Copies are listed on their book's page and counted in the book list.
+    book_ids = {instance.book_id, getattr(instance, '_previous_book_id', None)}
+    invalidate([BOOK_LIST] + [book_scope(pk) for pk in book_ids if pk is not None])
+
+
+# Whole tables, for the ETags of the JSON API. Book rows also hold copy
+# counters and links to authors, languages and genres, so changes to any of
+# those change the book table too.
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=BookInstance)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=BookInstance)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Language)
+def drop_table_scopes(sender, **kwargs):
+    invalidate([table_scope(sender), table_scope(Book)])
+
+
+# Deleting a book or a user sets the book or borrower of their copies to NULL
+# with a queryset update(), which sends no BookInstance signals.
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=User)
+def drop_copy_table_scope(sender, **kwargs):
+    invalidate([table_scope(BookInstance)])
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def drop_book_table_scope(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate([table_scope(Book)])
+
+
+# Autocomplete index of this process.
+
+@receiver(post_save, sender=Book)
+def autocomplete_saved_book(sender, instance, **kwargs):
+    autocomplete.index.book_saved(instance)
+
+
+@receiver(post_save, sender=Author)
+def autocomplete_saved_author(sender, instance, **kwargs):
+    autocomplete.index.author_saved(instance)
+
+
+@receiver(post_delete, sender=Book)
+def autocomplete_deleted_book(sender, instance, **kwargs):
+    autocomplete.index.remove('book', instance.pk)
+
+
+@receiver(post_delete, sender=Author)
+def autocomplete_deleted_author(sender, instance, **kwargs):
+    autocomplete.index.remove('author', instance.pk)
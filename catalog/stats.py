@@ -0,0 +1,126 @@
+"""
+Record counts shown on the catalog index page, and per-book copy counts.
+
+Counting rows on every home page hit means scanning catalog_bookinstance, so
+the counts are materialized in CatalogCounter and adjusted by the post_save /
+post_delete handlers in catalog.signals. Anything that bypasses the signals
+(queryset.update(), bulk_create(), raw SQL) should call
+rebuild_catalog_counters() and rebuild_copy_counters() afterwards, or run
+`manage.py rebuild_counters`.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from .models import Author, Book, BookInstance, CatalogCounter
+
+COUNTER_NAMES = ('num_books', 'num_instances', 'num_instances_available', 'num_authors')
+
+
+def compute_catalog_counts():
+    """
+    Count books, copies, available copies and authors from scratch in a
+    single aggregate query.
+    """
+    qn = connection.ops.quote_name
+    sql = ('SELECT (SELECT COUNT(*) FROM {book}), '
+           '(SELECT COUNT(*) FROM {copy}), '
+           '(SELECT COUNT(*) FROM {copy} WHERE {status} = %s), '
+           '(SELECT COUNT(*) FROM {author})').format(
+        book=qn(Book._meta.db_table),
+        copy=qn(BookInstance._meta.db_table),
+        status=qn(BookInstance._meta.get_field('status').column),
+        author=qn(Author._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, ['a'])
+        row = cursor.fetchone()
+    return dict(zip(COUNTER_NAMES, row))
+
+
+def rebuild_catalog_counters():
+    """
+    Recount everything and overwrite the materialized counters.
+    """
+    counts = compute_catalog_counts()
+    with transaction.atomic():
+        for name, value in counts.items():
+            CatalogCounter.objects.update_or_create(name=name, defaults={'value': value})
+    return counts
+
+
+def get_catalog_counts():
+    """
+    Return the index page counts, reading them from the counters table.
+
+    Falls back to a full recount when a counter row is missing, e.g. on a
+    database that was never migrated with data in it.
+    """
+    counts = dict(CatalogCounter.objects.filter(name__in=COUNTER_NAMES).values_list('name', 'value'))
+    if len(counts) < len(COUNTER_NAMES):
+        return rebuild_catalog_counters()
+    return counts
+
+
+def adjust_counter(name, delta):
+    """
+    Atomically add delta to a counter. A missing row is left alone, the next
+    get_catalog_counts() call will recreate it with an exact value.
+    """
+    if delta:
+        CatalogCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+
+def adjust_copy_counter(book_id, status, delta):
+    """
+    Atomically add delta to the Book counter matching a BookInstance status.
+    """
+    field = Book.COPY_COUNTER_FIELDS.get(status)
+    if book_id is not None and field and delta:
+        Book.objects.filter(pk=book_id).update(**{field: F(field) + delta})
+
+
+def count_copies_by_status():
+    """
+    Recount copies from BookInstance, as {book id: {counter field: count}}.
+    """
+    counts = {}
+    rows = (BookInstance.objects.filter(book__isnull=False, status__in=Book.COPY_COUNTER_FIELDS)
+            .values_list('book_id', 'status').annotate(n=Count('id')).order_by())
+    for book_id, status, n in rows:
+        counts.setdefault(book_id, {})[Book.COPY_COUNTER_FIELDS[status]] = n
+    return counts
+
+
+def find_copy_counter_drift():
+    """
+    Compare the stored Book copy counters with a recount.
+
+    Returns {book id: {counter field: correct value}} for every book whose
+    stored counters are wrong.
+    """
+    fields = sorted(Book.COPY_COUNTER_FIELDS.values())
+    recount = count_copies_by_status()
+    drift = {}
+    for row in Book.objects.values_list('pk', *fields).order_by().iterator():
+        expected = dict.fromkeys(fields, 0)
+        expected.update(recount.get(row[0], {}))
+        if dict(zip(fields, row[1:])) != expected:
+            drift[row[0]] = expected
+    return drift
+
+
+def rebuild_copy_counters():
+    """
+    Fix every Book whose copy counters have drifted. Returns the drift found.
+    """
+    drift = find_copy_counter_drift()
+    # Books needing the same values share one UPDATE, there are few distinct ones
+    # even when a bulk load has left thousands of books behind.
+    book_ids_by_values = {}
+    for book_id, values in drift.items():
+        book_ids_by_values.setdefault(tuple(sorted(values.items())), []).append(book_id)
+    with transaction.atomic():
+        for values, book_ids in book_ids_by_values.items():
+            for start in range(0, len(book_ids), 500):
+                Book.objects.filter(pk__in=book_ids[start:start + 500]).update(**dict(values))
+    return drift
@@ -0,0 +1,96 @@
+"""
+Compiling every template when a worker boots.
+
+Without DEBUG, settings.TEMPLATES wraps the loaders in the cached loader,
+which keeps each template it has parsed for the life of the process.
+precompile_templates() loads all of them up front, from wsgi.py, so no request
+pays for the filesystem lookups and the parsing. It also checks that every
+class-based view in the URLconf finds its template, so a missing or broken
+template stops the worker from booting instead of failing requests later.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.urlresolvers import RegexURLResolver, get_resolver
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loader import select_template
+
+
+def template_dirs(engine):
+    for loader in engine.template_loaders:
+        # the cached loader wraps the loaders doing the work
+        for inner in getattr(loader, 'loaders', [loader]):
+            for directory in inner.get_dirs():
+                yield directory
+
+
+def template_names(engine):
+    """
+    Return the name of every template the engine's loaders can find.
+    """
+    names = set()
+    for directory in template_dirs(engine):
+        for root, dirs, files in os.walk(directory):
+            for filename in files:
+                if not filename.startswith('.'):
+                    path = os.path.relpath(os.path.join(root, filename), directory)
+                    names.add(path.replace(os.sep, '/'))
+    return sorted(names)
+
+
+def url_patterns(resolver):
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, RegexURLResolver):
+            for inner in url_patterns(pattern):
+                yield inner
+        else:
+            yield pattern
+
+
+def view_templates(urlconf=None):
+    """
+    Yield (view, candidate template names) for each class-based view of the
+    URLconf that renders a template.
+    """
+    for pattern in url_patterns(get_resolver(urlconf)):
+        view_class = getattr(pattern.callback, 'view_class', None)
+        if view_class is None or not hasattr(view_class, 'get_template_names'):
+            continue
+        view = view_class(**pattern.callback.view_initkwargs)
+        # what get_template_names() reads before a request has set them
+        model = getattr(view, 'model', None)
+        view.object = None
+        view.object_list = model._default_manager.none() if model is not None else []
+        try:
+            yield view_class.__name__, view.get_template_names()
+        except ImproperlyConfigured:
+            yield view_class.__name__, []
+
+
+def precompile_templates(urlconf=None):
+    """
+    Compile every template of the Django template engines and check that the
+    views find theirs. Returns the number of templates compiled and raises
+    ImproperlyConfigured listing every problem found.
+    """
+    errors, count = [], 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for name in template_names(engine.engine):
+            try:
+                engine.get_template(name)
+            except (TemplateSyntaxError, UnicodeDecodeError) as e:
+                errors.append('{0}: {1}'.format(name, e))
+            count += 1
+
+    for view_name, names in view_templates(urlconf):
+        try:
+            select_template(names)
+        except TemplateDoesNotExist:
+            errors.append('{0}: none of {1} found'.format(view_name, ', '.join(names) or 'no template name'))
+
+    if errors:
+        raise ImproperlyConfigured('Template errors:\n' + '\n'.join(errors))
+    return count
@@ -0,0 +1,153 @@
+import json
+
+from django.test import TransactionTestCase, override_settings
+
+from django.contrib.auth.models import Permission, User
+from django.core.urlresolvers import reverse
+
+from catalog.cache import get_cache
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+
+class ApiTest(TransactionTestCase):
+    """
+    A TransactionTestCase: the generations are bumped once changes commit.
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.author = Author.objects.create(first_name='Frank', last_name='Herbert')
+        self.language = Language.objects.create(language_name='English')
+        self.genre = Genre.objects.create(name='Science Fiction')
+        self.book = Book.objects.create(title='Dune', summary='Spice.', isbn='1', author=self.author, language=self.language)
+        self.book.genre.add(self.genre)
+        self.orphan = Book.objects.create(title='Anonymous', summary='Nobody.', isbn='2')
+        self.borrower = User.objects.create_user(username='reader', password='secret')
+        self.copy = BookInstance.objects.create(book=self.book, imprint='Chilton', status='o', borrower=self.borrower)
+
+    def tearDown(self):
+        get_cache().clear()
+
+    def get(self, resource, pk=None, **params):
+        if pk is None:
+            url = reverse('catalog:api-list', args=[resource])
+        else:
+            url = reverse('catalog:api-detail', args=[resource, pk])
+        return self.client.get(url, params)
+
+    def data(self, resource, pk=None, **params):
+        resp = self.get(resource, pk, **params)
+        self.assertEqual(resp.status_code, 200)
+        return json.loads(resp.content.decode('utf-8'))
+
+    def test_list(self):
+        data = self.data('books')
+        self.assertEqual([book['title'] for book in data['results']], ['Anonymous', 'Dune'])
+        self.assertEqual(data['results'][1]['author'], self.author.pk)
+        self.assertEqual(data['results'][1]['genres'], [self.genre.pk])
+        self.assertIsNone(data['next'])
+
+    def test_detail(self):
+        data = self.data('authors', self.author.pk)
+        self.assertEqual(data['last_name'], 'Herbert')
+        self.assertEqual(self.get('authors', 999).status_code, 404)
+        self.assertEqual(self.get('widgets').status_code, 404)
+
+    def test_sparse_fields(self):
+        data = self.data('books', self.book.pk, fields='title,isbn')
+        self.assertEqual(list(data), ['title', 'isbn'])
+
+    def test_expand(self):
+        data = self.data('books', fields='title,author,language,genres', expand='author,language,genres')
+        orphan, dune = data['results']
+        self.assertEqual(dune['author']['first_name'], 'Frank')
+        self.assertEqual(dune['language'], {'id': self.language.pk, 'name': 'English'})
+        self.assertEqual(dune['genres'], [{'id': self.genre.pk, 'name': 'Science Fiction'}])
+        self.assertIsNone(orphan['author'])
+        self.assertEqual(orphan['genres'], [])
+
+    def test_filters(self):
+        data = self.data('books', author=self.author.pk)
+        self.assertEqual([book['title'] for book in data['results']], ['Dune'])
+        data = self.data('copies', status='a')
+        self.assertEqual(data['results'], [])
+
+    def test_invalid_requests(self):
+        for params in ({'fields': 'nope'}, {'expand': 'title'}, {'fields': 'title', 'expand': 'author'},
+                       {'limit': 'many'}, {'cursor': 'garbage'}, {'author': 'x'}):
+            self.assertEqual(self.get('books', **params).status_code, 400, params)
+        self.assertEqual(self.get('copies', 'abc').status_code, 400)
+
+    def test_cursor_pages(self):
+        for number in range(5):
+            Book.objects.create(title='Book {0}'.format(number), summary='-', isbn='b{0}'.format(number))
+        titles, data = [], self.data('books', limit=3, fields='title')
+        while True:
+            titles.extend(book['title'] for book in data['results'])
+            if not data['next']:
+                break
+            data = json.loads(self.client.get(data['next']).content.decode('utf-8'))
+        self.assertEqual(titles, sorted(Book.objects.values_list('title', flat=True)))
+
+    def test_borrower_is_only_shown_to_librarians(self):
+        self.assertNotIn('borrower', self.data('copies', self.copy.pk))
+        self.assertEqual(self.get('copies', fields='borrower').status_code, 400)
+
+        librarian = User.objects.create_user(username='librarian', password='secret')
+        librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.client.login(username='librarian', password='secret')
+        self.assertEqual(self.data('copies', self.copy.pk)['borrower'], self.borrower.pk)
+
+    def test_not_modified(self):
+        resp = self.get('books', expand='author')
+        etag = resp['ETag']
+        # only the generations of the tables read
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse('catalog:api-list', args=['books']), {'expand': 'author'},
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        # another query string is another representation
+        self.assertNotEqual(self.get('books')['ETag'], etag)
+
+    def test_etag_changes_with_the_data(self):
+        etag = self.get('books', expand='author')['ETag']
+        self.author.first_name = 'Brian'
+        self.author.save()
+        resp = self.client.get(reverse('catalog:api-list', args=['books']), {'expand': 'author'},
+                               HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'Brian')
+
+        # other tables leave it alone
+        etag = self.get('genres')['ETag']
+        BookInstance.objects.create(book=self.book, imprint='Ace', status='a')
+        self.assertEqual(self.get('genres')['ETag'], etag)
+
+    def test_copies_etag_changes_when_their_book_or_borrower_is_deleted(self):
+        url = reverse('catalog:api-list', args=['copies'])
+        for deleted in (self.borrower, self.book):
+            etag = self.client.get(url)['ETag']
+            # Their copies are updated by a SET NULL, without signals of their own.
+            deleted.delete()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etags_are_the_same_in_every_process(self):
+        url = reverse('catalog:api-detail', args=['books', self.book.pk])
+        etag = self.client.get(url)['ETag']
+        # A process with a cache of its own, that did or did not see the change.
+        with override_settings(CATALOG_CACHE='default'):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.book.title = 'Dune Messiah'
+            self.book.save()
+        self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=etag), 'Dune Messiah')
+
+    def test_queries_do_not_grow_with_the_rows(self):
+        for number in range(20):
+            book = Book.objects.create(title='Book {0}'.format(number), summary='-', isbn='b{0}'.format(number),
+                                       author=self.author)
+            book.genre.add(self.genre)
+        # the generations, the page and the genres
+        with self.assertNumQueries(3):
+            data = self.data('books', expand='author,language,genres')
+        self.assertEqual(len(data['results']), 22)
@@ -0,0 +1,120 @@
+import threading
+import time
+
+from django.test import TestCase
+
+from django.core.urlresolvers import reverse
+
+from catalog.autocomplete import AutocompleteIndex, PrefixIndex, book_keys, index, normalize
+from catalog.models import Author, Book
+
+
+class PrefixIndexTest(TestCase):
+
+    def setUp(self):
+        self.index = PrefixIndex()
+        self.index.replace([
+            (['the hobbit', 'hobbit'], ('book', 1, 'The Hobbit')),
+            (['hobbit house'], ('book', 2, 'Hobbit House')),
+            (['house of leaves'], ('book', 3, 'House of Leaves')),
+        ])
+
+    def test_normalize(self):
+        self.assertEqual(normalize('  Émile   ZOLA '), 'emile zola')
+
+    def test_lookup_matches_prefixes_once_per_entry(self):
+        self.assertEqual(self.index.lookup('hob'), [('book', 1, 'The Hobbit'), ('book', 2, 'Hobbit House')])
+        self.assertEqual(self.index.lookup('HOUSE'), [('book', 3, 'House of Leaves')])
+        self.assertEqual(self.index.lookup('the h'), [('book', 1, 'The Hobbit')])
+        self.assertEqual(self.index.lookup('hob', limit=1), [('book', 1, 'The Hobbit')])
+        self.assertEqual(self.index.lookup(''), [])
+
+    def test_update_and_remove(self):
+        self.index.update(['hobbit returns'], ('book', 1, 'Hobbit Returns'))
+        self.assertEqual(self.index.lookup('the'), [])
+        self.assertIn(('book', 1, 'Hobbit Returns'), self.index.lookup('hobbit r'))
+        self.index.remove('book', 2)
+        self.assertEqual(self.index.lookup('hob'), [('book', 1, 'Hobbit Returns')])
+        self.assertEqual(len(self.index), 2)
+
+    def test_short_prefixes_span_buckets(self):
+        self.index.update(['h'], ('book', 4, 'H'))
+        self.assertEqual(self.index.lookup('h'), [('book', 4, 'H'), ('book', 1, 'The Hobbit'),
+                                                  ('book', 2, 'Hobbit House'), ('book', 3, 'House of Leaves')])
+        self.assertEqual(self.index.lookup('h', limit=2), [('book', 4, 'H'), ('book', 1, 'The Hobbit')])
+
+    def test_writes_copy_only_the_buckets_they_change(self):
+        buckets = self.index._data[0]
+        self.index.update(['house of cards'], ('book', 4, 'House of Cards'))
+        self.assertIs(self.index._data[0]['th'], buckets['th'])
+        self.assertEqual(buckets['ho'][0], ['hobbit', 'hobbit house', 'house of leaves'])
+        self.assertEqual(self.index.lookup('house of'), [('book', 4, 'House of Cards'), ('book', 3, 'House of Leaves')])
+
+    def test_max_entries(self):
+        small = PrefixIndex(max_entries=2)
+        small.replace([book_keys(Book(pk=1, title='Dune')), book_keys(Book(pk=2, title='The Dune'))])
+        self.assertEqual(small.lookup('dune'), [('book', 1, 'Dune')])
+
+
+class SlowIndex(AutocompleteIndex):
+    builds = 0
+
+    def items(self):
+        self.builds += 1
+        time.sleep(0.05)
+        return [book_keys(Book(pk=1, title='Dune'))]
+
+
+class ConcurrentBuildTest(TestCase):
+
+    def test_first_lookups_share_one_build(self):
+        slow = SlowIndex()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(slow.suggest('dune'))) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(slow.builds, 1)
+        self.assertEqual(results, [[('book', 1, 'Dune')]] * 8)
+
+
+class AutocompleteViewTest(TestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(first_name='Frank', last_name='Herbert')
+        self.book = Book.objects.create(title='Dune', summary='Spice.', isbn='1', author=self.author)
+        index.build()
+
+    def suggest(self, query, **params):
+        params['q'] = query
+        return self.client.get(reverse('catalog:autocomplete'), params).json()['results']
+
+    def test_suggests_books_and_authors(self):
+        self.assertEqual(self.suggest('dun'), [
+            {'type': 'book', 'label': 'Dune', 'url': reverse('catalog:book-detail', args=[self.book.pk])}])
+        self.assertEqual(self.suggest('herb'), [
+            {'type': 'author', 'label': 'Herbert, Frank', 'url': reverse('catalog:author-detail', args=[self.author.pk])}])
+        self.assertEqual(len(self.suggest('frank herbert')), 1)
+        self.assertEqual(self.suggest(''), [])
+
+    def test_does_not_query_the_database(self):
+        self.suggest('d')
+        with self.assertNumQueries(0):
+            self.suggest('dune')
+
+    def test_follows_saves_and_deletes(self):
+        self.book.title = 'Children of Dune'
+        self.book.save()
+        self.assertEqual(self.suggest('dune'), [])
+        self.assertEqual([result['label'] for result in self.suggest('child')], ['Children of Dune'])
+        Book.objects.create(title='Dune Messiah', summary='More spice.', isbn='2')
+        self.assertEqual([result['label'] for result in self.suggest('dune')], ['Dune Messiah'])
+        self.author.delete()
+        self.assertEqual(self.suggest('herb'), [])
+
+    def test_limit_is_capped(self):
+        for num in range(25):
+            Book.objects.create(title='Dune {0}'.format(num), summary='-', isbn=str(num))
+        self.assertEqual(len(self.suggest('dune', limit=100)), 20)
+        self.assertEqual(len(self.suggest('dune', limit='x')), 10)
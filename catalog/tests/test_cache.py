@@ -0,0 +1,209 @@
+import datetime
+
+from django.test import TransactionTestCase, override_settings
+
+from django.contrib.auth.models import Permission, User
+from django.core.urlresolvers import reverse
+from django.db import transaction
+from django.utils import timezone
+
+from catalog.cache import BOOK_LIST, book_scope, get_cache, invalidate
+from catalog.models import Author, Book, BookInstance, CacheGeneration, Genre, Language
+
+
+class CachedPageTest(TransactionTestCase):
+    """
+    A TransactionTestCase: the generations are bumped once changes commit.
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.author = Author.objects.create(first_name='Frank', last_name='Herbert')
+        self.language = Language.objects.create(language_name='English')
+        self.genre = Genre.objects.create(name='Science Fiction')
+        self.book = Book.objects.create(title='Dune', summary='Spice.', isbn='1', author=self.author, language=self.language)
+        self.book.genre.add(self.genre)
+
+    def tearDown(self):
+        get_cache().clear()
+
+    def assertCached(self, url, text):
+        self.assertContains(self.client.get(url), text)
+        # only the generations
+        with self.assertNumQueries(1):
+            self.assertContains(self.client.get(url), text)
+
+    def test_pages_are_served_from_the_cache(self):
+        for url in (reverse('catalog:books'), reverse('catalog:authors'),
+                    self.book.get_absolute_url(), self.author.get_absolute_url()):
+            self.assertCached(url, 'Frank')
+
+    def test_pages_are_cached_per_query_string(self):
+        url = self.book.get_absolute_url()
+        self.client.get(url)
+        resp = self.client.get(url + '?copies_page=2')
+        self.assertTemplateUsed(resp, 'catalog/book_detail.html')
+
+    def test_logged_in_users_are_not_served_from_the_cache(self):
+        User.objects.create_user(username='reader', password='secret')
+        self.client.login(username='reader', password='secret')
+        self.client.get(reverse('catalog:books'))
+        resp = self.client.get(reverse('catalog:books'))
+        self.assertTemplateUsed(resp, 'catalog/book_list.html')
+        self.assertContains(resp, 'reader')
+
+    def test_book_changes_drop_book_and_author_pages(self):
+        other = Author.objects.create(first_name='Brian', last_name='Herbert')
+        for url in (reverse('catalog:books'), self.book.get_absolute_url(), self.author.get_absolute_url()):
+            self.assertCached(url, 'Dune')
+        self.book.title = 'Dune Messiah'
+        self.book.author = other
+        self.book.save()
+        self.assertContains(self.client.get(reverse('catalog:books')), 'Dune Messiah')
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'Dune Messiah')
+        self.assertNotContains(self.client.get(self.author.get_absolute_url()), 'Dune')
+        self.assertContains(self.client.get(other.get_absolute_url()), 'Dune Messiah')
+
+    def test_related_rows_drop_the_book_page(self):
+        url = self.book.get_absolute_url()
+        for obj, field, value in ((self.author, 'last_name', 'Herbert Jr'), (self.genre, 'name', 'Space Opera'),
+                                  (self.language, 'language_name', 'Arabic')):
+            self.client.get(url)
+            setattr(obj, field, value)
+            obj.save()
+            self.assertContains(self.client.get(url), value)
+        self.client.get(url)
+        self.book.genre.remove(self.genre)
+        self.assertNotContains(self.client.get(url), 'Space Opera')
+
+    def test_deleting_an_author_drops_the_book_pages(self):
+        self.assertCached(reverse('catalog:books'), 'Herbert')
+        self.assertCached(self.book.get_absolute_url(), 'Herbert')
+        self.author.delete()
+        self.assertNotContains(self.client.get(reverse('catalog:books')), 'Herbert')
+        self.assertNotContains(self.client.get(self.book.get_absolute_url()), 'Herbert')
+
+    def test_copy_changes_drop_book_pages(self):
+        self.assertCached(reverse('catalog:books'), '0 available')
+        self.assertCached(self.book.get_absolute_url(), 'Dune')
+        copy = BookInstance.objects.create(book=self.book, imprint='Chilton, 1965', status='a')
+        self.assertContains(self.client.get(reverse('catalog:books')), '1 available')
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'Chilton, 1965')
+
+        other = Book.objects.create(title='Children of Dune', summary='-', isbn='2')
+        self.client.get(self.book.get_absolute_url())
+        copy = BookInstance.objects.get(pk=copy.pk)
+        copy.book = other
+        copy.save()
+        self.assertNotContains(self.client.get(self.book.get_absolute_url()), 'Chilton, 1965')
+
+    def test_commands_drop_the_pages_of_every_process(self):
+        url = self.book.get_absolute_url()
+        self.assertCached(url, 'Dune')
+        # e.g. import_catalog, running in a process with a cache of its own
+        with override_settings(CATALOG_CACHE='default'):
+            Book.objects.filter(pk=self.book.pk).update(title='Dune Messiah')
+            invalidate([BOOK_LIST, book_scope(self.book.pk)])
+        self.assertContains(self.client.get(url), 'Dune Messiah')
+        self.assertContains(self.client.get(reverse('catalog:books')), 'Dune Messiah')
+
+    def test_generations_are_bumped_once_the_change_commits(self):
+        url = self.book.get_absolute_url()
+        self.assertCached(url, 'Dune')
+        versions = list(CacheGeneration.objects.values_list('scope', 'version'))
+        with transaction.atomic():
+            self.book.title = 'Dune Messiah'
+            self.book.save()
+            # Other writers are not kept waiting on the generations meanwhile.
+            self.assertEqual(list(CacheGeneration.objects.values_list('scope', 'version')), versions)
+        self.assertContains(self.client.get(url), 'Dune Messiah')
+
+    def test_crud_views_drop_cached_pages(self):
+        librarian = User.objects.create_user(username='librarian', password='secret')
+        librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.assertCached(self.author.get_absolute_url(), 'Herbert')
+
+        librarian_client = self.client_class()
+        librarian_client.login(username='librarian', password='secret')
+        librarian_client.post(reverse('catalog:author_update', args=[self.author.pk]),
+                              {'first_name': 'Frank', 'last_name': 'Herbert Sr'})
+        self.assertContains(self.client.get(self.author.get_absolute_url()), 'Herbert Sr')
+
+
+class ConditionalGetTest(TransactionTestCase):
+    """
+    A TransactionTestCase: the generations are bumped once changes commit.
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.author = Author.objects.create(first_name='Frank', last_name='Herbert')
+        self.book = Book.objects.create(title='Dune', summary='Spice.', isbn='1', author=self.author)
+
+    def tearDown(self):
+        get_cache().clear()
+
+    def test_matching_etag_is_not_modified(self):
+        for url in (reverse('catalog:books'), reverse('catalog:authors'),
+                    self.book.get_absolute_url(), self.author.get_absolute_url()):
+            resp = self.client.get(url)
+            self.assertTrue(resp.has_header('ETag'))
+            self.assertIn('no-cache', resp['Cache-Control'])
+            with self.assertNumQueries(1):
+                resp = self.client.get(url, HTTP_IF_NONE_MATCH=resp['ETag'])
+            self.assertEqual(resp.status_code, 304)
+            self.assertEqual(resp.content, b'')
+
+    def test_changes_modify_the_page(self):
+        url = self.book.get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        self.book.title = 'Dune Messiah'
+        self.book.save()
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(resp, 'Dune Messiah')
+        self.assertNotEqual(resp['ETag'], etag)
+
+        etag = resp['ETag']
+        BookInstance.objects.create(book=self.book, imprint='Chilton, 1965', status='a')
+        self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=etag), 'Chilton, 1965')
+
+    def backdate_changes(self):
+        CacheGeneration.objects.update(changed=timezone.now() - datetime.timedelta(minutes=1))
+
+    def test_if_modified_since(self):
+        url = self.author.get_absolute_url()
+        # Not yet for a change in the current second, which here is not over
+        # before the request even if the clock ticks meanwhile.
+        CacheGeneration.objects.update(changed=timezone.now() + datetime.timedelta(seconds=30))
+        self.assertFalse(self.client.get(url).has_header('Last-Modified'))
+        self.backdate_changes()
+        last_modified = self.client.get(url)['Last-Modified']
+        resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2000 00:00:00 GMT')
+        self.assertEqual(resp.status_code, 200)
+
+    def test_changes_made_by_another_process(self):
+        url = self.book.get_absolute_url()
+        self.backdate_changes()
+        resp = self.client.get(url)
+        etag, last_modified = resp['ETag'], resp['Last-Modified']
+        # The other process has a cache of its own.
+        with override_settings(CATALOG_CACHE='default'):
+            self.book.title = 'Dune Messiah'
+            self.book.save()
+        self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=etag), 'Dune Messiah')
+        self.assertContains(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified), 'Dune Messiah')
+
+    @override_settings(CATALOG_CACHE_TIMEOUT=0)
+    def test_without_page_caching(self):
+        url = reverse('catalog:books')
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=self.client.get(url)['ETag'])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_logged_in_users_always_get_the_page(self):
+        User.objects.create_user(username='reader', password='secret')
+        self.client.login(username='reader', password='secret')
+        resp = self.client.get(reverse('catalog:books'), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.has_header('ETag'))
@@ -0,0 +1,224 @@
+import datetime
+import threading
+from unittest import skipUnless
+
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from django.contrib.auth.models import Permission, User
+from django.core.urlresolvers import reverse
+from django.db import connection, connections
+
+from catalog.cache import get_cache
+from catalog.circulation import CirculationError, checkout, reserve, return_copy
+from catalog.models import Book, BookInstance
+from catalog.stats import find_copy_counter_drift, get_catalog_counts
+
+
+class CirculationTest(TransactionTestCase):
+    """
+    A TransactionTestCase: the generations are bumped once changes commit.
+    """
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Dune', summary='Spice.', isbn='1')
+        self.copy = BookInstance.objects.create(book=self.book, imprint='Chilton', status='a')
+        self.reader = User.objects.create_user(username='reader', password='secret')
+        self.other = User.objects.create_user(username='other', password='secret')
+
+    def assertCopy(self, status, borrower):
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual((copy.status, copy.borrower), (status, borrower))
+        self.assertEqual(find_copy_counter_drift(), {})
+        self.assertEqual(get_catalog_counts()['num_instances_available'], int(status == 'a'))
+
+    def test_checkout_and_return(self):
+        self.assertEqual(checkout(self.copy.pk, self.reader), 'a')
+        self.assertCopy('o', self.reader)
+        self.assertEqual(BookInstance.objects.get(pk=self.copy.pk).due_back,
+                         datetime.date.today() + datetime.timedelta(weeks=3))
+        with self.assertRaisesMessage(CirculationError, 'The copy is on loan.'):
+            checkout(self.copy.pk, self.other)
+        self.assertCopy('o', self.reader)
+
+        return_copy(self.copy.pk)
+        self.assertCopy('a', None)
+        with self.assertRaisesMessage(CirculationError, 'The copy is available.'):
+            return_copy(self.copy.pk)
+
+    def test_reserved_copies_only_go_to_their_reader(self):
+        reserve(self.copy.pk, self.reader)
+        self.assertCopy('r', self.reader)
+        with self.assertRaises(CirculationError):
+            reserve(self.copy.pk, self.other)
+        with self.assertRaisesMessage(CirculationError, 'The copy is reserved.'):
+            checkout(self.copy.pk, self.other)
+        self.assertEqual(checkout(self.copy.pk, self.reader), 'r')
+        self.assertCopy('o', self.reader)
+
+    def test_missing_copy(self):
+        self.copy.delete()
+        with self.assertRaisesMessage(CirculationError, 'No such copy.'):
+            checkout(self.copy.pk, self.reader)
+
+    def test_changes_drop_the_cached_book_page(self):
+        get_cache().clear()
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'Available')
+        checkout(self.copy.pk, self.reader)
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'On load')
+        get_cache().clear()
+
+
+@override_settings(CATALOG_CACHE_TIMEOUT=0)
+class CirculationViewTest(TestCase):
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Dune', summary='Spice.', isbn='1')
+        self.copy = BookInstance.objects.create(book=self.book, imprint='Chilton', status='a')
+        self.reader = User.objects.create_user(username='reader', password='secret')
+        librarian = User.objects.create_user(username='librarian', password='secret', is_staff=True)
+        librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+
+    def url(self, name):
+        return reverse('catalog:' + name, args=[self.copy.pk])
+
+    def test_librarian_checks_out_and_returns(self):
+        self.client.login(username='librarian', password='secret')
+        self.assertContains(self.client.get(self.book.get_absolute_url()), self.url('checkout-book-librarian'))
+        due_back = datetime.date.today() + datetime.timedelta(weeks=2)
+        resp = self.client.post(self.url('checkout-book-librarian'), {'borrower': 'reader', 'due_back': due_back})
+        self.assertRedirects(resp, self.book.get_absolute_url())
+        self.assertEqual(BookInstance.objects.get(pk=self.copy.pk).borrower, self.reader)
+
+        # the second librarian loses
+        resp = self.client.post(self.url('checkout-book-librarian'), {'borrower': 'librarian', 'due_back': due_back})
+        self.assertEqual(resp.status_code, 409)
+        self.assertContains(resp, 'The copy is on loan.', status_code=409)
+
+        resp = self.client.post(self.url('return-book-librarian'))
+        self.assertRedirects(resp, self.book.get_absolute_url())
+        self.assertEqual(BookInstance.objects.get(pk=self.copy.pk).status, 'a')
+
+    def test_checkout_form_errors(self):
+        self.client.login(username='librarian', password='secret')
+        resp = self.client.post(self.url('checkout-book-librarian'),
+                                {'borrower': 'nobody', 'due_back': datetime.date.today() - datetime.timedelta(days=1)})
+        self.assertFormError(resp, 'form', 'borrower', 'No reader with this username')
+        self.assertFormError(resp, 'form', 'due_back', 'Invalid date - due date in past')
+
+    def test_readers_can_only_reserve(self):
+        self.client.login(username='reader', password='secret')
+        resp = self.client.post(self.url('checkout-book-librarian'), {'borrower': 'reader'})
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(BookInstance.objects.get(pk=self.copy.pk).status, 'a')
+
+        self.assertContains(self.client.get(self.book.get_absolute_url()), self.url('reserve-book'))
+        self.assertRedirects(self.client.post(self.url('reserve-book')), self.book.get_absolute_url())
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual((copy.status, copy.borrower), ('r', self.reader))
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_return_action(self):
+        checkout(self.copy.pk, self.reader)
+        User.objects.filter(username='librarian').update(is_superuser=True)
+        self.client.login(username='librarian', password='secret')
+        resp = self.client.post(reverse('admin:catalog_bookinstance_changelist'), {
+            'action': 'return_selected_copies', '_selected_action': [str(self.copy.pk)]}, follow=True)
+        self.assertContains(resp, 'Returned 1 copies.')
+        self.assertEqual(BookInstance.objects.get(pk=self.copy.pk).status, 'a')
+
+    def admin_change(self, **data):
+        User.objects.filter(username='librarian').update(is_superuser=True)
+        self.client.login(username='librarian', password='secret')
+        data = dict({'book': self.book.pk, 'imprint': 'Chilton', 'id': self.copy.pk}, **data)
+        return self.client.post(reverse('admin:catalog_bookinstance_change', args=[self.copy.pk]), data, follow=True)
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_changes_availability_through_circulation(self):
+        self.admin_change(circulation='checkout', reader='reader', status='m')
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual((copy.status, copy.borrower), ('o', self.reader))
+
+        resp = self.admin_change(circulation='reserve', reader='reader')
+        self.assertContains(resp, 'The availability was not changed: The copy is on loan.')
+        resp = self.admin_change(circulation='reserve')
+        self.assertContains(resp, 'Enter the reader to check out or reserve the copy for')
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_edits_leave_a_concurrent_loan_alone(self):
+        # The copy is lent out after the librarian opened the form.
+        checkout(self.copy.pk, self.reader)
+        self.admin_change(imprint='Chilton, 1965')
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual((copy.imprint, copy.status, copy.borrower), ('Chilton, 1965', 'o', self.reader))
+        self.assertEqual(find_copy_counter_drift(), {})
+
+
+class ConcurrentCheckoutTest(TransactionTestCase):
+    """
+    Many threads, each with its own database connection, lend the same copies
+    at once. Every copy must end up lent exactly once.
+    """
+    threads = 8
+    copies = 5
+
+    def setUp(self):
+        book = Book.objects.create(title='Dune', summary='Spice.', isbn='1')
+        self.copy_ids = [BookInstance.objects.create(book=book, imprint='Chilton', status='a').pk
+                         for number in range(self.copies)]
+        self.readers = [User.objects.create_user(username='reader{0}'.format(number))
+                        for number in range(self.threads)]
+
+    def race(self, operation):
+        barrier = threading.Barrier(self.threads)
+        outcomes, errors = [], []
+
+        def run(reader):
+            try:
+                barrier.wait()
+                for pk in self.copy_ids:
+                    try:
+                        operation(pk, reader)
+                        outcomes.append((pk, reader.pk))
+                    except CirculationError:
+                        pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=run, args=[reader]) for reader in self.readers]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+        return outcomes
+
+    def test_no_double_loans(self):
+        outcomes = self.race(checkout)
+        self.assertEqual(sorted(pk for pk, reader in outcomes), sorted(self.copy_ids))
+        for pk, reader in outcomes:
+            self.assertEqual(BookInstance.objects.get(pk=pk).borrower_id, reader)
+        self.assertEqual(find_copy_counter_drift(), {})
+        self.assertEqual(get_catalog_counts()['num_instances_available'], 0)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Row locks are only taken on PostgreSQL.')
+class PostgreSQLConcurrentCheckoutTest(ConcurrentCheckoutTest):
+    """
+    More threads than the SQLite run, which lets one writer in at a time:
+    on PostgreSQL the UPDATEs really run at once and wait on each other's
+    row locks. Run with DATABASE_URL pointing at a PostgreSQL server.
+    """
+    threads = 16
+    copies = 20
+
+    def test_checkouts_race_returns_and_reservations(self):
+        def operation(pk, reader):
+            for change in (lambda: reserve(pk, reader), lambda: checkout(pk, reader), lambda: return_copy(pk)):
+                try:
+                    change()
+                except CirculationError:
+                    pass
+        self.race(operation)
+        self.assertEqual(find_copy_counter_drift(), {})
@@ -0,0 +1,358 @@
+from django.test import LiveServerTestCase, TestCase, override_settings
+
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import shutil
+import smtplib
+import tempfile
+import uuid
+
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils.six import StringIO
+
+from django.contrib.auth.models import User
+from django.db import connection
+
+from catalog.models import Author, Book, BookInstance, QueryStat
+from catalog.search import search_books
+from catalog.stats import find_copy_counter_drift, get_catalog_counts
+
+
+class RebuildCountersCommandTest(TestCase):
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        for status in ('a', 'a', 'o'):
+            BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', status=status)
+
+    def test_verify_passes_when_counters_are_correct(self):
+        out = StringIO()
+        call_command('rebuild_counters', verify=True, stdout=out)
+        self.assertIn('All counters are correct', out.getvalue())
+
+    def test_verify_reports_drift(self):
+        # queryset.update() bypasses the signal handlers
+        BookInstance.objects.filter(status='a').update(status='m')
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', verify=True, stdout=StringIO())
+
+    def test_rebuild_fixes_drift(self):
+        BookInstance.objects.filter(status='a').update(status='m')
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(find_copy_counter_drift(), {})
+        book = Book.objects.get(pk=self.book.pk)
+        self.assertEqual((book.copies_available, book.copies_maintenance), (0, 2))
+        call_command('rebuild_counters', verify=True, stdout=StringIO())
+
+    def test_rebuild_fixes_counters_that_went_negative(self):
+        Book.objects.filter(pk=self.book.pk).update(copies_available=0)
+        copy = BookInstance.objects.filter(status='a').first()
+        copy.status = 'm'
+        copy.save()
+        self.assertEqual(Book.objects.get(pk=self.book.pk).copies_available, -1)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(Book.objects.get(pk=self.book.pk).copies_available, 1)
+
+
+class SeedLibraryCommandTest(TestCase):
+
+    def test_seeds_requested_numbers_with_correct_counters(self):
+        call_command('seed_library', authors=5, books=20, copies=60, users=3, stdout=StringIO())
+        self.assertEqual(Author.objects.count(), 5)
+        self.assertEqual(Book.objects.count(), 20)
+        self.assertEqual(BookInstance.objects.count(), 60)
+        self.assertEqual(User.objects.count(), 3)
+        call_command('rebuild_counters', verify=True, stdout=StringIO())
+
+
+class ExplainHotPathsCommandTest(TestCase):
+
+    def test_list_pages_are_served_by_indexes(self):
+        call_command('seed_library', authors=5, books=20, copies=200, users=3, stdout=StringIO())
+        out = StringIO()
+        call_command('explain_hot_paths', repeat=1, stdout=out)
+        self.assertIn('All loans, keyset page halfway through', out.getvalue())
+        if connection.vendor == 'sqlite':
+            # every page is read in index order, none is sorted after the fact
+            self.assertNotIn('TEMP B-TREE FOR ORDER BY', out.getvalue())
+            self.assertIn('USING INDEX catalog_bookinstance_borrower_id', out.getvalue())
+
+
+class QueryStatsCommandTest(TestCase):
+
+    def setUp(self):
+        QueryStat.objects.create(digest='a', sql='SELECT "id" FROM "catalog_book" ORDER BY "title"', view='catalog:books',
+                                 calls=10, total_ms=500, max_ms=90, buckets='0,0,0,0,0,0,0,0,10',
+                                 plan='SCAN catalog_book\nUSE TEMP B-TREE FOR ORDER BY', plan_ms=90)
+        QueryStat.objects.create(digest='b', sql='SELECT "id" FROM "catalog_book" WHERE "id" = ?', view='catalog:book-detail',
+                                 calls=1000, total_ms=100, max_ms=1, buckets='0,0,0,1000')
+
+    def test_worst_offenders_first(self):
+        out = StringIO()
+        call_command('querystats', plans=True, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn('catalog:books', lines[1])
+        self.assertIn('*', lines[1])
+        self.assertIn('USE TEMP B-TREE FOR ORDER BY', out.getvalue())
+
+        out = StringIO()
+        call_command('querystats', order='calls', limit=1, stdout=out)
+        self.assertIn('catalog:book-detail', out.getvalue())
+        self.assertNotIn('catalog:books', out.getvalue())
+
+        out = StringIO()
+        call_command('querystats', full_scans=True, stdout=out)
+        self.assertNotIn('catalog:book-detail', out.getvalue())
+
+    def test_reset(self):
+        call_command('querystats', reset=True, stdout=StringIO())
+        self.assertFalse(QueryStat.objects.exists())
+
+
+class ImportCatalogCommandTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def import_catalog(self, *paths, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', *paths, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_imports_csv(self):
+        User.objects.create_user(username='reader')
+        Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        path = self.write('catalog.csv', (
+            'isbn,title,summary,author_first_name,author_last_name,language,genres,copy_id,imprint,status,due_back,borrower\n'
+            '9780547773742,A Wizard of Earthsea,Magic.,Ursula,Le Guin,English,Fantasy|Classic,,Parnassus 1968,a,,\n'
+            '9780547773742,A Wizard of Earthsea,Magic.,Ursula,Le Guin,English,Fantasy|Classic,,Parnassus 1968,o,2030-01-01,reader\n'
+            '9780441172719,Dune,Spice.,Frank,Herbert,English,Science Fiction,,,,,\n'
+            '9780441172719,Dune,,Frank,Herbert,,,,Chilton 1965,x,,\n'))
+        out, err = self.import_catalog(path, batch_size=2)
+
+        self.assertIn('Imported 1 authors, 3 genres, 1 languages, 2 books, 2 copies.', out)
+        self.assertIn('Skipped 1 records', out)
+        self.assertIn('catalog.csv:5: skipped, status must be one of', err)
+
+        earthsea = Book.objects.get(isbn='9780547773742')
+        self.assertEqual(earthsea.author.last_name, 'Le Guin')
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(sorted(genre.name for genre in earthsea.genre.all()), ['Classic', 'Fantasy'])
+        self.assertEqual((earthsea.copies_available, earthsea.copies_on_loan), (1, 1))
+        loan = earthsea.bookinstance_set.get(status='o')
+        self.assertEqual((loan.borrower.username, str(loan.due_back)), ('reader', '2030-01-01'))
+        self.assertEqual(Book.objects.get(isbn='9780441172719').bookinstance_set.count(), 0)
+        self.assertEqual(get_catalog_counts()['num_books'], 2)
+        self.assertEqual(search_books('earthsea', 10), [earthsea])
+        call_command('rebuild_counters', verify=True, stdout=StringIO())
+
+    def test_imports_jsonl_and_skips_copies_already_imported(self):
+        copy_id = '5e2c6a55-5c5e-4a4e-9a0c-0d7a4b1f3c11'
+        path = self.write('catalog.jsonl', '\n'.join([
+            '{"isbn": "1", "title": "One", "genres": ["Poetry"], "copy_id": "%s", "status": "m"}' % copy_id,
+            '{"isbn": "2", "title": "Two", "author_first_name": "Ann", "author_last_name": "Lee",'
+            ' "author_date_of_birth": "1950-02-30"}',
+            'not json',
+            '',
+        ]))
+        out, err = self.import_catalog(path)
+        self.assertIn('0 authors, 1 genres, 0 languages, 1 books, 1 copies', out)
+        self.assertIn(':2: skipped, author_date_of_birth', err)
+        self.assertIn(':3: skipped', err)
+
+        out, err = self.import_catalog(path)
+        self.assertIn('0 books, 0 copies', out)
+        self.assertEqual(BookInstance.objects.get().pk, uuid.UUID(copy_id))
+
+    def test_batches_committed_before_a_failure_are_counted_and_indexed(self):
+        path = self.write('catalog.csv', 'isbn,title,imprint,status\n1,Dune,Chilton 1965,a\n')
+        with self.assertRaisesMessage(CommandError, 'Cannot read'):
+            self.import_catalog(path, os.path.join(self.directory, 'missing.csv'))
+        dune = Book.objects.get(isbn='1')
+        self.assertEqual(dune.copies_available, 1)
+        self.assertEqual(get_catalog_counts()['num_books'], 1)
+        self.assertEqual(search_books('dune', 10), [dune])
+
+    def test_unknown_format(self):
+        with self.assertRaisesMessage(CommandError, 'use --format'):
+            self.import_catalog(self.write('catalog.txt', ''))
+
+
+class ExportCatalogCommandTest(TestCase):
+
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        self.books = [Book.objects.create(title='Book {0}'.format(num), summary='-', isbn=str(num), author=author)
+                      for num in range(5)]
+        BookInstance.objects.create(book=self.books[0], imprint='First, 1968', status='o',
+                                    due_back=datetime.date(2030, 1, 1), borrower=self.reader)
+
+    def export(self, *args, **options):
+        out = StringIO()
+        call_command('export_catalog', *args, stdout=out, stderr=StringIO(), **options)
+        return out.getvalue()
+
+    def test_csv_in_chunks(self):
+        rows = list(csv.reader(io.StringIO(self.export('books', chunk_size=2))))
+        self.assertEqual(rows[0][:3], ['id', 'title', 'author_id'])
+        self.assertEqual([row[1] for row in rows[1:]], ['Book {0}'.format(num) for num in range(5)])
+
+    def test_jsonl(self):
+        rows = [json.loads(line) for line in self.export('copies', format='jsonl').splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['status'], rows[0]['due_back'], rows[0]['borrower__username']),
+                         ('o', '2030-01-01', 'reader'))
+
+    def test_gzipped_output_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'authors.csv.gz')
+        self.export('authors', output=path)
+        with gzip.open(path, 'rt') as f:
+            self.assertEqual(len(f.read().splitlines()), 2)
+
+
+class RefusingBackend(locmem.EmailBackend):
+    """
+    Refuses mail to refused@example.com.
+    """
+
+    def send_messages(self, messages):
+        for message in messages:
+            if 'refused@example.com' in message.to:
+                raise smtplib.SMTPRecipientsRefused({'refused@example.com': (550, b'No such user')})
+        return super(RefusingBackend, self).send_messages(messages)
+
+
+class ScanOverdueCommandTest(TestCase):
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Dune', summary='Spice.', isbn='1')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='secret')
+        self.today = datetime.date.today()
+
+    def loan(self, days_late, borrower=None, status='o'):
+        return BookInstance.objects.create(book=self.book, imprint='Chilton', status=status, borrower=borrower or self.reader,
+                                           due_back=self.today - datetime.timedelta(days=days_late))
+
+    def scan(self, **options):
+        out = StringIO()
+        call_command('scan_overdue', stdout=out, **options)
+        return out.getvalue()
+
+    def test_flags_overdue_loans_and_emails_their_borrowers(self):
+        late, later = self.loan(3), self.loan(10)
+        self.loan(-5)
+        self.loan(3, status='a')
+        nobody = User.objects.create_user(username='nobody', password='secret')
+        self.loan(1, borrower=nobody)
+
+        self.assertIn('Flagged 3 overdue loan(s), sent 1 reminder(s).', self.scan(batch_size=2))
+        self.assertEqual(set(BookInstance.objects.filter(overdue_since=self.today).values_list('pk', flat=True)),
+                         {late.pk, later.pk, BookInstance.objects.get(borrower=nobody).pk})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reader@example.com'])
+        self.assertIn('Dune', mail.outbox[0].body)
+
+    def test_runs_are_incremental(self):
+        self.loan(3)
+        self.scan()
+        self.assertIn('Flagged 0', self.scan())
+        self.assertEqual(len(mail.outbox), 1)
+
+        # a loan due before the checkpoint is only found by a full scan
+        back_dated = self.loan(30)
+        self.assertIn('Flagged 0', self.scan())
+        self.assertIn('Flagged 1', self.scan(full=True))
+        self.assertIsNotNone(BookInstance.objects.get(pk=back_dated.pk).overdue_since)
+
+    @override_settings(EMAIL_BACKEND='catalog.tests.test_commands.RefusingBackend')
+    def test_failed_reminders_are_counted_and_not_resent(self):
+        refused = User.objects.create_user(username='refused', email='refused@example.com', password='secret')
+        self.loan(3, borrower=refused)
+        self.loan(3)
+        err = StringIO()
+        out = self.scan(stderr=err)
+        self.assertIn('Flagged 2 overdue loan(s), sent 1 reminder(s).', out)
+        self.assertIn('1 reminder(s) could not be sent', out)
+        self.assertIn('refused@example.com', err.getvalue())
+        self.assertEqual(BookInstance.objects.filter(overdue_since=self.today).count(), 2)
+
+        self.assertIn('Flagged 0', self.scan(stderr=err))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_renewing_clears_the_flag(self):
+        copy = self.loan(3)
+        self.scan()
+        copy = BookInstance.objects.get(pk=copy.pk)
+        copy.due_back = self.today + datetime.timedelta(weeks=2)
+        copy.save()
+        self.assertIsNone(BookInstance.objects.get(pk=copy.pk).overdue_since)
+
+    def test_saving_a_copy_loaded_before_the_scan_keeps_the_flag(self):
+        copy = BookInstance.objects.get(pk=self.loan(3).pk)
+        self.scan()
+        copy.imprint = 'Chilton, 1965'
+        copy.save()
+        self.assertEqual(BookInstance.objects.get(pk=copy.pk).overdue_since, self.today)
+        self.assertIn('Flagged 0', self.scan())
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class BenchmarkCommandTest(TestCase):
+
+    def setUp(self):
+        call_command('seed_library', authors=5, books=20, copies=60, users=3, stdout=StringIO())
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_every_route_is_measured(self):
+        output = os.path.join(self.directory, 'results.json')
+        call_command('benchmark', repeat=2, output=output, stdout=StringIO(), stderr=StringIO())
+        with open(output) as results_file:
+            results = json.load(results_file)
+        self.assertEqual(results['skipped'], [])
+        self.assertEqual(results['dataset']['books'], 20)
+        self.assertIsNone(results['http'])
+        for name, result in results['client'].items():
+            self.assertEqual((result['requests'], result['errors']), (2, 0), name)
+            self.assertIsNotNone(result['queries'])
+        self.assertIn('book-detail', results['client'])
+
+    def test_compare_reports_regressions(self):
+        previous = os.path.join(self.directory, 'previous.json')
+        with open(previous, 'w') as previous_file:
+            json.dump({'client': {'books': {'p50_ms': 0.001, 'p90_ms': 0.001, 'queries': 0}}}, previous_file)
+        out = StringIO()
+        call_command('benchmark', repeat=2, routes='books', compare=previous, stdout=out, stderr=StringIO())
+        self.assertIn('client books p50_ms: 0.001 ->', out.getvalue())
+
+
+class BenchmarkHttpTest(LiveServerTestCase):
+
+    def test_routes_are_requested_over_http(self):
+        call_command('seed_library', authors=2, books=5, copies=10, users=1, stdout=StringIO())
+        output = os.path.join(tempfile.mkdtemp(), 'results.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        call_command('benchmark', repeat=4, concurrency=2, routes='books,my-borrowed', server=self.live_server_url,
+                     background='search', background_clients=1, output=output, stdout=StringIO(), stderr=StringIO())
+        with open(output) as results_file:
+            results = json.load(results_file)
+        self.assertEqual(results['options']['background'], 'search')
+        for name in ('books', 'my-borrowed'):
+            self.assertEqual((results['http'][name]['requests'], results['http'][name]['errors']), (4, 0), name)
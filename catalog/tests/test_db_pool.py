@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+import time
+
+from django.test import SimpleTestCase, TestCase
+
+from django.db import OperationalError, connection
+from django.db.utils import load_backend
+
+from catalog.db_pool.pool import ConnectionPool, PoolExhausted, close_pools, warm_up
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    def pool(self, **kwargs):
+        return ConnectionPool(lambda: sqlite3.connect(':memory:', check_same_thread=False), **kwargs)
+
+    def test_connections_are_reused(self):
+        pool = self.pool()
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(pool.stats(), {'open': 1, 'idle': 0, 'max_size': 10})
+
+    def test_max_size_caps_the_connections(self):
+        pool = self.pool(max_size=2, timeout=0.1)
+        first, second = pool.acquire(), pool.acquire()
+        with self.assertRaises(PoolExhausted):
+            pool.acquire()
+
+        # A waiting thread gets the connection handed back.
+        pool.timeout = 5
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        waiter.start()
+        time.sleep(0.05)
+        pool.release(second)
+        waiter.join()
+        self.assertEqual(acquired, [second])
+        self.assertEqual(pool.size, 2)
+
+    def test_broken_connections_are_replaced(self):
+        pool = self.pool(health_check_interval=0)
+        broken = pool.acquire()
+        pool.release(broken)
+        broken.close()
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, broken)
+        replacement.execute('SELECT 1')
+        self.assertEqual(pool.size, 1)
+
+        pool.release(replacement, reusable=False)
+        self.assertEqual(pool.stats()['open'], 0)
+
+    def test_old_connections_are_replaced(self):
+        pool = self.pool(max_lifetime=0)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertEqual(pool.size, 0)
+        self.assertIsNot(pool.acquire(), first)
+
+    def test_fill(self):
+        pool = self.pool(max_size=3)
+        pool.fill(5)
+        self.assertEqual(pool.stats(), {'open': 3, 'idle': 3, 'max_size': 3})
+        pool.close()
+        self.assertEqual(pool.size, 0)
+
+
+class PooledBackendTest(TestCase):
+
+    def setUp(self):
+        settings_dict = dict(connection.settings_dict, ENGINE='catalog.db_pool.sqlite3',
+                             POOL={'MAX_SIZE': 1, 'MIN_SIZE': 1, 'TIMEOUT': 0.1})
+        backend = load_backend(settings_dict['ENGINE'])
+        self.first = backend.DatabaseWrapper(settings_dict, 'pooled')
+        self.second = backend.DatabaseWrapper(settings_dict, 'pooled')
+        self.addCleanup(close_pools, 'pooled')
+
+    def test_close_hands_the_connection_back(self):
+        with self.first.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        raw = self.first.connection
+        self.assertEqual(self.first.pool.stats()['open'], 1)
+
+        # The only connection is in use.
+        with self.assertRaises(OperationalError):
+            self.second.ensure_connection()
+
+        self.first.close()
+        self.assertEqual(self.first.pool.stats()['idle'], 1)
+        self.second.ensure_connection()
+        self.assertIs(self.second.connection, raw)
+        self.second.close()
+
+    def test_warm_up(self):
+        warm_up()
+        self.first.warm_up()
+        self.assertEqual(self.first.get_pool(self.first.get_connection_params()).stats()['idle'], 1)
@@ -1,7 +1,8 @@
 from django.test import TestCase
 
 
-from catalog.models import Author
+from catalog.models import Author, Book, BookInstance, CatalogCounter
+from catalog.stats import compute_catalog_counts, get_catalog_counts
 
 class AuthorModelTest(TestCase):
 
@@ -36,3 +37,91 @@ class AuthorModelTest(TestCase):
         author = Author.objects.get(id=1)
 	# this will fail if urlconf is not defined	
         self.assertEquals(author.get_absolute_url(), '/catalog/author/1')
+
+
+class CatalogCounterTest(TestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(first_name='Big', last_name='Bob')
+        self.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG', author=self.author)
+
+    def test_counts_follow_creates(self):
+        BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', status='a')
+        BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', status='m')
+        self.assertEqual(get_catalog_counts(), compute_catalog_counts())
+        self.assertEqual(get_catalog_counts()['num_instances_available'], 1)
+
+    def test_counts_follow_status_changes_and_deletes(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', status='m')
+        copy = BookInstance.objects.get(pk=copy.pk)
+        copy.status = 'a'
+        copy.save()
+        self.assertEqual(get_catalog_counts()['num_instances_available'], 1)
+        copy.delete()
+        self.book.delete()
+        self.author.delete()
+        self.assertEqual(get_catalog_counts(), compute_catalog_counts())
+        self.assertEqual(get_catalog_counts()['num_books'], 0)
+
+    def test_missing_counters_are_rebuilt(self):
+        CatalogCounter.objects.all().delete()
+        self.assertEqual(get_catalog_counts(), compute_catalog_counts())
+        self.assertEqual(CatalogCounter.objects.count(), 4)
+
+    def test_counts_read_in_one_query(self):
+        with self.assertNumQueries(1):
+            get_catalog_counts()
+
+
+class BookCopyCounterTest(TestCase):
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        self.other_book = Book.objects.create(title='Other Title', summary='My book summary', isbn='HIJKLMN')
+
+    def counters(self, book):
+        book = Book.objects.get(pk=book.pk)
+        return (book.copies_available, book.copies_on_loan, book.copies_maintenance, book.copies_reserved)
+
+    def test_counters_follow_copy_status(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', status='a')
+        BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', status='r')
+        self.assertEqual(self.counters(self.book), (1, 0, 0, 1))
+
+        copy.status = 'o'
+        copy.save()
+        self.assertEqual(self.counters(self.book), (0, 1, 0, 1))
+
+        copy.delete()
+        self.assertEqual(self.counters(self.book), (0, 0, 0, 1))
+
+    def test_counters_follow_copy_moving_to_another_book(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', status='m')
+        copy.book = self.other_book
+        copy.save()
+        self.assertEqual(self.counters(self.book), (0, 0, 0, 0))
+        self.assertEqual(self.counters(self.other_book), (0, 0, 1, 0))
+
+    def test_saving_stale_book_keeps_counters(self):
+        stale = Book.objects.get(pk=self.book.pk)
+        BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', status='a')
+        stale.title = 'New Title'
+        stale.save()
+        self.assertEqual(self.counters(self.book), (1, 0, 0, 0))
+        self.assertEqual(Book.objects.get(pk=self.book.pk).title, 'New Title')
+
+    def test_saving_a_copy_of_a_book_inserts_it(self):
+        BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', status='a')
+        book = Book.objects.get(pk=self.book.pk)
+        book.pk = None
+        book.save()
+        self.assertNotEqual(book.pk, self.book.pk)
+        self.assertEqual(self.counters(book), (0, 0, 0, 0))
+        self.assertEqual(self.counters(self.book), (1, 0, 0, 0))
+
+    def test_saving_a_deleted_book_inserts_it_again(self):
+        BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', status='a')
+        book = Book.objects.get(pk=self.book.pk)
+        Book.objects.filter(pk=self.book.pk).delete()
+        book.save()
+        self.assertEqual(self.counters(self.book), (0, 0, 0, 0))
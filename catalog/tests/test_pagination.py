@@ -0,0 +1,54 @@
+from django.test import TestCase
+
+import datetime
+from catalog.models import BookInstance
+from catalog.pagination import InvalidCursor, KeysetPaginator, decode_cursor
+
+
+class KeysetPaginatorTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # 7 copies, 3 of them without a due date, with repeated due dates
+        today = datetime.date.today()
+        for days in (3, 1, None, 2, 1, None, None):
+            due_back = today + datetime.timedelta(days=days) if days is not None else None
+            BookInstance.objects.create(imprint='Unlikely, 2016', due_back=due_back, status='o')
+
+    def expected_order(self):
+        return list(BookInstance.objects.order_by('due_back', 'id'))
+
+    def walk_forward(self, paginator):
+        seen, page = [], paginator.page()
+        seen.extend(page)
+        while page.has_next():
+            page = paginator.page(after=page.next_cursor)
+            seen.extend(page)
+        return seen, page
+
+    def test_walks_every_row_once_in_order(self):
+        paginator = KeysetPaginator(BookInstance.objects.all(), 2, ('due_back', 'id'))
+        seen, last_page = self.walk_forward(paginator)
+        self.assertEqual(seen, self.expected_order())
+        self.assertFalse(last_page.has_next())
+
+    def test_walks_backwards(self):
+        paginator = KeysetPaginator(BookInstance.objects.all(), 2, ('due_back', 'id'))
+        seen, page = self.walk_forward(paginator)
+        backwards = list(page)
+        while page.has_previous():
+            page = paginator.page(before=page.previous_cursor)
+            backwards = list(page) + backwards
+        self.assertEqual(backwards, self.expected_order())
+
+    def test_first_page_has_no_previous(self):
+        page = KeysetPaginator(BookInstance.objects.all(), 3, ('due_back', 'id')).page()
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+        self.assertEqual(len(page), 3)
+
+    def test_invalid_cursor(self):
+        fields = [BookInstance._meta.get_field('due_back'), BookInstance._meta.get_field('id')]
+        for cursor in ('not-a-cursor', 'WyJ4Il0', 'WyJ4IiwieSJd'):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, fields)
@@ -0,0 +1,88 @@
+import json
+from collections import deque
+
+from django.test import RequestFactory, TestCase, override_settings
+
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.http import HttpResponse
+
+from catalog.models import Author, Book
+from catalog.profiling import ProfilingMiddleware, fingerprint, profiles
+
+
+class FingerprintTest(TestCase):
+
+    def test_literals_are_replaced(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "book"  WHERE "id" = 12 AND "title" = \'It\'\'s\'\n LIMIT 21'),
+            'SELECT * FROM "book" WHERE "id" = ? AND "title" = ? LIMIT ?')
+        self.assertEqual(fingerprint('SELECT 1 FROM "book" WHERE "id" IN (1, 2, 3)'),
+                         fingerprint('SELECT 1 FROM "book" WHERE "id" IN (4)'))
+
+
+@override_settings(CATALOG_PROFILING_SAMPLE_RATE=1, CATALOG_CACHE_TIMEOUT=0)
+class ProfilingMiddlewareTest(TestCase):
+
+    def setUp(self):
+        profiles.reset()
+        self.author = Author.objects.create(first_name='Frank', last_name='Herbert')
+        Book.objects.create(title='Dune', summary='Spice.', isbn='1', author=self.author)
+        User.objects.create_user(username='librarian', password='secret', is_staff=True)
+
+    def tearDown(self):
+        profiles.reset()
+
+    def test_sampled_requests_are_logged_and_aggregated(self):
+        with self.assertLogs('catalog.profiling', 'INFO') as logs:
+            self.client.get(reverse('catalog:books'))
+            self.client.get(reverse('catalog:books'))
+        sample = json.loads(logs.records[0].getMessage())
+        self.assertEqual(sample['view'], 'catalog:books')
+        self.assertEqual(sample['status'], 200)
+        self.assertGreater(sample['queries'], 0)
+        self.assertGreater(sample['render_ms'], 0)
+        self.assertGreaterEqual(sample['wall_ms'], sample['render_ms'])
+
+        self.client.login(username='librarian', password='secret')
+        with self.assertLogs('catalog.profiling', 'INFO'):
+            views = self.client.get(reverse('catalog:profile')).json()['views']
+        self.assertEqual(views['catalog:books']['requests'], 2)
+        self.assertEqual(sum(views['catalog:books']['wall']['buckets'].values()), 2)
+
+    def test_repeated_queries_are_reported(self):
+        middleware, request = ProfilingMiddleware(), RequestFactory().get('/')
+        middleware.process_request(request)
+        # One query per book: the N+1 signature.
+        for book in Book.objects.all():
+            Author.objects.filter(pk=book.author_id).first()
+            Author.objects.filter(pk=book.author_id + 1).first()
+        with self.assertLogs('catalog.profiling', 'INFO'):
+            middleware.process_response(request, HttpResponse())
+        report = profiles.snapshot()['(unresolved)']
+        self.assertEqual(report['requests_with_duplicates'], 1)
+        self.assertEqual(report['top_duplicates'], [{'sql': fingerprint(str(Author.objects.filter(pk=1)[:1].query)), 'count': 2}])
+
+    def test_queries_are_counted_once_the_log_is_full(self):
+        log = connection.queries_log
+        self.addCleanup(setattr, connection, 'queries_log', log)
+        connection.queries_log = deque(({'sql': 'SELECT 1', 'time': '0.000'} for number in range(20)), maxlen=20)
+        middleware, request = ProfilingMiddleware(), RequestFactory().get('/')
+        middleware.process_request(request)
+        for number in range(3):
+            Book.objects.filter(pk=number).first()
+        with self.assertLogs('catalog.profiling', 'INFO') as logs:
+            middleware.process_response(request, HttpResponse())
+        self.assertEqual(json.loads(logs.records[0].getMessage())['queries'], 3)
+
+    def test_profile_is_for_staff(self):
+        User.objects.create_user(username='reader', password='secret')
+        self.client.login(username='reader', password='secret')
+        with self.assertLogs('catalog.profiling', 'INFO'):
+            self.assertEqual(self.client.get(reverse('catalog:profile')).status_code, 302)
+
+    @override_settings(CATALOG_PROFILING_SAMPLE_RATE=0)
+    def test_off_by_default(self):
+        self.client.get(reverse('catalog:books'))
+        self.assertEqual(profiles.snapshot(), {})
@@ -0,0 +1,100 @@
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from django.core.urlresolvers import reverse
+from django.db import DatabaseError, connection
+
+from catalog.models import Author, Book, QueryStat
+from catalog.profiling import fingerprint
+from catalog.querystats import BUCKETS, digest, flush_after_request, full_scan, percentile, query_log
+
+
+class PercentileTest(TestCase):
+
+    def test_bucket_bounds_capped_by_the_slowest_call(self):
+        counts = [0] * (len(BUCKETS) + 1)
+        counts[BUCKETS.index(1)], counts[BUCKETS.index(100)] = 98, 2
+        stat = QueryStat(calls=100, max_ms=60, buckets=','.join(map(str, counts)))
+        self.assertEqual(percentile(stat, 0.5), 1)
+        self.assertEqual(percentile(stat, 0.99), 60)
+        self.assertIsNone(percentile(QueryStat(), 0.5))
+
+    def test_full_scan(self):
+        self.assertTrue(full_scan('SCAN catalog_book\nUSE TEMP B-TREE FOR ORDER BY'))
+        self.assertTrue(full_scan('Seq Scan on catalog_book  (cost=0.00..1.10 rows=10 width=4)'))
+        self.assertFalse(full_scan('SEARCH catalog_book USING INTEGER PRIMARY KEY (rowid=?)'))
+        self.assertFalse(full_scan('SCAN catalog_book_fts VIRTUAL TABLE INDEX 0:M5'))
+
+
+@override_settings(CATALOG_QUERYSTATS=True, CATALOG_SLOW_QUERY_MS=0, CATALOG_QUERYSTATS_FLUSH_SECONDS=0,
+                   CATALOG_CACHE_TIMEOUT=0)
+class QueryStatsMiddlewareTest(TestCase):
+
+    def setUp(self):
+        query_log.explained.clear()
+        author = Author.objects.create(first_name='Frank', last_name='Herbert')
+        self.book = Book.objects.create(title='Dune', summary='Spice.', isbn='1', author=author)
+
+    def test_queries_are_counted_by_fingerprint_and_explained(self):
+        with self.assertLogs('catalog.querystats', 'WARNING'):
+            for pk in (self.book.pk, self.book.pk + 1):
+                self.client.get(reverse('catalog:book-detail', args=[pk]))
+        stat = QueryStat.objects.get(view='catalog:book-detail', sql__startswith='SELECT "catalog_book"."id"')
+        self.assertEqual(stat.calls, 2)
+        self.assertNotIn(str(self.book.pk), stat.sql)
+        self.assertEqual(sum(map(int, stat.buckets.split(','))), 2)
+        self.assertEqual(stat.slow_calls, 2)
+        if connection.vendor in ('sqlite', 'postgresql', 'mysql'):
+            self.assertNotEqual(stat.plan, '')
+            self.assertFalse(full_scan(stat.plan))
+
+    @override_settings(CATALOG_SLOW_QUERY_MS=10000)
+    def test_fast_queries_are_not_explained(self):
+        self.client.get(reverse('catalog:books'))
+        self.assertTrue(QueryStat.objects.filter(view='catalog:books').exists())
+        self.assertFalse(QueryStat.objects.exclude(plan='').exists())
+
+    @override_settings(CATALOG_QUERYSTATS=False)
+    def test_off_by_default(self):
+        self.client.get(reverse('catalog:books'))
+        self.assertFalse(QueryStat.objects.exists())
+
+
+class QueryLogFlushTest(TestCase):
+
+    def setUp(self):
+        query_log.pending.clear()
+
+    def test_counts_are_kept_when_a_flush_fails(self):
+        def unavailable(*args, **kwargs):
+            raise DatabaseError('unavailable')
+        QueryStat.objects.filter = unavailable
+        try:
+            query_log.add('catalog:books', [('default', 'SELECT 1', [], 1.0)], 100)
+            with self.assertLogs('catalog.querystats', 'ERROR'):
+                query_log.flush()
+        finally:
+            del QueryStat.objects.filter
+
+        query_log.add('catalog:books', [('default', 'SELECT 1', [], 3.0)], 100)
+        query_log.flush()
+        stat = QueryStat.objects.get(digest=digest(fingerprint('SELECT 1')))
+        self.assertEqual((stat.calls, stat.total_ms, stat.max_ms), (2, 4.0, 3.0))
+
+
+@override_settings(CATALOG_QUERYSTATS_FLUSH_SECONDS=0)
+class FlushAfterRequestTest(TransactionTestCase):
+
+    def setUp(self):
+        query_log.pending.clear()
+
+    def test_the_connection_opened_to_flush_is_closed(self):
+        connection.close()
+        query_log.add('catalog:books', [('default', 'SELECT 1', [], 1.0)], 100)
+        flush_after_request()
+        self.assertIsNone(connection.connection)
+        self.assertEqual(QueryStat.objects.get(digest=digest(fingerprint('SELECT 1'))).calls, 1)
+
+        # A persistent connection the request left open stays open.
+        query_log.add('catalog:books', [('default', 'SELECT 1', [], 1.0)], 100)
+        flush_after_request()
+        self.assertIsNotNone(connection.connection)
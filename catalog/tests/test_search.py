@@ -0,0 +1,93 @@
+from django.test import TestCase
+
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.utils.six import StringIO
+
+from catalog.models import Author, Book, Genre
+from catalog.search import get_search_backend, search_books
+
+
+class SearchIndexTest(TestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        self.genre = Genre.objects.create(name='Fantasy')
+        self.book = Book.objects.create(title='A Wizard of Earthsea', summary='A young mage learns the true names of things.',
+                                        isbn='9780547773742', author=self.author)
+        self.book.genre.add(self.genre)
+        self.other = Book.objects.create(title='The Dispossessed', summary='An anarchist physicist travels between worlds.',
+                                         isbn='9780060512750')
+
+    def titles(self, query):
+        return [book.title for book in search_books(query, 10)]
+
+    def test_matches_every_indexed_field(self):
+        for query in ('earthsea', 'true names', '9780547773742', 'ursula', 'fantasy'):
+            self.assertEqual(self.titles(query), ['A Wizard of Earthsea'], query)
+
+    def test_matches_word_prefixes(self):
+        self.assertEqual(self.titles('wiz earth'), ['A Wizard of Earthsea'])
+
+    def test_title_matches_rank_above_summary_matches(self):
+        Book.objects.create(title='Worlds Apart', summary='Essays.', isbn='1')
+        self.assertEqual(self.titles('worlds'), ['Worlds Apart', 'The Dispossessed'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.titles('"earthsea" OR NOT *'), [])
+        self.assertEqual(self.titles('!!!'), [])
+
+    def test_book_changes_are_indexed(self):
+        self.book.title = 'The Farthest Shore'
+        self.book.save()
+        self.assertEqual(self.titles('farthest'), ['The Farthest Shore'])
+        self.assertEqual(self.titles('earthsea'), [])
+        self.book.delete()
+        self.assertEqual(self.titles('farthest'), [])
+
+    def test_author_and_genre_changes_are_indexed(self):
+        self.author.last_name = 'LeGuin'
+        self.author.save()
+        self.assertEqual(self.titles('leguin'), ['A Wizard of Earthsea'])
+
+        self.genre.name = 'Magic'
+        self.genre.save()
+        self.assertEqual(self.titles('magic'), ['A Wizard of Earthsea'])
+
+        self.book.genre.remove(self.genre)
+        self.assertEqual(self.titles('magic'), [])
+
+        self.author.delete()
+        self.assertEqual(self.titles('ursula'), [])
+
+    def test_rebuild(self):
+        get_search_backend().clear()
+        self.assertEqual(self.titles('earthsea'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.titles('earthsea'), ['A Wizard of Earthsea'])
+
+
+class SearchViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for num in range(13):
+            Book.objects.create(title='Garden %s' % num, summary='Summary', isbn='ISBN%s' % num)
+
+    def test_view_uses_correct_template(self):
+        resp = self.client.get(reverse('catalog:search'), {'q': 'garden'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTemplateUsed(resp, 'catalog/search_results.html')
+
+    def test_results_are_paginated(self):
+        resp = self.client.get(reverse('catalog:search'), {'q': 'garden'})
+        self.assertEqual(len(resp.context['book_list']), 10)
+        self.assertTrue(resp.context['has_next'])
+        resp = self.client.get(reverse('catalog:search'), {'q': 'garden', 'page': 2})
+        self.assertEqual(len(resp.context['book_list']), 3)
+        self.assertFalse(resp.context['has_next'])
+
+    def test_empty_query_shows_no_results(self):
+        resp = self.client.get(reverse('catalog:search'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['book_list'], [])
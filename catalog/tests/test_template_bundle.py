@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from django.conf.urls import url
+from django.core.exceptions import ImproperlyConfigured
+from django.template import engines
+from django.views.generic import TemplateView
+
+from catalog.template_bundle import precompile_templates, template_names
+
+# URLconf of a view whose template does not exist, for test_missing_view_template_fails
+urlpatterns = [
+    url(r'^missing/$', TemplateView.as_view(template_name='catalog/missing.html')),
+]
+
+CACHED_TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {
+        'loaders': [('django.template.loaders.cached.Loader', ['django.template.loaders.app_directories.Loader'])],
+    },
+}]
+
+
+class PrecompileTemplatesTest(TestCase):
+
+    def test_finds_project_and_app_templates(self):
+        names = template_names(engines['django'].engine)
+        for name in ('base_generic.html', 'catalog/book_list.html', 'registration/login.html', 'admin/base.html'):
+            self.assertIn(name, names)
+
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_fills_the_cached_loader(self):
+        count = precompile_templates()
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertEqual(len(loader.get_template_cache), count)
+        self.assertIn('catalog/book_list.html', loader.get_template_cache)
+
+    def test_missing_view_template_fails(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'TemplateView: none of catalog/missing.html found'):
+            precompile_templates(urlconf=__name__)
+
+    def test_broken_template_fails(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, 'broken.html'), 'w') as f:
+            f.write('{% if %}')
+        templates = [{'BACKEND': 'django.template.backends.django.DjangoTemplates', 'DIRS': [directory]}]
+        with override_settings(TEMPLATES=templates):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'broken.html'):
+                precompile_templates()
@@ -1,14 +1,53 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.conf import settings
 
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 import datetime
+import uuid
 from django.utils import timezone
 from catalog.models import Author, BookInstance, Book, Genre, Language
 from django.contrib.auth.models import User
 
 from django.contrib.auth.models import Permission # required to grant permission needed to set a book as returned
 
+class IndexViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG', author=author)
+        for status in ('a', 'a', 'o', 'm'):
+            BookInstance.objects.create(book=book, imprint='Unlikely, 2016', status=status)
+
+    def test_view_shows_record_counts(self):
+        resp = self.client.get(reverse('catalog:index'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['num_books'], 1)
+        self.assertEqual(resp.context['num_instances'], 4)
+        self.assertEqual(resp.context['num_instances_available'], 2)
+        self.assertEqual(resp.context['num_authors'], 1)
+
+    def test_visits_are_counted_in_a_signed_cookie(self):
+        for visit in range(3):
+            resp = self.client.get(reverse('catalog:index'))
+            self.assertEqual(resp.context['num_visits'], visit)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, resp.cookies)
+        self.assertNotIn('num_visits', self.client.session.keys())
+
+        self.client.cookies['num_visits'] = '99'
+        resp = self.client.get(reverse('catalog:index'))
+        self.assertEqual(resp.context['num_visits'], 0)
+
+    def test_visits_do_not_write_the_session(self):
+        self.client.get(reverse('catalog:index'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('catalog:index'))
+        self.assertFalse([query for query in queries if 'django_session' in query['sql']])
+
+@override_settings(CATALOG_CACHE_TIMEOUT=0)
 class AuthorListViewTest(TestCase):
 
     @classmethod
@@ -45,6 +84,42 @@ class AuthorListViewTest(TestCase):
         self.assertTrue(resp.context['is_paginated'] == True)
         self.assertTrue(len(resp.context['author_list']) == 3)
 
+@override_settings(CATALOG_CACHE_TIMEOUT=0)
+class AuthorListKeysetPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for author_num in range(13):
+            Author.objects.create(first_name='Faisal %s' % author_num, last_name='Surname %s' % (author_num % 4))
+
+    def test_first_page_links_to_cursor(self):
+        resp = self.client.get(reverse('catalog:authors'))
+        self.assertIn('next_cursor', resp.context)
+        self.assertContains(resp, '?after=%s' % resp.context['next_cursor'])
+
+    def test_cursor_pages_cover_all_authors_in_order(self):
+        seen = []
+        resp = self.client.get(reverse('catalog:authors') + '?after=')
+        seen.extend(resp.context['author_list'])
+        while resp.context['page_obj'].has_next():
+            resp = self.client.get(reverse('catalog:authors') + '?after=' + resp.context['page_obj'].next_cursor)
+            self.assertEqual(resp.status_code, 200)
+            seen.extend(resp.context['author_list'])
+        self.assertEqual(seen, list(Author.objects.order_by('last_name', 'first_name', 'id')))
+
+    def test_cursor_page_skips_count(self):
+        resp = self.client.get(reverse('catalog:authors'))
+        # the page and the generations of catalog.cache
+        with self.assertNumQueries(2):
+            resp = self.client.get(reverse('catalog:authors') + '?after=' + resp.context['next_cursor'])
+        self.assertTrue(resp.context['is_paginated'])
+        self.assertEqual(len(resp.context['author_list']), 3)
+
+    def test_invalid_cursor_is_404(self):
+        resp = self.client.get(reverse('catalog:authors') + '?after=garbage')
+        self.assertEqual(resp.status_code, 404)
+
+
 class LoanedBookInstancesByUserListViewTest(TestCase):
 
     def setUp(self):
@@ -243,3 +318,268 @@ class RenewBookInstancesViewTest(TestCase):
         resp = self.client.post(reverse('catalog:renew-book-librarian', kwargs={'bookinst_id': self.test_bookinstance1.pk,}), {'renewal_date': invalid_date_in_future} )
         self.assertEqual(resp.status_code, 200 )
         self.assertFormError(resp, 'form', 'renewal_date', 'Invalid date - renewal more than 4 weeks old')
+
+
+class RenewBooksViewTest(TestCase):
+
+    def setUp(self):
+        reader = User.objects.create_user(username='reader', password='12345')
+        librarian = User.objects.create_user(username='librarian', password='12345', is_staff=True)
+        librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.book = Book.objects.create(title='Book title', summary='My Book Summary', isbn='ABCEDEF')
+        due_back = datetime.date.today() - datetime.timedelta(days=2)
+        self.loans = [BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', due_back=due_back,
+                                                  borrower=reader, status='o') for number in range(3)]
+        self.returned = BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', status='a')
+        self.renewal_date = datetime.date.today() + datetime.timedelta(weeks=2)
+
+    def post(self, copies, renewal_date=None):
+        return self.client.post(reverse('catalog:renew-books-librarian'),
+                                {'copies': [str(pk) for pk in copies], 'renewal_date': renewal_date or self.renewal_date})
+
+    def test_needs_permission(self):
+        self.client.login(username='reader', password='12345')
+        resp = self.post([self.loans[0].pk])
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(BookInstance.objects.filter(due_back=self.renewal_date).count(), 0)
+
+    def test_renews_and_reports_each_copy(self):
+        self.client.login(username='librarian', password='12345')
+        missing = uuid.uuid4()
+        copies = [loan.pk for loan in self.loans] + [self.returned.pk, missing]
+        resp = self.post(copies)
+        self.assertTemplateUsed(resp, 'catalog/books_renew_results.html')
+        self.assertEqual(resp.context['num_renewed'], 3)
+        self.assertEqual([row['id'] for row in resp.context['results']], copies)
+        self.assertEqual([row['outcome'] for row in resp.context['results']],
+                         ['renewed'] * 3 + ['not on loan', 'not found'])
+        self.assertEqual(BookInstance.objects.filter(due_back=self.renewal_date).count(), 3)
+        self.assertIsNone(BookInstance.objects.get(pk=self.returned.pk).due_back)
+
+    def test_renews_with_one_update_per_chunk(self):
+        self.client.login(username='librarian', password='12345')
+        self.post([self.loans[0].pk])
+        with CaptureQueriesContext(connection) as queries:
+            self.post([loan.pk for loan in self.loans])
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "catalog_bookinstance"')]), 1)
+
+    def test_renewal_date_rules(self):
+        self.client.login(username='librarian', password='12345')
+        resp = self.post([self.loans[0].pk], datetime.date.today() + datetime.timedelta(weeks=5))
+        self.assertTemplateUsed(resp, 'catalog/books_renew_librarian.html')
+        self.assertFormError(resp, 'form', 'renewal_date', 'Invalid date - renewal more than 4 weeks old')
+        resp = self.post([])
+        self.assertFormError(resp, 'form', 'copies', 'Select the copies to renew')
+        self.assertEqual(BookInstance.objects.filter(due_back=self.renewal_date).count(), 0)
+
+    def test_all_borrowed_list_posts_the_ticked_loans(self):
+        self.client.login(username='librarian', password='12345')
+        resp = self.client.get(reverse('catalog:all-borrowed'))
+        self.assertContains(resp, 'action="{0}"'.format(reverse('catalog:renew-books-librarian')))
+        self.assertContains(resp, 'name="copies" value="{0}"'.format(self.loans[0].pk))
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_action(self):
+        self.client.login(username='librarian', password='12345')
+        User.objects.filter(username='librarian').update(is_superuser=True)
+        resp = self.client.post(reverse('admin:catalog_bookinstance_changelist'), {
+            'action': 'renew_selected_loans',
+            '_selected_action': [str(self.loans[0].pk), str(self.returned.pk)],
+        }, follow=True)
+        self.assertContains(resp, 'Renewed 1 loan(s)')
+        self.assertContains(resp, '1 of the selected copies were not on loan')
+        self.assertEqual(BookInstance.objects.get(pk=self.loans[0].pk).due_back,
+                         datetime.date.today() + datetime.timedelta(weeks=3))
+
+@override_settings(CATALOG_CACHE_TIMEOUT=0)
+class BookDetailViewTest(TestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        self.language = Language.objects.create(language_name='English')
+        self.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG', author=self.author, language=self.language)
+        self.book.genre.add(Genre.objects.create(name='Fantasy'), Genre.objects.create(name='Poetry'))
+
+    def add_copies(self, count):
+        for num in range(count):
+            BookInstance.objects.create(book=self.book, imprint='Unlikely, 2016', status='a')
+
+    def test_copies_are_paginated(self):
+        self.add_copies(25)
+        resp = self.client.get(self.book.get_absolute_url())
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context['copies_page'].object_list), 20)
+
+        resp = self.client.get(self.book.get_absolute_url() + '?copies_page=2')
+        self.assertEqual(len(resp.context['copies_page'].object_list), 5)
+
+    def test_out_of_range_copies_page_shows_last_page(self):
+        self.add_copies(25)
+        resp = self.client.get(self.book.get_absolute_url() + '?copies_page=9')
+        self.assertEqual(resp.context['copies_page'].number, 2)
+
+    def test_query_count_does_not_grow_with_copies(self):
+        self.add_copies(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.book.get_absolute_url())
+        self.add_copies(40)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.book.get_absolute_url())
+        self.assertEqual(len(few), len(many))
+        # including the generations of catalog.cache
+        self.assertLessEqual(len(many), 5)
+
+
+@override_settings(CATALOG_CACHE_TIMEOUT=0)
+class AuthorDetailViewTest(TestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+
+    def add_books(self, count):
+        for num in range(count):
+            Book.objects.create(title='Title %s' % num, summary='Summary', isbn='ISBN%s' % num, author=self.author)
+
+    def test_books_listed_by_title(self):
+        self.add_books(3)
+        resp = self.client.get(self.author.get_absolute_url())
+        self.assertEqual(resp.status_code, 200)
+        titles = [book.title for book in resp.context['author'].book_set.all()]
+        self.assertEqual(titles, ['Title 0', 'Title 1', 'Title 2'])
+
+    def test_query_count_does_not_grow_with_books(self):
+        self.add_books(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.author.get_absolute_url())
+        self.add_books(20)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.author.get_absolute_url())
+        self.assertEqual(len(few), len(many))
+        # including the generations of catalog.cache
+        self.assertLessEqual(len(many), 3)
+
+
+@override_settings(CATALOG_CACHE_TIMEOUT=0)
+class QueryBudgetTest(TestCase):
+    """
+    The number of queries a list page runs must stay the same however many
+    rows are on the page, and within a fixed budget.
+    """
+
+    def setUp(self):
+        self.librarian = User.objects.create_superuser('librarian', 'librarian@example.com', '12345')
+        self.genre = Genre.objects.create(name='Fantasy')
+        self.language = Language.objects.create(language_name='English')
+        self.books_created = 0
+
+    def add_books(self, count):
+        for num in range(self.books_created, self.books_created + count):
+            author = Author.objects.create(first_name='First %s' % num, last_name='Last %s' % num)
+            book = Book.objects.create(title='Title %s' % num, summary='Summary', isbn='ISBN%s' % num, author=author, language=self.language)
+            book.genre.add(self.genre)
+            return_date = datetime.date.today() + datetime.timedelta(days=num % 5)
+            BookInstance.objects.create(book=book, imprint='Unlikely, 2016', due_back=return_date, borrower=self.librarian, status='o')
+        self.books_created += count
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url, budget, few=2, many=30):
+        self.add_books(few)
+        queries_for_few = self.count_queries(url)
+        self.add_books(many - few)
+        queries_for_many = self.count_queries(url)
+        self.assertEqual(queries_for_few, queries_for_many)
+        self.assertLessEqual(queries_for_many, budget)
+
+    # The public lists read the generations of catalog.cache too.
+
+    def test_book_list(self):
+        self.assertConstantQueries(reverse('catalog:books'), budget=3)
+
+    def test_author_list(self):
+        self.assertConstantQueries(reverse('catalog:authors'), budget=3)
+
+    def test_my_borrowed_list(self):
+        self.client.login(username='librarian', password='12345')
+        self.assertConstantQueries(reverse('catalog:my-borrowed'), budget=4)
+
+    def test_all_borrowed_list(self):
+        self.client.login(username='librarian', password='12345')
+        self.assertConstantQueries(reverse('catalog:all-borrowed'), budget=4)
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_book_changelist(self):
+        self.client.login(username='librarian', password='12345')
+        self.assertConstantQueries(reverse('admin:catalog_book_changelist'), budget=8, many=100)
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_bookinstance_changelist(self):
+        self.client.login(username='librarian', password='12345')
+        self.assertConstantQueries(reverse('admin:catalog_bookinstance_changelist'), budget=8, many=100)
+
+
+@override_settings(CATALOG_CACHE_TIMEOUT=0)
+class SidebarTest(TestCase):
+
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='12345', is_staff=True)
+        self.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        User.objects.create_user(username='clerk', password='12345', is_staff=True)
+        User.objects.create_user(username='reader', password='12345')
+
+    def get_index(self, username=None):
+        if username:
+            self.client.login(username=username, password='12345')
+        return self.client.get(reverse('catalog:index'))
+
+    def test_variants(self):
+        self.assertEqual(self.get_index().context['sidebar_variant'], 'anonymous')
+        for username in ('reader', 'clerk', 'librarian'):
+            self.client.logout()
+            variant = self.get_index(username).context['sidebar_variant']
+            self.assertEqual(variant, {'reader': 'reader', 'clerk': 'staff', 'librarian': 'librarian'}[username])
+
+    def test_staff_links_follow_the_variant(self):
+        all_borrowed = 'href="{0}"'.format(reverse('catalog:all-borrowed'))
+        self.assertNotContains(self.get_index('reader'), 'Staff</li>')
+        self.client.logout()
+        resp = self.get_index('clerk')
+        self.assertContains(resp, 'Staff</li>')
+        self.assertNotContains(resp, all_borrowed)
+        self.client.logout()
+        self.assertContains(self.get_index('librarian'), all_borrowed)
+
+    def test_user_specific_parts_are_not_cached(self):
+        self.assertContains(self.get_index('reader'), 'User: reader')
+        self.client.logout()
+        User.objects.create_user(username='another', password='12345')
+        resp = self.get_index('another')
+        self.assertContains(resp, 'User: another')
+        self.assertContains(resp, 'Logout</a>')
+        self.assertContains(self.client.get(reverse('catalog:books')), '?next={0}'.format(reverse('catalog:books')))
+
+
+class ExportViewTest(TestCase):
+
+    def setUp(self):
+        Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        User.objects.create_user(username='staff', password='12345', is_staff=True)
+        User.objects.create_user(username='reader', password='12345')
+
+    def test_staff_only(self):
+        url = reverse('catalog:export', args=['authors', 'csv'])
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.login(username='reader', password='12345')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_streams_the_dataset(self):
+        self.client.login(username='staff', password='12345')
+        resp = self.client.get(reverse('catalog:export', args=['authors', 'jsonl']))
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['Content-Disposition'], 'attachment; filename="authors.jsonl"')
+        self.assertIn('"last_name": "Le Guin"', b''.join(resp.streaming_content).decode())
+        self.assertEqual(self.client.get(reverse('catalog:export', args=['users', 'csv'])).status_code, 404)
@@ -1,10 +1,16 @@
 
 from django.conf.urls import url
-from . import views
+from . import api, views
 
 app_name = 'catalog'
 urlpatterns = [
      url(r'^$', views.index, name='index'),
+     url(r'^search/$', views.search, name='search'),
+     url(r'^autocomplete/$', views.autocomplete, name='autocomplete'),
+     url(r'^api/(?P<resource_name>[a-z]+)/$', api.serve, name='api-list'),
+     url(r'^api/(?P<resource_name>[a-z]+)/(?P<pk>[0-9a-f-]+)/$', api.serve, name='api-detail'),
+     url(r'^export/(?P<dataset>[a-z-]+)\.(?P<format>csv|jsonl)$', views.export, name='export'),
+     url(r'^profile/$', views.profile, name='profile'),
      url(r'^books/', views.BookListView.as_view(), name='books'),
      url(r'^book/(?P<pk>[0-9]+)$', views.BookDetailView.as_view(), name='book-detail'),
      url(r'^authors/', views.AuthorListView.as_view(), name='authors'),
@@ -13,11 +19,16 @@ urlpatterns = [
 
 urlpatterns += [
      url(r'^mybooks/', views.LoanedBooksByUserListView.as_view(), name='my-borrowed'),
+     # before all-borrowed, whose pattern matches it too
+     url(r'^borrowed/renew/$', views.renew_books_librarian, name='renew-books-librarian'),
      url(r'^borrowed/', views.LoanedBooksAllListView.as_view(), name='all-borrowed'),
 ] 
 
 urlpatterns += [
      url(r'^book/(?P<bookinst_id>[a-f0-9]{8}-?[a-f0-9]{4}-?4[a-f0-9]{3}-?[89ab][a-f0-9]{3}-?[a-f0-9]{12})/renew/$', views.renew_book_librarian, name='renew-book-librarian'),
+     url(r'^book/(?P<bookinst_id>[a-f0-9]{8}-?[a-f0-9]{4}-?4[a-f0-9]{3}-?[89ab][a-f0-9]{3}-?[a-f0-9]{12})/checkout/$', views.checkout_book_librarian, name='checkout-book-librarian'),
+     url(r'^book/(?P<bookinst_id>[a-f0-9]{8}-?[a-f0-9]{4}-?4[a-f0-9]{3}-?[89ab][a-f0-9]{3}-?[a-f0-9]{12})/return/$', views.return_book_librarian, name='return-book-librarian'),
+     url(r'^book/(?P<bookinst_id>[a-f0-9]{8}-?[a-f0-9]{4}-?4[a-f0-9]{3}-?[89ab][a-f0-9]{3}-?[a-f0-9]{12})/reserve/$', views.reserve_book, name='reserve-book'),
 ]
 
 urlpatterns += [
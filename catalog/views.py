@@ -1,66 +1,182 @@
 
+from django.conf import settings
 from django.views import generic
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.mixins import PermissionRequiredMixin
 
 from .models import Book, Author, BookInstance, Genre
 
-from django.contrib.auth.decorators import permission_required
+from django.contrib.auth.decorators import login_required, permission_required
 from django.shortcuts import get_object_or_404, render
-from django.http import HttpResponseRedirect
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Prefetch
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.core.urlresolvers import reverse  # django.urls import reverse
+from django.utils.decorators import method_decorator
 import datetime
+import os
 
-from .forms import RenewBookForm
+from .autocomplete import index as autocomplete_index
+from .cache import AUTHOR_LIST, BOOK_LIST, CachedPageMixin, author_scope, book_scope
+from .circulation import RENEWED, CirculationError, checkout, renew_loans, reserve, return_copy
+from .export import CONTENT_TYPES, DATASETS, export_lines
+from .forms import CheckoutForm, RenewBookForm, RenewBooksForm
+from .pagination import KeysetPaginationMixin
+from .profiling import profiles
+from .routers import replica_reads
+from .search import search_books
+from .stats import get_catalog_counts
 
+from django import forms
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.core.urlresolvers import reverse_lazy
 
+VISITS_COOKIE_SALT = 'catalog.views.index'
+VISITS_COOKIE_AGE = 365 * 24 * 60 * 60
 
+
+@replica_reads
 def index(request):
-    num_books = Book.objects.all().count()
-    num_instances = BookInstance.objects.all().count()
-    num_authors = Author.objects.count()  # The 'all()' is implied by default
-
-    # Number of visits to this view, as counted in the session variable.
-    num_visits = request.session.get('num_visits', 0)
-    request.session['num_visits'] = num_visits + 1
-
-    num_instances_available = BookInstance.objects.filter(status__exact='a').count()
-    num_authors = Author.objects.all().count()
-        
-    return render(
-	 request,
-         'index.html',
-	 context = {'num_books': num_books, 'num_instances': num_instances, 'num_instances_available': num_instances_available, 'num_authors': num_authors, 'num_visits': num_visits},
-	)
-
-class BookListView(generic.ListView):
+    # Record counts come from the materialized counters, see catalog.stats.
+    counts = get_catalog_counts()
+
+    # Number of visits to this view, counted in a signed cookie rather than the
+    # session so that a visit does not write to the session table.
+    try:
+        num_visits = int(request.get_signed_cookie('num_visits', 0, salt=VISITS_COOKIE_SALT))
+    except ValueError:
+        num_visits = 0
+
+    context = dict(counts, num_visits=num_visits)
+    response = render(request, 'index.html', context=context)
+    response.set_signed_cookie('num_visits', num_visits + 1, salt=VISITS_COOKIE_SALT,
+                               max_age=VISITS_COOKIE_AGE, httponly=True)
+    return response
+
+@replica_reads
+def search(request):
+    """
+    Full-text search over book titles, summaries, ISBNs, authors and genres,
+    best match first. See catalog.search.
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    per_page = 10
+
+    # One extra result tells us whether there is a next page, without counting.
+    books = search_books(query, per_page + 1, (page - 1) * per_page) if query else []
+    context = {
+        'query': query,
+        'book_list': books[:per_page],
+        'page': page,
+        'has_previous': page > 1,
+        'has_next': len(books) > per_page,
+    }
+    return render(request, 'catalog/search_results.html', context=context)
+
+@replica_reads
+def autocomplete(request):
+    """
+    Typeahead suggestions for book titles and author names, as JSON.
+    Served from the in-process index in catalog.autocomplete.
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 20)
+    except ValueError:
+        limit = 10
+    suggestions = autocomplete_index.suggest(request.GET.get('q', ''), limit)
+    results = [{'type': kind, 'label': label, 'url': reverse('catalog:{0}-detail'.format(kind), args=[pk])}
+               for kind, pk, label in suggestions]
+    return JsonResponse({'results': results})
+
+@staff_member_required
+def export(request, dataset, format):
+    """
+    Stream a catalog table as CSV or JSON lines, see catalog.export.
+    """
+    if dataset not in DATASETS:
+        raise Http404('No such dataset')
+    response = StreamingHttpResponse(export_lines(dataset, format), content_type=CONTENT_TYPES[format])
+    response['Content-Disposition'] = 'attachment; filename="{0}.{1}"'.format(dataset, format)
+    return response
+
+@staff_member_required
+def profile(request):
+    """
+    The request histograms of catalog.profiling, per view, as JSON. They cover
+    this process only.
+    """
+    return JsonResponse({'pid': os.getpid(), 'sample_rate': settings.CATALOG_PROFILING_SAMPLE_RATE,
+                         'views': profiles.snapshot()})
+
+@method_decorator(replica_reads, name='dispatch')
+class BookListView(CachedPageMixin, KeysetPaginationMixin, generic.ListView):
     model = Book
     paginate_by = 10
+    keyset_ordering = ('title', 'id')
+    # book_list.html renders the author of every row
+    queryset = Book.objects.select_related('author')
 
-class BookDetailView(generic.DetailView):
+    def get_cache_scopes(self):
+        return [BOOK_LIST]
+
+@method_decorator(replica_reads, name='dispatch')
+class BookDetailView(CachedPageMixin, generic.DetailView):
     model = Book
+    queryset = Book.objects.select_related('author', 'language').prefetch_related('genre')
+    copies_paginate_by = 20
+
+    def get_cache_scopes(self):
+        return [book_scope(self.kwargs['pk'])]
+
+    def get_context_data(self, **kwargs):
+        # A book can have hundreds of copies, so list them a page at a time.
+        context = super(BookDetailView, self).get_context_data(**kwargs)
+        copies = self.object.bookinstance_set.order_by('due_back', 'id')
+        paginator = Paginator(copies, self.copies_paginate_by)
+        try:
+            copies_page = paginator.page(self.request.GET.get('copies_page', 1))
+        except PageNotAnInteger:
+            copies_page = paginator.page(1)
+        except EmptyPage:
+            copies_page = paginator.page(paginator.num_pages)
+        context['copies_page'] = copies_page
+        return context
 
-class AuthorListView(generic.ListView):
+@method_decorator(replica_reads, name='dispatch')
+class AuthorListView(CachedPageMixin, KeysetPaginationMixin, generic.ListView):
     model = Author
     paginate_by = 10
+    keyset_ordering = ('last_name', 'first_name', 'id')
 
-class AuthorDetailView(generic.DetailView):
+    def get_cache_scopes(self):
+        return [AUTHOR_LIST]
+
+@method_decorator(replica_reads, name='dispatch')
+class AuthorDetailView(CachedPageMixin, generic.DetailView):
     model = Author
+    queryset = Author.objects.prefetch_related(Prefetch('book_set', queryset=Book.objects.order_by('title')))
+
+    def get_cache_scopes(self):
+        return [author_scope(self.kwargs['pk'])]
    
-class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
+class LoanedBooksByUserListView(LoginRequiredMixin, KeysetPaginationMixin, generic.ListView):
     """
     Generic class-based view listing books on loan to current user.
     """
     model = BookInstance
     template_name = 'catalog/bookinstance_list_borrowed_user.html'
     paginate_by = 10
+    keyset_ordering = ('due_back', 'id')
 
     def get_queryset(self):
-    	return BookInstance.objects.filter(borrower=self.request.user).filter(status__exact='o').order_by('due_back')
+        return BookInstance.objects.filter(borrower=self.request.user).filter(status__exact='o').select_related('book')
 
-class LoanedBooksAllListView(PermissionRequiredMixin, generic.ListView):
+class LoanedBooksAllListView(PermissionRequiredMixin, KeysetPaginationMixin, generic.ListView):
     """ 
     Generic class-based view listing books on loan to current group.
     """
@@ -68,11 +184,21 @@ class LoanedBooksAllListView(PermissionRequiredMixin, generic.ListView):
     model = BookInstance
     template_name = 'catalog/bookinstance_list_borrowed_all.html'
     paginate_by = 10
+    keyset_ordering = ('due_back', 'id')
 
     def get_queryset(self):
-        return BookInstance.objects.filter(status__exact='o').order_by('due_back')
+        return BookInstance.objects.filter(status__exact='o').select_related('book', 'borrower')
+
+    def get_context_data(self, **kwargs):
+        # the date field of the form renewing the ticked loans
+        context = super(LoanedBooksAllListView, self).get_context_data(**kwargs)
+        context['renew_form'] = RenewBooksForm(initial={'renewal_date': proposed_renewal_date()})
+        return context
  
 
+def proposed_renewal_date():
+    return datetime.date.today() + datetime.timedelta(weeks=3)
+
 @permission_required('catalog.can_mark_returned')
 def renew_book_librarian(request, bookinst_id):
     book_inst = get_object_or_404(BookInstance, pk = bookinst_id)
@@ -94,11 +220,76 @@ def renew_book_librarian(request, bookinst_id):
 
     #if this is a GET (or any other method) create the default form.
     else:
-        proposed_renewal_date = datetime.date.today() + datetime.timedelta(weeks=3)
-        form = RenewBookForm(initial={'renewal_date': proposed_renewal_date,})
+        form = RenewBookForm(initial={'renewal_date': proposed_renewal_date(),})
     
     return render(request, 'catalog/book_renew_librarian.html', {'form': form, 'book_inst': book_inst})
 
+@permission_required('catalog.can_mark_returned')
+def renew_books_librarian(request):
+    """
+    Renew many loans at once, e.g. the ones ticked in the list of all
+    borrowed books, and report what happened to each. See catalog.circulation.
+    """
+    if request.method == 'POST':
+        form = RenewBooksForm(request.POST)
+        if form.is_valid():
+            results = renew_loans(form.cleaned_data['copies'], form.cleaned_data['renewal_date'])
+            context = {
+                'results': results,
+                'renewal_date': form.cleaned_data['renewal_date'],
+                'num_renewed': sum(1 for row in results if row['outcome'] == RENEWED),
+            }
+            return render(request, 'catalog/books_renew_results.html', context)
+    else:
+        form = RenewBooksForm(initial={'renewal_date': proposed_renewal_date(), 'copies': request.GET.getlist('copies')})
+
+    return render(request, 'catalog/books_renew_librarian.html', {'form': form})
+
+
+def circulate(request, book_inst, title, change, form=None):
+    """
+    Confirm a change to a copy's loan, make it with change(form) on POST and
+    show why when the copy was not in a state allowing it, e.g. because
+    another librarian got there first. See catalog.circulation.
+    """
+    if form is None:
+        form = forms.Form(request.POST if request.method == 'POST' else None)
+    status = 200
+    if request.method == 'POST' and form.is_valid():
+        try:
+            change(form)
+        except CirculationError as e:
+            form.add_error(None, str(e))
+            status = 409
+        else:
+            if book_inst.book is None:
+                return HttpResponseRedirect(reverse('catalog:all-borrowed'))
+            return HttpResponseRedirect(book_inst.book.get_absolute_url())
+    return render(request, 'catalog/bookinstance_circulation.html',
+                  {'form': form, 'book_inst': book_inst, 'title': title}, status=status)
+
+@permission_required('catalog.can_mark_returned')
+def checkout_book_librarian(request, bookinst_id):
+    book_inst = get_object_or_404(BookInstance.objects.select_related('book', 'borrower'), pk=bookinst_id)
+    if request.method == 'POST':
+        form = CheckoutForm(request.POST)
+    else:
+        # a reserved copy goes to the reader who reserved it
+        borrower = book_inst.borrower.username if book_inst.status == 'r' and book_inst.borrower else ''
+        form = CheckoutForm(initial={'borrower': borrower, 'due_back': proposed_renewal_date()})
+    return circulate(request, book_inst, 'Check out', lambda form: checkout(
+        book_inst.pk, form.cleaned_data['borrower'], form.cleaned_data['due_back']), form)
+
+@permission_required('catalog.can_mark_returned')
+def return_book_librarian(request, bookinst_id):
+    book_inst = get_object_or_404(BookInstance.objects.select_related('book', 'borrower'), pk=bookinst_id)
+    return circulate(request, book_inst, 'Return', lambda form: return_copy(book_inst.pk))
+
+@login_required
+def reserve_book(request, bookinst_id):
+    book_inst = get_object_or_404(BookInstance.objects.select_related('book', 'borrower'), pk=bookinst_id)
+    return circulate(request, book_inst, 'Reserve', lambda form: reserve(book_inst.pk, request.user))
+
 
 class AuthorCreate(PermissionRequiredMixin, CreateView):
     permission_required = 'catalog.can_mark_returned'
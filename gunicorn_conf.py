@@ -0,0 +1,66 @@
+"""
+gunicorn settings, see the Procfile.
+
+The default profile runs WEB_CONCURRENCY (2) sync workers, one request at a
+time each, with one database connection each. WEB_CONCURRENCY is set to suit
+the dyno size on Heroku; multiprocessing.cpu_count() would report the host's
+CPUs rather than the dyno's.
+
+GUNICORN_WORKER_CLASS=gthread runs GUNICORN_THREADS (8) threads per worker
+instead, so a slow request, e.g. a large loans page or a password reset
+e-mail going out over SMTP, ties up one thread rather than a whole worker.
+Every thread has a database connection of its own, so more than one thread
+needs DATABASE_POOL_MAX_SIZE (catalog.db_pool) to cap the connections of each
+worker and open them when it starts: without it gunicorn refuses to start
+(see on_starting). Keep the pool at least GUNICORN_THREADS, or the threads
+queue for connections. On one CPU gthread gave more throughput and a lower
+median on cheap pages, but a worse p99 on the slow ones, see the benchmark
+command.
+
+GUNICORN_WORKER_CLASS=gevent runs GUNICORN_WORKER_CONNECTIONS (100)
+greenlets per process; it needs gevent installed, and psycogreen as well on
+PostgreSQL so queries yield to the other greenlets. CPU-bound work such as
+building the autocomplete index blocks every greenlet of the worker while it
+runs, so prefer gthread unless the load is mostly waiting on I/O.
+
+`manage.py benchmark --http --worker-class ... --threads ...` compares them.
+"""
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 8 if worker_class == 'gthread' else 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+# Heroku's router gives up on a request after 30 seconds.
+timeout = 30
+graceful_timeout = 30
+# Connections from the router are reused, don't drop them between requests.
+keepalive = 5
+
+
+def on_starting(server):
+    # The command line can set threads too, and gunicorn switches sync workers
+    # with more than one thread to gthread, so check what it ended up with.
+    if server.cfg.threads > 1 and not os.environ.get('DATABASE_POOL_MAX_SIZE'):
+        raise RuntimeError('{0} threads per worker open {0} database connections per worker: '
+                           'set DATABASE_POOL_MAX_SIZE to pool them.'.format(server.cfg.threads))
+
+
+def post_fork(server, worker):
+    if server.cfg.worker_class_str != 'gevent':
+        return
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        return
+    # Without it a query blocks every greenlet of the worker.
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+
+def post_worker_init(worker):
+    # Open the pooled database connections (catalog.db_pool) before the
+    # worker takes requests, rather than on the first ones after a deploy.
+    from catalog.db_pool.pool import warm_up
+    warm_up()
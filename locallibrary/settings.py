@@ -27,7 +27,8 @@ SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'lv4s)^w_$_u=s+mtlyn9ful&5p%k0b
 #DEBUG = True
 DEBUG = bool( os.environ.get('DJANGO_DEBUG', True) )
 
-ALLOWED_HOSTS = []
+# Comma-separated, e.g. DJANGO_ALLOWED_HOSTS=example.com,www.example.com
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -43,6 +44,12 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    # first, so its wall time covers the rest; see CATALOG_PROFILING_SAMPLE_RATE
+    'catalog.profiling.ProfilingMiddleware',
+    # see CATALOG_QUERYSTATS
+    'catalog.querystats.QueryStatsMiddleware',
+    # see CATALOG_REPLICAS
+    'catalog.routers.PrimaryAfterWriteMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,17 +63,29 @@ MIDDLEWARE_CLASSES = (
 
 ROOT_URLCONF = 'locallibrary.urls'
 
+# Project-wide templates (registration/) live in BASE_DIR/templates, the
+# catalog's own in catalog/templates. Without DEBUG the cached loader keeps
+# every parsed template for the life of the process and wsgi.py compiles them
+# all at boot, see catalog/template_bundle.py.
+template_loaders = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    template_loaders = [('django.template.loaders.cached.Loader', template_loaders)]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': ['./templates',],
-        'APP_DIRS': True,
+        'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'OPTIONS': {
+            'loaders': template_loaders,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'catalog.context_processors.sidebar',
             ],
         },
     },
@@ -86,6 +105,81 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/1.9/topics/cache/
+# Rendered catalog pages go to the 'catalog' cache, see catalog/cache.py.
+# $CATALOG_CACHE picks its backend. Pages are keyed by version counters kept
+# in the database, so a change drops them in every worker whatever the
+# backend. locmem keeps a copy of each page per process; file or redis (needs
+# django-redis) share one between the workers.
+
+CATALOG_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CATALOG_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': CATALOG_CACHE_BACKENDS[os.environ.get('CATALOG_CACHE', 'locmem')],
+}
+
+# Seconds a rendered page is kept. A change drops it sooner, this only bounds
+# how long pages of old versions take up room.
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 600))
+
+
+# Profiling
+# The share of requests catalog.profiling times and counts the queries of,
+# from 0 (off, the middleware drops out) to 1. Each sampled request is logged
+# on 'catalog.profiling' and added to the histograms at /catalog/profile/.
+
+CATALOG_PROFILING_SAMPLE_RATE = float(os.environ.get('CATALOG_PROFILING_SAMPLE_RATE', 0))
+
+# Set $CATALOG_QUERYSTATS to 1 (or true, yes, on) to time every query of the
+# catalog and admin views by fingerprint; queries slower than
+# CATALOG_SLOW_QUERY_MS are logged on 'catalog.querystats' and explained.
+# `manage.py querystats` reports them.
+
+CATALOG_QUERYSTATS = os.environ.get('CATALOG_QUERYSTATS', '').lower() in ('1', 'true', 'yes', 'on')
+CATALOG_SLOW_QUERY_MS = float(os.environ.get('CATALOG_SLOW_QUERY_MS', 100))
+# How often each process writes its counts to the database.
+CATALOG_QUERYSTATS_FLUSH_SECONDS = 10
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'catalog.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'catalog.querystats': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.8/topics/i18n/
 
@@ -115,6 +209,49 @@ import dj_database_url
 db_from_env = dj_database_url.config(conn_max_age=500)
 DATABASES['default'].update(db_from_env)
 
+# Test on a SQLite file rather than in memory: threads sharing an in-memory
+# database fail on each other's locks instead of waiting for them, which
+# defeats the concurrency tests (catalog.tests.test_circulation).
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('TEST', {}).setdefault('NAME', os.path.join(BASE_DIR, 'test_db.sqlite3'))
+
+# Read replicas, see catalog/routers.py: $DATABASE_REPLICA_URLS, comma
+# separated, adds them as 'replica1', 'replica2'... The read-only catalog
+# pages and the API read from them, except for
+# CATALOG_PRIMARY_STICKY_SECONDS after the user wrote or the data changed,
+# so keep that above the replication lag.
+CATALOG_REPLICAS = []
+for number, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    alias = 'replica{0}'.format(number)
+    DATABASES[alias] = dict(dj_database_url.parse(url.strip(), conn_max_age=500), TEST={'MIRROR': 'default'})
+    CATALOG_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['catalog.routers.ReplicaRouter']
+CATALOG_PRIMARY_STICKY_SECONDS = int(os.environ.get('CATALOG_PRIMARY_STICKY_SECONDS', 10))
+
+# Pooled connections, see catalog/db_pool/pool.py: set $DATABASE_POOL_MAX_SIZE
+# to cap the connections of each gunicorn worker to each database (replicas
+# included), health-check them before reuse and open them when the worker
+# starts (gunicorn_conf.py).
+POOLED_ENGINES = {
+    'django.db.backends.postgresql': 'catalog.db_pool.postgresql',
+    'django.db.backends.postgresql_psycopg2': 'catalog.db_pool.postgresql',
+    'django.db.backends.sqlite3': 'catalog.db_pool.sqlite3',
+}
+if os.environ.get('DATABASE_POOL_MAX_SIZE'):
+    for database in DATABASES.values():
+        database.update({
+            'ENGINE': POOLED_ENGINES[database['ENGINE']],
+            # Hand the connection back to the pool after each request.
+            'CONN_MAX_AGE': 0,
+            'POOL': {
+                'MAX_SIZE': int(os.environ['DATABASE_POOL_MAX_SIZE']),
+                'MIN_SIZE': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 1)),
+                'TIMEOUT': float(os.environ.get('DATABASE_POOL_TIMEOUT', 30)),
+                'HEALTH_CHECK_INTERVAL': float(os.environ.get('DATABASE_POOL_HEALTH_CHECK_INTERVAL', 30)),
+                'MAX_LIFETIME': 500,
+            },
+        })
+
 # the absolute path to the directory where the collectstatic will collect static files for deployment
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "locallibrary.settings")
 
 application = get_wsgi_application()
+
+# Load the autocomplete index before the first request reaches this worker.
+from catalog.autocomplete import warm_up  # noqa: E402
+warm_up()
+
+# In production compile every template now, a broken one stops the worker from booting.
+from django.conf import settings  # noqa: E402
+if not settings.DEBUG:
+    from catalog.template_bundle import precompile_templates
+    precompile_templates()
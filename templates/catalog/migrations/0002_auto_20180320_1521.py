@@ -1,27 +0,0 @@
-# -*- coding: utf-8 -*-
-from __future__ import unicode_literals
-
-from django.db import migrations, models
-import django.db.models.deletion
-
-
-class Migration(migrations.Migration):
-
-    dependencies = [
-        ('catalog', '0001_initial'),
-    ]
-
-    operations = [
-        migrations.CreateModel(
-            name='Language',
-            fields=[
-                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
-                ('language_name', models.CharField(max_length=100, help_text='Enter the name of the language')),
-            ],
-        ),
-        migrations.AddField(
-            model_name='book',
-            name='language',
-            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='catalog.Language'),
-        ),
-    ]
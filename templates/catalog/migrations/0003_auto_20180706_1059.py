@@ -1,27 +0,0 @@
-# -*- coding: utf-8 -*-
-from __future__ import unicode_literals
-
-from django.db import migrations, models
-import django.db.models.deletion
-from django.conf import settings
-
-
-class Migration(migrations.Migration):
-
-    dependencies = [
-        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
-        ('catalog', '0002_auto_20180320_1521'),
-    ]
-
-    operations = [
-        migrations.AddField(
-            model_name='bookinstance',
-            name='borrower',
-            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
-        ),
-        migrations.AlterField(
-            model_name='language',
-            name='language_name',
-            field=models.CharField(max_length=100, help_text='Enter the book language eg. Farsi, English, French ..'),
-        ),
-    ]
@@ -1,19 +0,0 @@
-# -*- coding: utf-8 -*-
-# Generated by Django 1.9 on 2018-07-09 18:34
-from __future__ import unicode_literals
-
-from django.db import migrations
-
-
-class Migration(migrations.Migration):
-
-    dependencies = [
-        ('catalog', '0003_auto_20180706_1059'),
-    ]
-
-    operations = [
-        migrations.AlterModelOptions(
-            name='bookinstance',
-            options={'ordering': ['due_back'], 'permissions': (('can_mark_returned', 'Set book as returned'),)},
-        ),
-    ]
@@ -1,31 +0,0 @@
-"""locallibrary URL Configuration
-
-The `urlpatterns` list routes URLs to views. For more information please see:
-    https://docs.djangoproject.com/en/1.8/topics/http/urls/
-Examples:
-Function views
-    1. Add an import:  from my_app import views
-    2. Add a URL to urlpatterns:  url(r'^$', views.home, name='home')
-Class-based views
-    1. Add an import:  from other_app.views import Home
-    2. Add a URL to urlpatterns:  url(r'^$', Home.as_view(), name='home')
-Including another URLconf
-    1. Add a URL to urlpatterns:  url(r'^blog/', include('blog.urls'))
-"""
-from django.conf.urls import include, url
-from django.contrib import admin
-from django.views.generic import RedirectView
-from django.conf import settings
-from django.conf.urls.static import static
-admin.autodiscover()
-
-urlpatterns = [
-    url(r'^admin/', include(admin.site.urls)),
-    url(r'^catalog/', include('catalog.urls')),
-    url(r'^$', RedirectView.as_view(url='/catalog/', permanent=True)),
-] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-
-# Django site authentication urls( for login, logout, password management)
-urlpatterns += [
-    url(r'^accounts/', include('django.contrib.auth.urls'))
-]